@@ -0,0 +1,113 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds; processing endpoints can take a while on a busy database
+DEFAULT_TIMEOUT = (3.05, 30)
+
+# Gateway errors worth retrying; connection failures are retried for every method,
+# but a POST that reached the server is never re-sent
+RETRY_STATUSES = (502, 503, 504)
+
+class ApiError(Exception):
+    """A non-200 response from the API."""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+def build_session(pool_size=10, retries=3, backoff_factor=0.3):
+    """requests.Session with keep-alive pooling and retries with exponential backoff."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ApiClient:
+    """Client for the incentive API over a shared session, with a read cache.
+
+    Successful GET responses are cached until clear_cache(); any write clears
+    the cache, since it may change what the reads return. app_sim builds one
+    client per script run over one long-lived session, so reads are cached for
+    a single rerun while connections are reused across all of them.
+
+    With an `etag_store` dict, get_json revalidates endpoints that send an ETag
+    (the driver dashboard) with If-None-Match and reuses the stored body on a
+    304. The store outlives the client, so reruns revalidate instead of
+    downloading the body again.
+    """
+
+    def __init__(self, base_url, session=None, timeout=DEFAULT_TIMEOUT, etag_store=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = session or build_session()
+        self.timeout = timeout
+        self.etag_store = etag_store
+        self._cache = {}
+        self.requests_sent = 0
+        self.cache_hits = 0
+        self.not_modified = 0
+
+    def _request(self, method, path, **kwargs):
+        self.requests_sent += 1
+        return self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+
+    def get(self, path, params=None, cache=True):
+        """GET `path`; repeated reads of the same path and params are served from the cache."""
+        key = (path, tuple(sorted((params or {}).items())))
+        if cache and key in self._cache:
+            self.cache_hits += 1
+            return self._cache[key]
+
+        response = self._request("GET", path, params=params)
+        if cache and response.status_code == 200:
+            self._cache[key] = response
+        return response
+
+    def get_json(self, path, params=None, cache=True):
+        """Decoded body of a successful GET; raises ApiError otherwise."""
+        key = (path, tuple(sorted((params or {}).items())))
+        stored = self.etag_store.get(key) if self.etag_store is not None else None
+        if stored is None:
+            response = self.get(path, params=params, cache=cache)
+        elif cache and key in self._cache:
+            self.cache_hits += 1
+            response = self._cache[key]
+        else:
+            response = self._request("GET", path, params=params, headers={"If-None-Match": stored[0]})
+            if response.status_code == 304:
+                self.not_modified += 1
+                return stored[1]
+            if cache and response.status_code == 200:
+                self._cache[key] = response
+        if response.status_code != 200:
+            raise ApiError(response.status_code, response.text)
+
+        body = response.json()
+        etag = response.headers.get("ETag")
+        if self.etag_store is not None and etag:
+            self.etag_store[key] = (etag, body)
+        return body
+
+    def post(self, path, **kwargs):
+        self.clear_cache()
+        return self._request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        self.clear_cache()
+        return self._request("PUT", path, **kwargs)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def close(self):
+        self.session.close()
@@ -4,15 +4,19 @@ import pandas as pd
 import numpy as np
 import time
 import random
-import uuid
 import json
 import math
+import os
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import plotly.express as px
 from PIL import Image
 import pydeck as pdk
 
+from api_client import ApiClient, ApiError, build_session
+from simulation_engine import (SCENARIO_LOCATIONS, SCENARIO_START, ApiBackend, load_results, run_simulation,
+                               scripted_day)
+
 API_BASE_URL = "http://localhost:8000"  # Your FastAPI endpoint
 
 BENGALURU_LAT = 12.9716
@@ -59,47 +63,99 @@ if 'destination_location' not in st.session_state:
     st.session_state.destination_location = None
 if 'pickup_location' not in st.session_state:
     st.session_state.pickup_location = None
-if 'simulation_active' not in st.session_state:
-    st.session_state.simulation_active = False
 if 'simulation_step' not in st.session_state:
     st.session_state.simulation_step = 0
-if 'simulation_trips' not in st.session_state:
-    st.session_state.simulation_trips = []
+if 'simulation_results' not in st.session_state:
+    st.session_state.simulation_results = None  # Event log from simulation_engine
+if 'fleet_results' not in st.session_state:
+    st.session_state.fleet_results = None  # (events, drivers) loaded from a saved engine run
 if 'simulation_log' not in st.session_state:
     st.session_state.simulation_log = []
 if 'total_earnings' not in st.session_state:
     st.session_state.total_earnings = 0
 if 'simulation_time' not in st.session_state:
-    st.session_state.simulation_time = datetime(2023, 11, 14, 8, 0, 0)  # Starting at 8 AM
+    st.session_state.simulation_time = SCENARIO_START  # Starting at 8 AM
+
+@st.cache_resource
+def get_http_session():
+    """One keep-alive connection pool shared by every rerun and browser session"""
+    return build_session(pool_size=10)
+
+@st.cache_resource
+def get_etag_store():
+    """ETags and bodies of revalidated reads, kept across reruns"""
+    return {}
+
+# A fresh client per rerun: reads are cached for this run only, connections are reused
+api = ApiClient(API_BASE_URL, session=get_http_session(), etag_store=get_etag_store())
+
+# Cached reads: TTLs bound staleness from other clients, and every mutating helper
+# below clears the entries it may have changed, so a rerun only refetches those
+DRIVERS_TTL = 60
+DRIVER_TTL = 60
+STATS_TTL = 15
+TRIPS_TTL = 15
+LOCATIONS_TTL = 300
+
+@st.cache_data(ttl=DRIVERS_TTL, show_spinner=False)
+def fetch_drivers():
+    return api.get_json("/drivers/")
+
+@st.cache_data(ttl=DRIVER_TTL, show_spinner=False)
+def fetch_driver_details(driver_id):
+    return api.get_json(f"/drivers/{driver_id}")
+
+@st.cache_data(ttl=STATS_TTL, show_spinner=False)
+def fetch_driver_stats(driver_id):
+    return api.get_json(f"/drivers/{driver_id}/daily-stats")
+
+@st.cache_data(ttl=TRIPS_TTL, show_spinner=False)
+def fetch_trips(driver_id=None):
+    return api.get_json("/trips/", params={"driver_id": driver_id} if driver_id else None)
+
+@st.cache_data(ttl=STATS_TTL, show_spinner=False)
+def fetch_dashboard(driver_id):
+    # Revalidated with If-None-Match once the TTL lapses, so an unchanged dashboard costs a 304
+    return api.get_json(f"/drivers/{driver_id}/dashboard")
+
+@st.cache_data(ttl=LOCATIONS_TTL, show_spinner=False)
+def fetch_locations():
+    return api.get_json("/locations/")
+
+def invalidate_driver(driver_id):
+    """Drop cached reads a write for this driver may have changed"""
+    fetch_driver_details.clear(driver_id)
+    fetch_driver_stats.clear(driver_id)
+    fetch_dashboard.clear(driver_id)
+    fetch_trips.clear(driver_id)
+    fetch_trips.clear(None)
+    # The driver list embeds each driver's current location
+    fetch_drivers.clear()
 
 def get_all_drivers():
     try:
-        response = requests.get(f"{API_BASE_URL}/drivers/")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to fetch drivers: {response.text}")
-            return []
+        return fetch_drivers()
+    except ApiError as e:
+        st.error(f"Failed to fetch drivers: {e.text}")
+        return []
     except Exception as e:
         st.error(f"API connection error: {str(e)}")
         return []
 
 def get_driver_stats(driver_id):
     try:
-        response = requests.get(f"{API_BASE_URL}/drivers/{driver_id}/daily-stats")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.warning(f"No daily stats for driver, creating new: {response.text}")
-            return {
-                "distance_covered_today": 0,
-                "coins_earned": 0,
-                "hours_active": 0,
-                "consecutive_trips": 0,
-                "multiplier_active": False,
-                "multiplier_value": 1.0,
-                "go_home_mode_active": False
-            }
+        return fetch_driver_stats(driver_id)
+    except ApiError as e:
+        st.warning(f"No daily stats for driver, creating new: {e.text}")
+        return {
+            "distance_covered_today": 0,
+            "coins_earned": 0,
+            "hours_active": 0,
+            "consecutive_trips": 0,
+            "multiplier_active": False,
+            "multiplier_value": 1.0,
+            "go_home_mode_active": False
+        }
     except Exception as e:
         st.error(f"API connection error: {str(e)}")
         return None
@@ -107,28 +163,31 @@ def get_driver_stats(driver_id):
 def get_trips(driver_id=None):
     """Get trips from the API"""
     try:
-        params = {}
-        if driver_id:
-            params["driver_id"] = driver_id
-            
-        response = requests.get(f"{API_BASE_URL}/trips/", params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.warning(f"Failed to fetch trips: {response.text}")
-            return []
+        return fetch_trips(driver_id)
+    except ApiError as e:
+        st.warning(f"Failed to fetch trips: {e.text}")
+        return []
     except Exception as e:
         st.warning(f"API connection error when getting trips: {str(e)}")
         return []
 
 def get_driver_details(driver_id):
     try:
-        response = requests.get(f"{API_BASE_URL}/drivers/{driver_id}")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to fetch driver details: {response.text}")
-            return None
+        return fetch_driver_details(driver_id)
+    except ApiError as e:
+        st.error(f"Failed to fetch driver details: {e.text}")
+        return None
+    except Exception as e:
+        st.error(f"API connection error: {str(e)}")
+        return None
+
+def get_driver_dashboard(driver_id):
+    """Profile, today's stats and recent trips in one request"""
+    try:
+        return fetch_dashboard(driver_id)
+    except ApiError as e:
+        st.error(f"Failed to fetch driver dashboard: {e.text}")
+        return None
     except Exception as e:
         st.error(f"API connection error: {str(e)}")
         return None
@@ -146,16 +205,6 @@ def toggle_multiplier():
         st.session_state.multiplier_active = True
         st.session_state.multiplier = result.get("multiplier_value", 1.0)
         st.session_state.notification = result.get("message", "Multiplier activated!")
-        
-        if st.session_state.simulation_active:
-            log_entry = {
-                "time": st.session_state.simulation_time.strftime("%I:%M %p"),
-                "action": "Multiplier Activated",
-                "details": f"{st.session_state.multiplier}x multiplier activated",
-                "coins": st.session_state.coins,
-                "distance": st.session_state.distance_today
-            }
-            st.session_state.simulation_log.append(log_entry)
     else:
         st.session_state.notification = result.get("message", "Failed to activate multiplier.")
     
@@ -180,16 +229,6 @@ def toggle_go_home_mode():
             recs = recommendations.get("recommendations", [])
             rec_list = "\n".join([f"• {r['destination_location']} (₹{r['estimated_fare']})" for r in recs[:2]])
             st.session_state.notification += f"\n\nRecommended routes:\n{rec_list}"
-            
-        if st.session_state.simulation_active:
-            log_entry = {
-                "time": st.session_state.simulation_time.strftime("%I:%M %p"),
-                "action": "Go-Home Mode Activated",
-                "details": "Driver is heading home",
-                "coins": st.session_state.coins,
-                "distance": st.session_state.distance_today
-            }
-            st.session_state.simulation_log.append(log_entry)
     else:
         st.session_state.notification = result.get("message", "Failed to activate Go-Home mode.")
     
@@ -218,12 +257,10 @@ def complete_trip():
 
 def get_locations():
     try:
-        response = requests.get(f"{API_BASE_URL}/locations/")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to fetch locations: {response.text}")
-            return []
+        return fetch_locations()
+    except ApiError as e:
+        st.error(f"Failed to fetch locations: {e.text}")
+        return []
     except Exception as e:
         st.error(f"API connection error: {str(e)}")
         return []
@@ -237,7 +274,8 @@ def create_location(location_name, latitude, longitude):
             "longitude": longitude
         }
         
-        response = requests.post(f"{API_BASE_URL}/locations/", json=location_data)
+        response = api.post("/locations/", json=location_data)
+        fetch_locations.clear()
         if response.status_code == 200:
             return response.json()
         else:
@@ -250,10 +288,12 @@ def create_location(location_name, latitude, longitude):
 def process_trip(trip_id):
     """Process a trip in the API with better error handling"""
     try:
-        response = requests.post(f"{API_BASE_URL}/trips/{trip_id}/process")
+        response = api.post(f"/trips/{trip_id}/process")
         
         if response.status_code == 200:
-            return response.json()
+            result = response.json()
+            invalidate_driver(result["driver_id"])
+            return result
         else:
             try:
                 error_json = response.json()
@@ -279,7 +319,8 @@ def create_trip(trip_data):
         # st.write("DEBUG - Trip Data:")
         # st.json(trip_data)  # Use st.json for proper formatting
         
-        response = requests.post(f"{API_BASE_URL}/trips/", json=trip_data)
+        response = api.post("/trips/", json=trip_data)
+        invalidate_driver(trip_data["driver_id"])
         
         if response.status_code != 200:
             st.error(f"API Response ({response.status_code}):")
@@ -316,11 +357,12 @@ def create_trip(trip_data):
 def process_cancellation(cancellation_data):
     """Create and process a cancellation via the API"""
     try:
-        response = requests.post(f"{API_BASE_URL}/cancellations/", json=cancellation_data)
+        response = api.post("/cancellations/", json=cancellation_data)
+        invalidate_driver(cancellation_data["driver_id"])
         if response.status_code == 200:
             cancellation_id = response.json()["cancellation_id"]
             
-            process_response = requests.post(f"{API_BASE_URL}/cancellations/{cancellation_id}/process")
+            process_response = api.post(f"/cancellations/{cancellation_id}/process")
             if process_response.status_code == 200:
                 return process_response.json()
             else:
@@ -336,7 +378,8 @@ def process_cancellation(cancellation_data):
 def activate_multiplier(driver_id):
     """Activate a driver's multiplier via the API"""
     try:
-        response = requests.post(f"{API_BASE_URL}/drivers/{driver_id}/activate-multiplier")
+        response = api.post(f"/drivers/{driver_id}/activate-multiplier")
+        invalidate_driver(driver_id)
         if response.status_code == 200:
             return response.json()
         else:
@@ -349,7 +392,8 @@ def activate_multiplier(driver_id):
 def activate_go_home(driver_id):
     """Activate go-home mode via the API"""
     try:
-        response = requests.post(f"{API_BASE_URL}/drivers/{driver_id}/activate-go-home")
+        response = api.post(f"/drivers/{driver_id}/activate-go-home")
+        invalidate_driver(driver_id)
         if response.status_code == 200:
             return response.json()
         else:
@@ -362,7 +406,7 @@ def activate_go_home(driver_id):
 def get_go_home_recommendations(driver_id):
     """Get go-home recommendations via the API"""
     try:
-        response = requests.get(f"{API_BASE_URL}/drivers/{driver_id}/go-home-recommendations")
+        response = api.get(f"/drivers/{driver_id}/go-home-recommendations")
         if response.status_code == 200:
             return response.json()
         else:
@@ -372,360 +416,9 @@ def get_go_home_recommendations(driver_id):
         st.error(f"API connection error: {str(e)}")
         return None
 
-def create_simulation_data():
-    """Create the predefined simulation trip data based on the scenario"""
-    if st.session_state.simulation_trips:
-        return  
-    
-    locations = {
-        "Shanti Nagar": {"lat": 12.9716, "lon": 77.5946},
-        "Koramangala": {"lat": 12.9279, "lon": 77.6271},
-        "Silk Board": {"lat": 12.9161, "lon": 77.6226},
-        "Jayanagar": {"lat": 12.9299, "lon": 77.5833},
-        "Electronic City": {"lat": 12.8445, "lon": 77.6612},
-        "Whitefield": {"lat": 12.9698, "lon": 77.7499},
-        "M. Chinnaswamy Stadium": {"lat": 12.9788, "lon": 77.5996},
-        "Indiranagar": {"lat": 12.9784, "lon": 77.6408},
-        "Domlur": {"lat": 12.9609, "lon": 77.6378},
-        "Ejipura": {"lat": 12.9432, "lon": 77.6266}
-    }
-    
-    create_simulation_locations(locations)
-    
-    # Trip 1: Shanti Nagar → Koramangala (8:15 AM)
-    trip1 = {
-        'trip_id': 'T001',
-        'pickup_location': "Shanti Nagar",
-        'destination_location': "Koramangala",
-        'estimated_trip_distance_km': 5.2,
-        'distance_to_pickup_km': 0.8,
-        'traffic_factor': 0.85,  # Morning traffic
-        'time_of_day': 'Morning',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 108,
-        'trip_duration_minutes': 22,
-        'pickup_coords': locations["Shanti Nagar"],
-        'destination_coords': locations["Koramangala"],
-        'simulation_time': datetime(2023, 11, 14, 8, 15, 0)
-    }
-    
-    # Trip 2: Koramangala → Silk Board (8:50 AM)
-    trip2 = {
-        'trip_id': 'T002',
-        'pickup_location': "Koramangala",
-        'destination_location': "Silk Board",
-        'estimated_trip_distance_km': 4.5,
-        'distance_to_pickup_km': 1.2,
-        'traffic_factor': 0.95,  # Very heavy traffic
-        'time_of_day': 'Morning',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 97.5,
-        'trip_duration_minutes': 35,
-        'pickup_coords': locations["Koramangala"],
-        'destination_coords': locations["Silk Board"],
-        'simulation_time': datetime(2023, 11, 14, 8, 50, 0)
-    }
-    
-    # Cancellation 1: Vehicle issue (9:40 AM)
-    cancel1 = {
-        'cancellation_id': 'C001',
-        'reason': 'vehicle_damage',
-        'time_since_accept_seconds': 45,
-        'simulation_time': datetime(2023, 11, 14, 9, 40, 0)
-    }
-    
-    # Trip 4: Silk Board → Jayanagar (10:30 AM)
-    trip4 = {
-        'trip_id': 'T004',
-        'pickup_location': "Silk Board",
-        'destination_location': "Jayanagar",
-        'estimated_trip_distance_km': 7.8,
-        'distance_to_pickup_km': 0.9,
-        'traffic_factor': 0.65,  # Moderate traffic
-        'time_of_day': 'Morning',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 147,
-        'trip_duration_minutes': 28,
-        'pickup_coords': locations["Silk Board"],
-        'destination_coords': locations["Jayanagar"],
-        'simulation_time': datetime(2023, 11, 14, 10, 30, 0)
-    }
-    
-    # Trip 5: Jayanagar → Electronic City (11:15 AM)
-    trip5 = {
-        'trip_id': 'T005',
-        'pickup_location': "Jayanagar",
-        'destination_location': "Electronic City",
-        'estimated_trip_distance_km': 14.5,
-        'distance_to_pickup_km': 1.2,
-        'traffic_factor': 0.7,
-        'time_of_day': 'Afternoon',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 247.5,
-        'trip_duration_minutes': 42,
-        'pickup_coords': locations["Jayanagar"],
-        'destination_coords': locations["Electronic City"],
-        'simulation_time': datetime(2023, 11, 14, 11, 15, 0)
-    }
-    
-    # Activate multiplier (1:00 PM)
-    multiplier = {
-        'action': 'activate_multiplier',
-        'simulation_time': datetime(2023, 11, 14, 13, 0, 0)
-    }
-    
-    # Trip 6: Electronic City → Whitefield (1:30 PM)
-    trip6 = {
-        'trip_id': 'T006',
-        'pickup_location': "Electronic City",
-        'destination_location': "Whitefield",
-        'estimated_trip_distance_km': 13.2,
-        'distance_to_pickup_km': 1.5,
-        'traffic_factor': 0.6,
-        'time_of_day': 'Afternoon',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 228,
-        'trip_duration_minutes': 38,
-        'pickup_coords': locations["Electronic City"],
-        'destination_coords': locations["Whitefield"],
-        'simulation_time': datetime(2023, 11, 14, 13, 30, 0)
-    }
-    
-    # Cancellation 2: Driver preference (2:30 PM)
-    cancel2 = {
-        'cancellation_id': 'C002',
-        'reason': 'destination_too_far',
-        'time_since_accept_seconds': 120,
-        'simulation_time': datetime(2023, 11, 14, 14, 30, 0)
-    }
-    
-    # Trip 8: Whitefield → M. Chinnaswamy Stadium (3:30 PM)
-    trip8 = {
-        'trip_id': 'T008',
-        'pickup_location': "Whitefield",
-        'destination_location': "M. Chinnaswamy Stadium",
-        'estimated_trip_distance_km': 11.8,
-        'distance_to_pickup_km': 1.2,
-        'traffic_factor': 0.8,  # Higher for event
-        'time_of_day': 'Afternoon',
-        'at_event': True,
-        'event_type': 'Cricket Match',
-        'base_fare': 30,
-        'base_trip_fare': 207,
-        'trip_duration_minutes': 45,
-        'pickup_coords': locations["Whitefield"],
-        'destination_coords': locations["M. Chinnaswamy Stadium"],
-        'simulation_time': datetime(2023, 11, 14, 15, 30, 0)
-    }
-    
-    # Trip 9: M. Chinnaswamy Stadium → Whitefield (5:15 PM)
-    trip9 = {
-        'trip_id': 'T009',
-        'pickup_location': "M. Chinnaswamy Stadium",
-        'destination_location': "Whitefield",
-        'estimated_trip_distance_km': 16.5,
-        'distance_to_pickup_km': 0.8,
-        'traffic_factor': 0.9,  # Heavy evening traffic
-        'time_of_day': 'Evening',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 277.5,
-        'trip_duration_minutes': 65,
-        'pickup_coords': locations["M. Chinnaswamy Stadium"],
-        'destination_coords': locations["Whitefield"],
-        'simulation_time': datetime(2023, 11, 14, 17, 15, 0)
-    }
-    
-    # Trip 10: Whitefield → Koramangala (7:00 PM)
-    trip10 = {
-        'trip_id': 'T010',
-        'pickup_location': "Whitefield",
-        'destination_location': "Koramangala",
-        'estimated_trip_distance_km': 9.2,
-        'distance_to_pickup_km': 1.4,
-        'traffic_factor': 0.75,
-        'time_of_day': 'Evening',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 168,
-        'trip_duration_minutes': 35,
-        'pickup_coords': locations["Whitefield"],
-        'destination_coords': locations["Koramangala"],
-        'simulation_time': datetime(2023, 11, 14, 19, 0, 0)
-    }
-    
-    # Activate Go-Home Mode (9:00 PM)
-    go_home = {
-        'action': 'activate_go_home',
-        'simulation_time': datetime(2023, 11, 14, 21, 0, 0)
-    }
-    
-    # Final Go-Home Trip: Koramangala → Indiranagar (9:15 PM)
-    trip_home = {
-        'trip_id': 'HOME-A',
-        'pickup_location': "Koramangala",
-        'destination_location': "Indiranagar",
-        'estimated_trip_distance_km': 5.8,
-        'distance_to_pickup_km': 0.5,
-        'traffic_factor': 0.6,
-        'time_of_day': 'Night',
-        'at_event': False,
-        'event_type': None,
-        'base_fare': 30,
-        'base_trip_fare': 117,
-        'trip_duration_minutes': 22,
-        'pickup_coords': locations["Koramangala"],
-        'destination_coords': locations["Indiranagar"],
-        'simulation_time': datetime(2023, 11, 14, 21, 15, 0)
-    }
-    
-    st.session_state.simulation_trips = [
-        trip1, trip2, cancel1, trip4, trip5, multiplier, 
-        trip6, cancel2, trip8, trip9, trip10, go_home, trip_home
-    ]
-
-def create_simulation_locations(locations):
-    """Create locations for the simulation in the database if they don't exist"""
-    existing_locations = get_locations()
-    existing_names = [loc["location_name"] for loc in existing_locations]
-    
-    for name, coords in locations.items():
-        if name not in existing_names:
-            create_location(name, coords["lat"], coords["lon"])
-    
-    updated_locations = get_locations()
-    st.session_state.all_locations = updated_locations
-    
-    return updated_locations
-
-def handle_trip_event(trip, driver_id):
-    """Process a trip event in the simulation with better error handling"""
-    locations = ensure_simulation_locations()
-    
-    pickup_id = None
-    destination_id = None
-    
-    for loc in locations:
-        if loc["location_name"] == trip["pickup_location"]:
-            pickup_id = loc["location_id"]
-        if loc["location_name"] == trip["destination_location"]:
-            destination_id = loc["location_id"]
-    
-    if not pickup_id:
-        st.warning(f"Creating pickup location: {trip['pickup_location']}")
-        pickup_coords = trip["pickup_coords"]
-        new_loc = create_location(trip["pickup_location"], pickup_coords["lat"], pickup_coords["lon"])
-        if new_loc:
-            pickup_id = new_loc["location_id"]
-        else:
-            st.error(f"Failed to create pickup location: {trip['pickup_location']}")
-            return False
-    
-    if not destination_id:
-        st.warning(f"Creating destination location: {trip['destination_location']}")
-        dest_coords = trip["destination_coords"]
-        new_loc = create_location(trip["destination_location"], dest_coords["lat"], dest_coords["lon"])
-        if new_loc:
-            destination_id = new_loc["location_id"]
-        else:
-            st.error(f"Failed to create destination location: {trip['destination_location']}")
-            return False
-    
-    import time
-    trip_id = f"{trip['trip_id']}-{int(time.time())}"
-    
-    trip_data = {
-        "trip_id": trip_id,  # Use the unique ID
-        "driver_id": driver_id,
-        "pickup_location_id": pickup_id,
-        "destination_location_id": destination_id,
-        "estimated_trip_distance_km": trip["estimated_trip_distance_km"],
-        "distance_to_pickup_km": trip["distance_to_pickup_km"],
-        "traffic_factor": trip["traffic_factor"],
-        "time_of_day": trip["time_of_day"],
-        "at_event": trip["at_event"],
-        "event_type": trip["event_type"],
-        "base_fare": trip["base_fare"],
-        "base_trip_fare": trip["base_trip_fare"],
-        "trip_duration_minutes": trip["trip_duration_minutes"]
-    }
-    
-    created_trip = create_trip(trip_data)
-    
-    if created_trip:
-        st.session_state.trip_stage = "ToPickup"
-        
-        if 'pickup_coords' in trip:
-            st.session_state.pickup_location = (
-                trip['pickup_coords']['lat'], 
-                trip['pickup_coords']['lon']
-            )
-        
-        if 'destination_coords' in trip:
-            st.session_state.destination_location = (
-                trip['destination_coords']['lat'], 
-                trip['destination_coords']['lon']
-            )
-        
-        result = process_trip(created_trip["trip_id"])
-        
-        if result:
-            st.session_state.coins = result.get("new_coins_balance", st.session_state.coins)
-            st.session_state.distance_today = result.get("distance_covered_today", st.session_state.distance_today)
-            st.session_state.trips_today += 1
-            st.session_state.consecutive_trips = result.get("consecutive_trips", st.session_state.consecutive_trips)
-            
-            fare = trip["base_trip_fare"]
-            if st.session_state.multiplier_active:
-                fare *= st.session_state.multiplier
-            
-            st.session_state.total_earnings += fare
-            
-            st.session_state.driver_location = (
-                trip["destination_coords"]["lat"],
-                trip["destination_coords"]["lon"]
-            )
-            
-            log_entry = {
-                "time": trip["simulation_time"].strftime("%I:%M %p"),
-                "action": "Trip Completed",
-                "details": f"{trip['pickup_location']} → {trip['destination_location']} ({trip['estimated_trip_distance_km']} km, ₹{fare:.2f})",
-                "coins": st.session_state.coins,
-                "distance": st.session_state.distance_today
-            }
-            st.session_state.simulation_log.append(log_entry)
-            st.session_state.trip_stage = None
-   
-            return True
-    
-    return False
-
 def ensure_simulation_locations():
     """Make sure all required locations for simulation exist"""
-    locations = {
-        "Shanti Nagar": {"lat": 12.9716, "lon": 77.5946},
-        "Koramangala": {"lat": 12.9279, "lon": 77.6271},
-        "Silk Board": {"lat": 12.9161, "lon": 77.6226},
-        "Jayanagar": {"lat": 12.9299, "lon": 77.5833},
-        "Electronic City": {"lat": 12.8445, "lon": 77.6612},
-        "Whitefield": {"lat": 12.9698, "lon": 77.7499},
-        "M. Chinnaswamy Stadium": {"lat": 12.9788, "lon": 77.5996},
-        "Indiranagar": {"lat": 12.9784, "lon": 77.6408},
-        "Domlur": {"lat": 12.9609, "lon": 77.6378},
-        "Ejipura": {"lat": 12.9432, "lon": 77.6266}
-    }
+    locations = SCENARIO_LOCATIONS
     
     existing_locations = get_locations()
     existing_names = [loc["location_name"] for loc in existing_locations]
@@ -744,36 +437,6 @@ def ensure_simulation_locations():
     
     return existing_locations
 
-def handle_cancellation_event(cancellation, driver_id):
-    """Process a cancellation event in the simulation"""
-    trip_id = cancellation.get("trip_id", f"CANCELLED-{uuid.uuid4().hex[:8]}")
-    
-    cancellation_data = {
-        "driver_id": driver_id,
-        "trip_id": trip_id,
-        "time_since_accept_seconds": cancellation["time_since_accept_seconds"],
-        "reason": cancellation["reason"]
-    }
-    
-    result = process_cancellation(cancellation_data)
-    
-    if result:
-        penalty = result.get("penalty_coins", 0)
-        st.session_state.coins = result.get("new_coins_balance", st.session_state.coins)
-        
-        log_entry = {
-            "time": cancellation["simulation_time"].strftime("%I:%M %p"),
-            "action": "Trip Cancelled",
-            "details": f"Reason: {cancellation['reason']} (Penalty: {penalty} coins)",
-            "coins": st.session_state.coins,
-            "distance": st.session_state.distance_today
-        }
-        st.session_state.simulation_log.append(log_entry)
-        
-        return True
-    
-    return False
-
 def get_route_points(start_lat, start_lon, end_lat, end_lon, num_points=15, randomness=0.0005):
     """
     Generate route points between two locations with some randomness to simulate real routes.
@@ -815,69 +478,6 @@ def get_route_points(start_lat, start_lon, end_lat, end_lon, num_points=15, rand
     
     return points
 
-def handle_multiplier_activation(driver_id):
-    """Handle activating a driver's multiplier"""
-    try:
-        response = requests.post(f"{API_BASE_URL}/drivers/{driver_id}/activate-multiplier")
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            if result.get('success', False):
-                st.session_state.multiplier_active = True  # Set this flag
-                st.session_state.multiplier = result.get('multiplier_value', 1.0)
-                
-                log_entry = {
-                    "time": st.session_state.simulation_time.strftime("%I:%M %p"),
-                    "action": "Multiplier Activated",
-                    "details": f"{st.session_state.multiplier}x fare multiplier for 4 hours!",
-                    "coins": st.session_state.coins,
-                    "distance": st.session_state.distance_today
-                }
-                st.session_state.simulation_log.append(log_entry)
-                
-                return True
-            else:
-                st.error(result.get('message', 'Failed to activate multiplier'))
-                return False
-        else:
-            st.error(f"Failed to activate multiplier: {response.status_code} - {response.text}")
-            return False
-    except Exception as e:
-        st.error(f"API connection error: {str(e)}")
-        return False
-
-def handle_go_home_activation(driver_id):
-    """Handle activating a driver's go-home mode"""
-    try:
-        response = requests.post(f"{API_BASE_URL}/drivers/{driver_id}/activate-go-home")
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            if result.get('success', False):
-                st.session_state.go_home_active = True  # Set this flag
-                
-                log_entry = {
-                    "time": st.session_state.simulation_time.strftime("%I:%M %p"),
-                    "action": "Go-Home Mode Activated",
-                    "details": "Driver is now prioritizing trips toward home",
-                    "coins": st.session_state.coins,
-                    "distance": st.session_state.distance_today
-                }
-                st.session_state.simulation_log.append(log_entry)
-                
-                return True
-            else:
-                st.error(result.get('message', 'Failed to activate go-home mode'))
-                return False
-        else:
-            st.error(f"Failed to activate go-home mode: {response.status_code} - {response.text}")
-            return False
-    except Exception as e:
-        st.error(f"API connection error: {str(e)}")
-        return False
-
 def reset_driver_daily_stats(driver_id):
     """Reset the driver's daily stats to zero at the beginning of the simulation"""
     try:
@@ -893,7 +493,8 @@ def reset_driver_daily_stats(driver_id):
             "stat_date": datetime.now().strftime("%Y-%m-%d")
         }
         
-        response = requests.post(f"{API_BASE_URL}/drivers/{driver_id}/reset-daily-stats", json=payload)
+        response = api.post(f"/drivers/{driver_id}/reset-daily-stats", json=payload)
+        invalidate_driver(driver_id)
         
         if response.status_code == 200:
             st.success("Driver stats reset for today's simulation")
@@ -905,36 +506,100 @@ def reset_driver_daily_stats(driver_id):
         st.error(f"API connection error when resetting stats: {str(e)}")
         return False
 
-def run_simulation_step():
-    """Run a single step of the simulation"""
-    if st.session_state.simulation_step == 0 and st.session_state.simulation_active:
-        if 'selected_driver' in st.session_state:
-            reset_driver_daily_stats(st.session_state.selected_driver)
-    
-    if st.session_state.simulation_step >= len(st.session_state.simulation_trips):
-        st.session_state.simulation_active = False
+def run_day_simulation(driver_id):
+    """Run the scripted day for one driver through the API with the headless engine"""
+    driver = get_driver_details(driver_id)
+    if not driver:
         return False
     
-    current_event = st.session_state.simulation_trips[st.session_state.simulation_step]
-    
-    st.session_state.simulation_time = current_event["simulation_time"]
-    
-    success = False
+    backend = ApiBackend(API_BASE_URL, workers=1, session=get_http_session())
+    try:
+        log = run_simulation([dict(driver, start_location="Shanti Nagar")], [scripted_day()], backend)
+    except (requests.RequestException, RuntimeError) as e:
+        st.error(f"Simulation failed: {str(e)}")
+        return False
+    finally:
+        backend.close()
+        invalidate_driver(driver_id)
+        fetch_locations.clear()
     
-    if "action" in current_event:
-        # Special action
-        if current_event["action"] == "activate_multiplier":
-            success = handle_multiplier_activation(st.session_state.selected_driver)
-        elif current_event["action"] == "activate_go_home":
-            success = handle_go_home_activation(st.session_state.selected_driver)
-    elif "cancellation_id" in current_event:
-        success = handle_cancellation_event(current_event, st.session_state.selected_driver)
-    else:
-        success = handle_trip_event(current_event, st.session_state.selected_driver)
+    load_simulation_results(log)
+    return True
+
+def load_simulation_results(log):
+    """View one driver's engine event log, positioned at its last event"""
+    st.session_state.simulation_results = log.reset_index(drop=True)
+    show_simulation_step(len(log))
+
+def show_simulation_step(step):
+    """Set the phone, log and metrics to the driver's state after `step` logged events"""
+    log = st.session_state.simulation_results
+    shown = log.iloc[:step]
+    
+    st.session_state.simulation_step = step
+    st.session_state.simulation_log = [{
+        "time": SCENARIO_START.strftime("%I:%M %p"),
+        "action": "Simulation Started",
+        "details": "Driver begins the day at Shanti Nagar",
+        "coins": 0,
+        "distance": 0
+    }]
+    st.session_state.simulation_log += shown[["time", "action", "details", "coins", "distance"]].to_dict("records")
+    
+    if shown.empty:
+        start = SCENARIO_LOCATIONS["Shanti Nagar"]
+        st.session_state.update(
+            coins=0, distance_today=0, trips_today=0, consecutive_trips=0, total_earnings=0,
+            multiplier=1.0, multiplier_active=False, go_home_active=False,
+            driver_location=(start["lat"], start["lon"]), simulation_time=SCENARIO_START
+        )
+        return
     
-    st.session_state.simulation_step += 1
+    last = shown.iloc[-1]
+    st.session_state.coins = int(last["coins"])
+    st.session_state.distance_today = float(last["distance"])
+    st.session_state.trips_today = int(last["trips"])
+    st.session_state.consecutive_trips = int(last["consecutive_trips"])
+    st.session_state.total_earnings = float(last["earnings"])
+    st.session_state.multiplier = float(last["multiplier"])
+    st.session_state.multiplier_active = bool(last["multiplier_active"])
+    st.session_state.go_home_active = bool(last["go_home_active"])
+    st.session_state.driver_location = (float(last["driver_lat"]), float(last["driver_lon"]))
+    st.session_state.simulation_time = last["simulation_time"]
+    
+    if step == len(log):
+        st.session_state.simulation_log.append({
+            "time": "10:00 PM",
+            "action": "Simulation Complete",
+            "details": f"Day summary: {st.session_state.trips_today} trips, {st.session_state.distance_today:.1f} km, ₹{st.session_state.total_earnings:.2f} earned, {st.session_state.coins} coins",
+            "coins": st.session_state.coins,
+            "distance": st.session_state.distance_today
+        })
+
+def render_fleet_results():
+    """Summarise a saved fleet run from simulation_engine and replay any of its drivers"""
+    events, drivers = st.session_state.fleet_results
     
-    return success
+    st.subheader("Fleet Simulation Results")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Drivers", f"{len(drivers):,}")
+    with col2:
+        st.metric("Avg Coins", f"{drivers['coins'].mean():.1f}")
+    with col3:
+        st.metric("Avg Earnings", f"₹{drivers['earnings'].mean():.2f}")
+    with col4:
+        st.metric("Multiplier Uptake", f"{(drivers['multiplier'] > 1).mean():.0%}")
+    
+    fig = px.histogram(drivers, x="coins", nbins=40, title="End-of-Day Coins per Driver")
+    fig.update_layout(height=300)
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(drivers, use_container_width=True)
+    
+    replay_driver = st.selectbox("Replay a driver's day", options=drivers["driver_id"].tolist(), key="fleet_driver")
+    if st.button("Replay Driver", key="fleet_replay"):
+        load_simulation_results(events[events["driver_id"] == replay_driver])
+        st.rerun()
 
 def render_driver_phone():
     """Render the phone interface with integrated map during trips"""
@@ -979,7 +644,7 @@ def render_driver_phone():
         """, unsafe_allow_html=True)
         
         # Phone header with current time
-        current_time = st.session_state.simulation_time.strftime("%I:%M %p") if st.session_state.simulation_active else datetime.now().strftime("%I:%M %p")
+        current_time = st.session_state.simulation_time.strftime("%I:%M %p") if st.session_state.simulation_step > 0 else datetime.now().strftime("%I:%M %p")
         
         st.markdown(f"""
         <div class="phone-frame">
@@ -1048,57 +713,28 @@ def render_driver_phone():
             if st.button("Complete Trip", key="complete_trip_btn"):
                 complete_trip()
         
-        if not st.session_state.simulation_active:
-            if st.button("Run Full Day Simulation", key="start_sim"):
-                if 'selected_driver' in st.session_state:
-                    reset_driver_daily_stats(st.session_state.selected_driver)
-                    
-                create_simulation_data()
-                st.session_state.simulation_step = 0
-                st.session_state.simulation_log = []
-                st.session_state.total_earnings = 0
-                st.session_state.coins = 0
-                st.session_state.distance_today = 0
-                st.session_state.trips_today = 0
-                st.session_state.consecutive_trips = 0
-                st.session_state.multiplier = 1.0
-                st.session_state.multiplier_active = False
-                st.session_state.go_home_active = False
-                st.session_state.simulation_time = datetime(2023, 11, 14, 8, 0, 0)
-                
-                st.session_state.simulation_active = True
-                
-                st.session_state.simulation_log.append({
-                    "time": "8:00 AM",
-                    "action": "Simulation Started",
-                    "details": "Driver begins the day at Shanti Nagar",
-                    "coins": 0,
-                    "distance": 0
-                })
-                
+        if st.button("Run Full Day Simulation", key="start_sim"):
+            if 'selected_driver' in st.session_state:
+                run_day_simulation(st.session_state.selected_driver)
                 st.rerun()
-            else:
-                if st.button("Stop Simulation", key="stop_sim"):
-                    st.session_state.simulation_active = False
-                    st.rerun()
-                    
-            if st.session_state.driver_mode == "Available" and not st.session_state.simulation_active:
-                st.markdown("""
-                <div style="text-align:center; margin:20px 0;">
-                    <p>You're online and available for rides</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                col1, col2 = st.columns(2)
-                
-                # with col1:
-                #     if st.button("Activate Multiplier", key="multiplier_btn"):
-                #         toggle_multiplier()
-                
-                # with col2:
-                #     if st.button("Go-Home Mode", key="go_home_btn"):
-                #         toggle_go_home_mode()
         
+        if st.session_state.driver_mode == "Available" and st.session_state.simulation_step == 0:
+            st.markdown("""
+            <div style="text-align:center; margin:20px 0;">
+                <p>You're online and available for rides</p>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            col1, col2 = st.columns(2)
+            
+            # with col1:
+            #     if st.button("Activate Multiplier", key="multiplier_btn"):
+            #         toggle_multiplier()
+            
+            # with col2:
+            #     if st.button("Go-Home Mode", key="go_home_btn"):
+            #         toggle_go_home_mode()
+    
         # Display simulation log
         if st.session_state.simulation_log:
             st.markdown("<h3>Driver Activity Log</h3>", unsafe_allow_html=True)
@@ -1315,7 +951,7 @@ def render_map():
 
 def render_progress_metrics():
     """Render metrics showing progress toward daily targets"""
-    if st.session_state.simulation_active or st.session_state.simulation_step > 0:
+    if st.session_state.simulation_step > 0:
         col1, col2 = st.columns(2)
         
         # Target distance progress
@@ -1370,7 +1006,7 @@ def render_progress_metrics():
             else:
                 st.info("Complete trips to see earnings breakdown")
 
-def render_driver_stats(driver_id, driver_data, stats_data):
+def render_driver_stats(driver_id, driver_data, stats_data, recent_trips):
     """Render the driver's statistics and information"""
     
     # Driver profile card
@@ -1404,12 +1040,11 @@ def render_driver_stats(driver_id, driver_data, stats_data):
         with col3:
             st.metric("Total Earnings", f"₹{st.session_state.total_earnings:.2f}")
         
-        trips = get_trips(driver_id)
-        if trips:
-            st.subheader("Trip History")
+        if recent_trips:
+            st.subheader("Recent Trips")
             
             trip_data = []
-            for trip in trips:
+            for trip in recent_trips:
                 trip_data.append({
                     "Trip ID": trip["trip_id"],
                     "Distance": f"{trip['estimated_trip_distance_km']} km",
@@ -1479,8 +1114,10 @@ def main():
         
         st.session_state.selected_driver = selected_driver
         
-        driver_data = get_driver_details(selected_driver)
-        driver_stats = get_driver_stats(selected_driver)
+        dashboard = get_driver_dashboard(selected_driver)
+        driver_data = dashboard["driver"] if dashboard else None
+        driver_stats = dashboard["stats"] if dashboard else None
+        recent_trips = dashboard["recent_trips"] if dashboard else []
         
         st.header("Simulation Settings")
         if st.button("Load/Create Bengaluru Locations"):
@@ -1493,7 +1130,7 @@ def main():
                 
             st.session_state.simulation_step = 0
             st.session_state.simulation_log = []
-            st.session_state.simulation_active = False
+            st.session_state.simulation_results = None
             st.session_state.total_earnings = 0
             st.session_state.coins = 0
             st.session_state.distance_today = 0
@@ -1503,11 +1140,26 @@ def main():
             st.session_state.multiplier_active = False
             st.session_state.go_home_active = False
             st.session_state.driver_location = (BENGALURU_LAT, BENGALURU_LON)
-            st.session_state.simulation_time = datetime(2023, 11, 14, 8, 0, 0)
+            st.session_state.simulation_time = SCENARIO_START
             st.rerun()
+        
+        log = st.session_state.simulation_results
+        if log is not None and len(log) > 0:
+            st.header("Simulation Replay")
+            step = st.slider("Events shown", 0, len(log), st.session_state.simulation_step)
+            if step != st.session_state.simulation_step:
+                show_simulation_step(step)
+        
+        st.header("Fleet Results")
+        results_dir = st.text_input("Engine output directory", value="simulation_results")
+        if st.button("Load Fleet Results"):
+            if os.path.exists(os.path.join(results_dir, "events.parquet")):
+                st.session_state.fleet_results = load_results(results_dir)
+            else:
+                st.error(f"No results in {results_dir}. Run: python simulation_engine.py --output {results_dir}")
     
     if driver_stats:
-        if not st.session_state.simulation_active and st.session_state.simulation_step == 0:
+        if st.session_state.simulation_step == 0:
             st.session_state.coins = driver_stats.get("coins_earned", 0)
             st.session_state.distance_today = driver_stats.get("distance_covered_today", 0)
             st.session_state.consecutive_trips = driver_stats.get("consecutive_trips", 0)
@@ -1521,7 +1173,7 @@ def main():
         render_driver_phone()
     
     with col2:
-        render_driver_stats(selected_driver, driver_data, driver_stats)
+        render_driver_stats(selected_driver, driver_data, driver_stats, recent_trips)
         render_progress_metrics()
     if st.button("Ensure Locations Exist", key="create_locations"):
         locations = ensure_simulation_locations()
@@ -1547,28 +1199,12 @@ def main():
             result = create_trip(test_trip)
             if result:
                 st.success("Test trip created successfully!")
-    if st.session_state.simulation_active:
-        ensure_simulation_locations()
-        run_simulation_step()
-        
-        if st.session_state.simulation_step < len(st.session_state.simulation_trips):
-            placeholder = st.empty()
-            time.sleep(2)  
-            placeholder.text("")  
-            st.rerun()
-        else:
-            st.session_state.simulation_active = False
-            
-            st.session_state.simulation_log.append({
-                "time": "10:00 PM",
-                "action": "Simulation Complete",
-                "details": f"Day summary: {st.session_state.trips_today} trips, {st.session_state.distance_today:.1f} km, ₹{st.session_state.total_earnings:.2f} earned, {st.session_state.coins} coins",
-                "coins": st.session_state.coins,
-                "distance": st.session_state.distance_today
-            })
-            
-            st.success("Full day simulation complete!")
-            st.balloons()
+    if st.session_state.fleet_results is not None:
+        render_fleet_results()
+    
+    with st.sidebar:
+        st.caption(f"API: {api.requests_sent} requests sent, {api.cache_hits} reads served from cache, "
+                   f"{api.not_modified} not modified this run")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
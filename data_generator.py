@@ -1,13 +1,18 @@
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
-import uuid
+from datetime import datetime
 import time
 import threading
+import os
+import sys
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
-# Set random seed for reproducibility
-np.random.seed(42)
+# Default random stream for reproducibility. Every generator also accepts an
+# explicit numpy Generator so parallel shards can draw from independent streams.
+DEFAULT_SEED = 42
+DEFAULT_RNG = np.random.default_rng(DEFAULT_SEED)
 
 BENGALURU_LOCATIONS = {
     'HSR Layout': (12.9116, 77.6474),
@@ -60,157 +65,273 @@ BENGALURU_LOCATIONS = {
     'Whitefield': (12.9698, 77.7499)
 }
 
-def generate_location():
-    """Generate a random location from the defined Bengaluru areas."""
-    location_name = random.choice(list(BENGALURU_LOCATIONS.keys()))
-    base_lat, base_long = BENGALURU_LOCATIONS[location_name]
-
-    lat = base_lat + np.random.uniform(-0.01, 0.01)
-    long = base_long + np.random.uniform(-0.01, 0.01)
-
-    return lat, long, location_name
-
-def generate_driver_data(num_drivers=100):
-    """Generate synthetic data for drivers."""
-    drivers_data = []
-
-    for _ in range(num_drivers):
-        driver_id = str(uuid.uuid4())
-        lat, long, location = generate_location()
-
-        online_status = np.random.choice(['Online', 'Offline'], p=[0.75, 0.25])
-        trip_status = np.random.choice(['Idle', 'En Route', 'Occupied'], p=[0.4, 0.3, 0.3])
-
-        # Historical Performance
-        ride_acceptance_rate = np.random.beta(8, 2) * 100
-        cancellation_rate = np.random.beta(2, 8) * 100
-
-        # Trip Patterns
-        avg_trip_duration = np.random.gamma(2, 10)
-        avg_trip_distance = np.random.gamma(2, 3)
-
-        # Driver Profile
-        experience_years = np.random.randint(1, 11)
-        rating = np.random.uniform(3.0, 5.0)
-        completed_trips = np.random.randint(100, 5000)
-
-        # Time Sensitivity
-        preferred_shift = np.random.choice(['Morning', 'Afternoon', 'Evening', 'Night', 'All Day'])
-        peak_acceptance_rate = min(ride_acceptance_rate + np.random.uniform(0, 10), 100)
-        off_peak_acceptance_rate = min(ride_acceptance_rate - np.random.uniform(0, 10), 100)
-
-        # Trip Type Preference
-        preferred_trip_type = np.random.choice(['Short', 'Long', 'Both'], p=[0.3, 0.3, 0.4])
-
-        # Incentive & Behavior
-        incentive_responsiveness = np.random.uniform(0.5, 1.0)
-        event_sensitivity = np.random.uniform(0.0, 1.0)
-
-        # Namma Yatri Coin System fields
-        daily_avg_distance_km = round(np.random.uniform(40, 120), 2)
-        coins_earned = np.random.randint(0, 100)
-        target_distance_60_percent = round(daily_avg_distance_km * 0.6, 2)
-        target_distance_100_percent = daily_avg_distance_km
-        multiplier_active = np.random.choice([True, False], p=[0.2, 0.8])
-        multiplier_value = 1.25 if 50 <= coins_earned < 100 else 1.5 if coins_earned >= 100 else 1.0
-        multiplier_valid_until = datetime.now() + timedelta(days=np.random.randint(0, 3))
-        distance_covered_today = round(np.random.uniform(0, daily_avg_distance_km), 2)
-        
-        # Home location (random location, but we'll store it)
-        home_lat, home_long, home_location = generate_location()
-
-        drivers_data.append({
-            'driver_id': driver_id,
-            'latitude': lat,
-            'longitude': long,
-            'location': location,
-            'online_status': online_status,
-            'trip_status': trip_status,
-            'ride_acceptance_rate': round(ride_acceptance_rate, 2),
-            'cancellation_rate': round(cancellation_rate, 2),
-            'avg_trip_duration_minutes': round(avg_trip_duration, 2),
-            'avg_trip_distance_km': round(avg_trip_distance, 2),
-            'experience_years': experience_years,
-            'rating': round(rating, 2),
-            'completed_trips': completed_trips,
-            'preferred_shift': preferred_shift,
-            'peak_acceptance_rate': round(peak_acceptance_rate, 2),
-            'off_peak_acceptance_rate': round(off_peak_acceptance_rate, 2),
-            'preferred_trip_type': preferred_trip_type,
-            'incentive_responsiveness': round(incentive_responsiveness, 2),
-            'event_sensitivity': round(event_sensitivity, 2),
-            'daily_avg_distance_km': daily_avg_distance_km,
-            'coins_earned': coins_earned,
-            'target_distance_60_percent': target_distance_60_percent,
-            'target_distance_100_percent': target_distance_100_percent,
-            'multiplier_active': multiplier_active,
-            'multiplier_value': multiplier_value,
-            'multiplier_valid_until': multiplier_valid_until,
-            'distance_covered_today': distance_covered_today,
-            'home_latitude': home_lat,
-            'home_longitude': home_long,
-            'home_location': home_location,
-            'consecutive_trips': np.random.randint(0, 5)
-        })
+# Typed column layout used by the columnar (Parquet/Arrow) output mode.
+# Categories are fixed up front so every file and partition shares one schema.
+LOCATION_CATEGORIES = list(BENGALURU_LOCATIONS.keys())
+SHIFT_CATEGORIES = ['Morning', 'Afternoon', 'Evening', 'Night', 'All Day']
+TIME_OF_DAY_CATEGORIES = ['Morning', 'Afternoon', 'Evening', 'Night']
+URGENCY_CATEGORIES = ['Low', 'Medium', 'High']
+EVENT_TYPE_CATEGORIES = ['None', 'Concert', 'Sports', 'Festival', 'Conference']
+# Known bottlenecks, with heavier traffic than their distance from the centre suggests
+HEAVY_TRAFFIC_LOCATIONS = ['Silk Board', 'Marathahalli', 'KR Puram', 'Hebbal', 'Electronic City']
+
+COLUMNAR_SCHEMAS = {
+    'drivers': {
+        'categories': {
+            'location': LOCATION_CATEGORIES,
+            'home_location': LOCATION_CATEGORIES,
+            'online_status': ['Online', 'Offline'],
+            'trip_status': ['Idle', 'En Route', 'Occupied'],
+            'preferred_shift': SHIFT_CATEGORIES,
+            'preferred_trip_type': ['Short', 'Long', 'Both']
+        },
+        'float32': ['latitude', 'longitude', 'home_latitude', 'home_longitude'],
+        'timestamps': ['multiplier_valid_until'],
+        'booleans': ['multiplier_active'],
+        'partitions': {'location': 'location', 'date': 'multiplier_valid_until'}
+    },
+    'passengers': {
+        'categories': {
+            'pickup_location': LOCATION_CATEGORIES,
+            'destination_location': LOCATION_CATEGORIES,
+            'trip_urgency': URGENCY_CATEGORIES,
+            'ride_frequency': ['Daily', 'Weekly', 'Monthly', 'Occasional'],
+            'time_of_day': TIME_OF_DAY_CATEGORIES,
+            'event_type': EVENT_TYPE_CATEGORIES
+        },
+        'float32': ['pickup_latitude', 'pickup_longitude', 'destination_latitude', 'destination_longitude'],
+        'timestamps': ['request_time'],
+        'booleans': ['at_event'],
+        'partitions': {'location': 'pickup_location', 'date': 'request_time'}
+    },
+    'edges': {
+        'categories': {
+            'driver_location': LOCATION_CATEGORIES,
+            'passenger_pickup_location': LOCATION_CATEGORIES,
+            'passenger_destination_location': LOCATION_CATEGORIES
+        },
+        'float32': [],
+        'timestamps': [],
+        'booleans': ['is_long_distance_pickup', 'is_towards_home'],
+        'partitions': {'location': 'passenger_pickup_location'}
+    },
+    'heatmap': {
+        'categories': {'location': LOCATION_CATEGORIES},
+        'float32': ['latitude', 'longitude'],
+        'timestamps': ['timestamp'],
+        'booleans': [],
+        'partitions': {'location': 'location', 'date': 'timestamp'}
+    },
+    'requests': {
+        'categories': {
+            'pickup_location': LOCATION_CATEGORIES,
+            'destination_location': LOCATION_CATEGORIES,
+            'trip_urgency': URGENCY_CATEGORIES,
+            'time_of_day': TIME_OF_DAY_CATEGORIES,
+            'event_type': EVENT_TYPE_CATEGORIES
+        },
+        'float32': ['pickup_latitude', 'pickup_longitude', 'destination_latitude', 'destination_longitude'],
+        'timestamps': ['request_time'],
+        'booleans': ['at_event'],
+        'partitions': {'location': 'pickup_location', 'date': 'request_time'}
+    }
+}
 
-    return pd.DataFrame(drivers_data)
-
-def generate_passenger_data(num_passengers=200):
-    """Generate synthetic data for passengers."""
-    passengers_data = []
-
-    for _ in range(num_passengers):
-        passenger_id = str(uuid.uuid4())
-        pickup_lat, pickup_long, pickup_location = generate_location()
-
-        destinations = [loc for loc in BENGALURU_LOCATIONS.keys() if loc != pickup_location]
-        destination_location = random.choice(destinations)
-        destination_lat, destination_long = BENGALURU_LOCATIONS[destination_location]
-
-        destination_lat += np.random.uniform(-0.01, 0.01)
-        destination_long += np.random.uniform(-0.01, 0.01)
-
-        trip_urgency = np.random.choice(['Low', 'Medium', 'High'], p=[0.2, 0.5, 0.3])
-
-        lat_diff = destination_lat - pickup_lat
-        long_diff = destination_long - pickup_long
-        trip_distance = np.sqrt((lat_diff * 111)**2 + (long_diff * 111 * np.cos(np.radians(13)))**2)
-
-        ride_frequency = np.random.choice(['Daily', 'Weekly', 'Monthly', 'Occasional'])
-        cancellation_tendency = np.random.beta(2, 8) * 100  # Lower cancellation tendency bias
-        rating = np.random.uniform(3.5, 5.0)
-
-        current_time = datetime.now()
-        minutes_to_add = np.random.randint(0, 1440)  # Random time within next 24 hours
-        request_time = current_time + timedelta(minutes=minutes_to_add)
-        time_of_day = get_time_of_day(request_time.hour)
-
-        at_event = np.random.choice([True, False], p=[0.2, 0.8])
-        event_type = np.random.choice(['None', 'Concert', 'Sports', 'Festival', 'Conference']) if at_event else 'None'
-
-        tip_amount = np.random.choice([0, 10, 20, 30, 50], p=[0.6, 0.2, 0.1, 0.05, 0.05])
-
-        passengers_data.append({
-            'passenger_id': passenger_id,
-            'pickup_latitude': pickup_lat,
-            'pickup_longitude': pickup_long,
-            'pickup_location': pickup_location,
-            'destination_latitude': destination_lat,
-            'destination_longitude': destination_long,
-            'destination_location': destination_location,
-            'trip_urgency': trip_urgency,
-            'estimated_trip_distance_km': round(trip_distance, 2),
-            'ride_frequency': ride_frequency,
-            'cancellation_tendency': round(cancellation_tendency, 2),
-            'passenger_rating': round(rating, 2),
-            'request_time': request_time,
-            'time_of_day': time_of_day,
-            'at_event': at_event,
-            'event_type': event_type,
-            'tip_amount': tip_amount
-        })
+# Array views of BENGALURU_LOCATIONS for the vectorized generators
+LOCATION_NAMES = np.array(LOCATION_CATEGORIES, dtype=object)
+LOCATION_LATS = np.array([BENGALURU_LOCATIONS[name][0] for name in LOCATION_CATEGORIES])
+LOCATION_LONGS = np.array([BENGALURU_LOCATIONS[name][1] for name in LOCATION_CATEGORIES])
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+DATASET_FILES = {
+    'drivers': 'drivers_data',
+    'passengers': 'passengers_data',
+    'edges': 'matching_edges_data',
+    'heatmap': 'heatmap_data'
+}
 
-    return pd.DataFrame(passengers_data)
+def generate_uuids(count, rng=None):
+    """Generate `count` version-4 UUID strings from one draw of the random stream."""
+    rng = rng or DEFAULT_RNG
+    raw = np.frombuffer(rng.bytes(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+
+    # Expand each byte into two lowercase hex digits and splice in the dashes
+    digits = np.empty((count, 32), dtype=np.uint8)
+    digits[:, 0::2] = HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = HEX_DIGITS[raw & 0x0F]
+
+    formatted = np.full((count, 36), ord('-'), dtype=np.uint8)
+    for start, end, offset in ((0, 8, 0), (8, 12, 1), (12, 16, 2), (16, 20, 3), (20, 32, 4)):
+        formatted[:, start + offset:end + offset] = digits[:, start:end]
+
+    return formatted.view('S36').ravel().astype(str)
+
+def generate_locations(count, rng=None):
+    """Generate `count` jittered locations at once as latitude, longitude and name arrays."""
+    rng = rng or DEFAULT_RNG
+    return jitter_locations(draw_location_idx(count, rng), rng)
+
+def draw_location_idx(count, rng, exclude_idx=None):
+    """Draw indices into LOCATION_CATEGORIES.
+
+    When `exclude_idx` is given, row i is drawn uniformly from every location
+    except exclude_idx[i].
+    """
+    if exclude_idx is None:
+        return rng.integers(0, len(LOCATION_CATEGORIES), count)
+
+    # Draw from the remaining n-1 slots and shift past the excluded index
+    location_idx = rng.integers(0, len(LOCATION_CATEGORIES) - 1, count)
+    return location_idx + (location_idx >= exclude_idx)
+
+def jitter_locations(location_idx, rng):
+    """Jitter the centre of each indexed location by up to ±0.01 degrees."""
+    count = len(location_idx)
+    lats = LOCATION_LATS[location_idx] + rng.uniform(-0.01, 0.01, count)
+    longs = LOCATION_LONGS[location_idx] + rng.uniform(-0.01, 0.01, count)
+
+    return lats, longs, LOCATION_NAMES[location_idx]
+
+def generate_driver_data(num_drivers=100, rng=None, base_time=None):
+    """Generate synthetic data for drivers, drawing every column in one vectorized call."""
+    rng = rng or DEFAULT_RNG
+    base_time = base_time or datetime.now()
+    n = num_drivers
+
+    driver_ids = generate_uuids(n, rng)
+    lat, long, location = generate_locations(n, rng)
+
+    online_status = rng.choice(['Online', 'Offline'], size=n, p=[0.75, 0.25])
+    trip_status = rng.choice(['Idle', 'En Route', 'Occupied'], size=n, p=[0.4, 0.3, 0.3])
+
+    # Historical Performance
+    ride_acceptance_rate = rng.beta(8, 2, n) * 100
+    cancellation_rate = rng.beta(2, 8, n) * 100
+
+    # Trip Patterns
+    avg_trip_duration = rng.gamma(2, 10, n)
+    avg_trip_distance = rng.gamma(2, 3, n)
+
+    # Driver Profile
+    experience_years = rng.integers(1, 11, n)
+    rating = rng.uniform(3.0, 5.0, n)
+    completed_trips = rng.integers(100, 5000, n)
+
+    # Time Sensitivity
+    preferred_shift = rng.choice(SHIFT_CATEGORIES, size=n)
+    peak_acceptance_rate = np.minimum(ride_acceptance_rate + rng.uniform(0, 10, n), 100)
+    off_peak_acceptance_rate = np.minimum(ride_acceptance_rate - rng.uniform(0, 10, n), 100)
+
+    # Trip Type Preference
+    preferred_trip_type = rng.choice(['Short', 'Long', 'Both'], size=n, p=[0.3, 0.3, 0.4])
+
+    # Incentive & Behavior
+    incentive_responsiveness = rng.uniform(0.5, 1.0, n)
+    event_sensitivity = rng.uniform(0.0, 1.0, n)
+
+    # Namma Yatri Coin System fields
+    daily_avg_distance_km = np.round(rng.uniform(40, 120, n), 2)
+    coins_earned = rng.integers(0, 100, n)
+    multiplier_active = rng.choice([True, False], size=n, p=[0.2, 0.8])
+    multiplier_value = np.where(coins_earned >= 100, 1.5, np.where(coins_earned >= 50, 1.25, 1.0))
+    multiplier_valid_until = pd.Timestamp(base_time) + pd.to_timedelta(rng.integers(0, 3, n), unit='D')
+    distance_covered_today = np.round(rng.uniform(0, daily_avg_distance_km), 2)
+
+    # Home location (random location, but we'll store it)
+    home_lat, home_long, home_location = generate_locations(n, rng)
+
+    return pd.DataFrame({
+        'driver_id': driver_ids,
+        'latitude': lat,
+        'longitude': long,
+        'location': location,
+        'online_status': online_status,
+        'trip_status': trip_status,
+        'ride_acceptance_rate': np.round(ride_acceptance_rate, 2),
+        'cancellation_rate': np.round(cancellation_rate, 2),
+        'avg_trip_duration_minutes': np.round(avg_trip_duration, 2),
+        'avg_trip_distance_km': np.round(avg_trip_distance, 2),
+        'experience_years': experience_years,
+        'rating': np.round(rating, 2),
+        'completed_trips': completed_trips,
+        'preferred_shift': preferred_shift,
+        'peak_acceptance_rate': np.round(peak_acceptance_rate, 2),
+        'off_peak_acceptance_rate': np.round(off_peak_acceptance_rate, 2),
+        'preferred_trip_type': preferred_trip_type,
+        'incentive_responsiveness': np.round(incentive_responsiveness, 2),
+        'event_sensitivity': np.round(event_sensitivity, 2),
+        'daily_avg_distance_km': daily_avg_distance_km,
+        'coins_earned': coins_earned,
+        'target_distance_60_percent': np.round(daily_avg_distance_km * 0.6, 2),
+        'target_distance_100_percent': daily_avg_distance_km,
+        'multiplier_active': multiplier_active,
+        'multiplier_value': multiplier_value,
+        'multiplier_valid_until': multiplier_valid_until,
+        'distance_covered_today': distance_covered_today,
+        'home_latitude': home_lat,
+        'home_longitude': home_long,
+        'home_location': home_location,
+        'consecutive_trips': rng.integers(0, 5, n)
+    })
+
+def generate_passenger_data(num_passengers=200, rng=None, base_time=None):
+    """Generate synthetic data for passengers, drawing every column in one vectorized call."""
+    rng = rng or DEFAULT_RNG
+    base_time = base_time or datetime.now()
+    n = num_passengers
+
+    passenger_ids = generate_uuids(n, rng)
+    pickup_idx = draw_location_idx(n, rng)
+    pickup_lat, pickup_long, pickup_location = jitter_locations(pickup_idx, rng)
+
+    # Destination is any location other than the pickup one
+    destination_idx = draw_location_idx(n, rng, exclude_idx=pickup_idx)
+    destination_lat, destination_long, destination_location = jitter_locations(destination_idx, rng)
+
+    trip_urgency = rng.choice(URGENCY_CATEGORIES, size=n, p=[0.2, 0.5, 0.3])
+
+    lat_diff = destination_lat - pickup_lat
+    long_diff = destination_long - pickup_long
+    trip_distance = np.sqrt((lat_diff * 111)**2 + (long_diff * 111 * np.cos(np.radians(13)))**2)
+
+    ride_frequency = rng.choice(['Daily', 'Weekly', 'Monthly', 'Occasional'], size=n)
+    cancellation_tendency = rng.beta(2, 8, n) * 100  # Lower cancellation tendency bias
+    rating = rng.uniform(3.5, 5.0, n)
+
+    minutes_to_add = rng.integers(0, 1440, n)  # Random time within next 24 hours
+    request_time = pd.Timestamp(base_time) + pd.to_timedelta(minutes_to_add, unit='min')
+    time_of_day = get_time_of_day_array(request_time.hour.to_numpy())
+
+    at_event = rng.choice([True, False], size=n, p=[0.2, 0.8])
+    event_type = np.where(
+        at_event,
+        rng.choice(EVENT_TYPE_CATEGORIES, size=n),
+        'None'
+    )
+
+    tip_amount = rng.choice([0, 10, 20, 30, 50], size=n, p=[0.6, 0.2, 0.1, 0.05, 0.05])
+
+    return pd.DataFrame({
+        'passenger_id': passenger_ids,
+        'pickup_latitude': pickup_lat,
+        'pickup_longitude': pickup_long,
+        'pickup_location': pickup_location,
+        'destination_latitude': destination_lat,
+        'destination_longitude': destination_long,
+        'destination_location': destination_location,
+        'trip_urgency': trip_urgency,
+        'estimated_trip_distance_km': np.round(trip_distance, 2),
+        'ride_frequency': ride_frequency,
+        'cancellation_tendency': np.round(cancellation_tendency, 2),
+        'passenger_rating': np.round(rating, 2),
+        'request_time': request_time,
+        'time_of_day': time_of_day,
+        'at_event': at_event,
+        'event_type': event_type,
+        'tip_amount': tip_amount
+    })
 
 def get_time_of_day(hour):
     """Convert hour to time of day category."""
@@ -223,13 +344,22 @@ def get_time_of_day(hour):
     else:
         return 'Night'
 
-def calculate_edge_features(drivers_df, passengers_df, num_edges=500):
+def get_time_of_day_array(hours):
+    """Vectorized get_time_of_day over an array of hours."""
+    return np.select(
+        [(hours >= 5) & (hours < 12), (hours >= 12) & (hours < 17), (hours >= 17) & (hours < 21)],
+        ['Morning', 'Afternoon', 'Evening'],
+        default='Night'
+    )
+
+def calculate_edge_features(drivers_df, passengers_df, num_edges=500, rng=None):
     """Generate edge features between drivers and passengers with correct fare handling."""
+    rng = rng or DEFAULT_RNG
     edges_data = []
 
     for _ in range(num_edges):
-        driver = drivers_df.iloc[np.random.randint(0, len(drivers_df))]
-        passenger = passengers_df.iloc[np.random.randint(0, len(passengers_df))]
+        driver = drivers_df.iloc[rng.integers(0, len(drivers_df))]
+        passenger = passengers_df.iloc[rng.integers(0, len(passengers_df))]
 
         driver_lat, driver_long = driver['latitude'], driver['longitude']
         passenger_lat, passenger_long = passenger['pickup_latitude'], passenger['pickup_longitude']
@@ -239,11 +369,11 @@ def calculate_edge_features(drivers_df, passengers_df, num_edges=500):
         distance_km = np.sqrt((lat_diff * 111)**2 + (long_diff * 111 * np.cos(np.radians(13)))**2)
 
         # Traffic factor (higher during peak hours)
-        traffic_factor = np.random.uniform(0.8, 2.0)
+        traffic_factor = rng.uniform(0.8, 2.0)
         if passenger['time_of_day'] in ['Morning', 'Evening']:
-            traffic_factor *= np.random.uniform(1.2, 1.5)  # Heavier traffic during peak hours
+            traffic_factor *= rng.uniform(1.2, 1.5)  # Heavier traffic during peak hours
         if passenger['at_event']:
-            traffic_factor *= np.random.uniform(1.1, 1.3)  # Heavier traffic around events
+            traffic_factor *= rng.uniform(1.1, 1.3)  # Heavier traffic around events
 
         estimated_pickup_time_mins = (distance_km / 20) * 60
         actual_estimated_time = estimated_pickup_time_mins * traffic_factor
@@ -254,9 +384,9 @@ def calculate_edge_features(drivers_df, passengers_df, num_edges=500):
 
         market_surge_factor = 1.0
         if passenger['time_of_day'] in ['Morning', 'Evening']:
-            market_surge_factor += np.random.uniform(0, 0.5)  # Peak hours
+            market_surge_factor += rng.uniform(0, 0.5)  # Peak hours
         if passenger['at_event']:
-            market_surge_factor += np.random.uniform(0, 1.0)  # Event surge
+            market_surge_factor += rng.uniform(0, 1.0)  # Event surge
 
         surge_fee = base_trip_fare * (market_surge_factor - 1.0)
 
@@ -358,8 +488,9 @@ def calculate_edge_features(drivers_df, passengers_df, num_edges=500):
 
     return pd.DataFrame(edges_data)
 
-def generate_heatmap_data():
+def generate_heatmap_data(rng=None):
     """Generate initial heatmap data for all locations."""
+    rng = rng or DEFAULT_RNG
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     heatmap_data = []
 
@@ -381,12 +512,12 @@ def generate_heatmap_data():
 
         time_factor = 2.0 if is_peak_time else 1.0
 
-        random_factor = np.random.uniform(0.7, 1.3)
+        random_factor = rng.uniform(0.7, 1.3)
 
         ride_requests = int(base_demand * time_factor * random_factor)
 
         # Traffic intensity (higher in central areas, during peak hours, etc.)
-        traffic_base = np.random.uniform(0.3, 0.6)  # Base traffic intensity
+        traffic_base = rng.uniform(0.3, 0.6)  # Base traffic intensity
         
         # Higher traffic in central areas
         center_factor = max(0, 1 - (distance_from_center / 20))
@@ -398,11 +529,11 @@ def generate_heatmap_data():
         traffic_intensity = min(0.95, traffic_base + center_factor * 0.3 + peak_factor)
         
         # Add some known heavy traffic areas
-        if location in ['Silk Board', 'Marathahalli', 'KR Puram', 'Hebbal', 'Electronic City']:
+        if location in HEAVY_TRAFFIC_LOCATIONS:
             traffic_intensity = min(0.95, traffic_intensity + 0.2)
         
         # Add randomness to traffic
-        traffic_intensity = min(0.95, max(0.1, traffic_intensity * np.random.uniform(0.8, 1.2)))
+        traffic_intensity = min(0.95, max(0.1, traffic_intensity * rng.uniform(0.8, 1.2)))
 
         latitude, longitude = coords
 
@@ -417,24 +548,31 @@ def generate_heatmap_data():
 
     return pd.DataFrame(heatmap_data)
 
-def save_data_to_csv():
-    """Generate and save all datasets to CSV files."""
+def generate_datasets(num_drivers=1000, num_passengers=1500, num_edges=5000):
+    """Generate all four datasets in memory, keyed by dataset name."""
     print("Generating driver data...")
-    drivers_df = generate_driver_data(num_drivers=1000)
+    drivers_df = generate_driver_data(num_drivers=num_drivers)
 
     print("Generating passenger data...")
-    passengers_df = generate_passenger_data(num_passengers=1500)
+    passengers_df = generate_passenger_data(num_passengers=num_passengers)
 
     print("Calculating edge features...")
-    edges_df = calculate_edge_features(drivers_df, passengers_df, num_edges=5000)
+    edges_df = calculate_edge_features(drivers_df, passengers_df, num_edges=num_edges)
 
     print("Generating initial heatmap data...")
     heatmap_df = generate_heatmap_data()
 
-    drivers_df.to_csv("drivers_data.csv", index=False)
-    passengers_df.to_csv("passengers_data.csv", index=False)
-    edges_df.to_csv("matching_edges_data.csv", index=False)
-    heatmap_df.to_csv("heatmap_data.csv", index=False)
+    return {
+        'drivers': drivers_df,
+        'passengers': passengers_df,
+        'edges': edges_df,
+        'heatmap': heatmap_df
+    }
+
+def print_dataset_summary(datasets):
+    """Print row counts and a small sample of every generated dataset."""
+    drivers_df, passengers_df = datasets['drivers'], datasets['passengers']
+    edges_df, heatmap_df = datasets['edges'], datasets['heatmap']
 
     print("Data generation complete!")
     print(f"Generated {len(drivers_df)} driver records")
@@ -454,7 +592,402 @@ def save_data_to_csv():
     print("\nSample heatmap data:")
     print(heatmap_df.head(2).to_string())
 
-    return drivers_df, passengers_df, edges_df, heatmap_df
+def save_data_to_csv(datasets=None):
+    """Generate (or reuse) all datasets and save them to CSV files."""
+    if datasets is None:
+        datasets = generate_datasets()
+
+    for name, df in datasets.items():
+        df.to_csv(f"{DATASET_FILES[name]}.csv", index=False)
+
+    print_dataset_summary(datasets)
+
+    return datasets['drivers'], datasets['passengers'], datasets['edges'], datasets['heatmap']
+
+def to_columnar(df, dataset):
+    """Cast a generated dataset to the typed columnar layout (categoricals, float32, timestamps)."""
+    schema = COLUMNAR_SCHEMAS[dataset]
+    df = df.copy()
+
+    for column, categories in schema['categories'].items():
+        df[column] = pd.Categorical(df[column], categories=categories)
+
+    for column in schema['float32']:
+        df[column] = df[column].astype(np.float32)
+
+    for column in schema['timestamps']:
+        df[column] = pd.to_datetime(df[column])
+
+    for column in schema['booleans']:
+        # CSV round-trips can leave booleans as 'True'/'False' strings
+        if not pd.api.types.is_bool_dtype(df[column]):
+            df[column] = df[column].astype(str) == 'True'
+
+    return df
+
+def write_parquet_dataset(df, dataset, path, partition_by=None):
+    """Write one dataset as Parquet, optionally hive-partitioned by 'date' or 'location'.
+
+    Datasets without a column for the requested key (edges have no timestamp)
+    are written as a single file.
+    """
+    df = to_columnar(df, dataset)
+    partition_column = COLUMNAR_SCHEMAS[dataset]['partitions'].get(partition_by) if partition_by else None
+
+    if partition_column is None:
+        df.to_parquet(f"{path}.parquet", engine='pyarrow', index=False)
+        return f"{path}.parquet"
+
+    if partition_by == 'date':
+        df['partition_date'] = df[partition_column].dt.strftime('%Y-%m-%d')
+        partition_column = 'partition_date'
+
+    df.to_parquet(path, engine='pyarrow', index=False, partition_cols=[partition_column])
+    return path
+
+def load_parquet_dataset(path, columns=None, filters=None):
+    """Load a Parquet dataset with column projection and predicate push-down.
+
+    `filters` uses the pyarrow form, e.g. [('pickup_location', '==', 'Hebbal')],
+    so non-matching partitions and row groups are skipped instead of read.
+    """
+    return pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters)
+
+def _parquet_path(output_dir, dataset):
+    """Return the on-disk path of a dataset written by save_data_to_parquet."""
+    base = os.path.join(output_dir, DATASET_FILES[dataset])
+    return base if os.path.isdir(base) else f"{base}.parquet"
+
+def _path_size_bytes(path):
+    """Total size of a file or of every file below a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            total += os.path.getsize(os.path.join(root, file_name))
+    return total
+
+def save_data_to_parquet(output_dir="parquet_data", partition_by=None, datasets=None):
+    """Generate (or reuse) all datasets and save them as typed Parquet files."""
+    if datasets is None:
+        datasets = generate_datasets()
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    for name, df in datasets.items():
+        written = write_parquet_dataset(df, name, os.path.join(output_dir, DATASET_FILES[name]), partition_by)
+        print(f"Wrote {name} to {written}")
+
+    print_dataset_summary(datasets)
+
+    return datasets
+
+def compare_storage_formats(csv_dir=".", parquet_dir="parquet_data"):
+    """Compare file size and load time of the CSV and Parquet copies of each dataset.
+
+    The projected load reads only the first two columns, which is where the
+    columnar layout pays off most.
+    """
+    results = []
+
+    for name, file_name in DATASET_FILES.items():
+        csv_path = os.path.join(csv_dir, f"{file_name}.csv")
+        parquet_path = _parquet_path(parquet_dir, name)
+        if not os.path.exists(csv_path) or not os.path.exists(parquet_path):
+            print(f"Skipping {name}: missing {csv_path} or {parquet_path}")
+            continue
+
+        start = time.perf_counter()
+        csv_df = pd.read_csv(csv_path)
+        csv_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_parquet_dataset(parquet_path)
+        parquet_load = time.perf_counter() - start
+
+        projected_columns = list(csv_df.columns[:2])
+        start = time.perf_counter()
+        load_parquet_dataset(parquet_path, columns=projected_columns)
+        projected_load = time.perf_counter() - start
+
+        results.append({
+            'dataset': name,
+            'rows': len(csv_df),
+            'csv_mb': round(os.path.getsize(csv_path) / 1e6, 3),
+            'parquet_mb': round(_path_size_bytes(parquet_path) / 1e6, 3),
+            'csv_load_s': round(csv_load, 4),
+            'parquet_load_s': round(parquet_load, 4),
+            'parquet_projected_load_s': round(projected_load, 4)
+        })
+
+    comparison = pd.DataFrame(results)
+    print(comparison.to_string(index=False))
+    return comparison
+
+STREAMABLE_DATASETS = ['drivers', 'passengers', 'edges']
+
+def iter_dataset_chunks(dataset, total_rows, chunk_size=100_000, pool_size=10_000,
+                        drivers_df=None, passengers_df=None):
+    """Yield DataFrames of at most `chunk_size` rows until `total_rows` have been produced.
+
+    Only one chunk is alive at a time, so memory stays flat regardless of
+    `total_rows`. Every edge chunk is matched against the same driver and
+    passenger pools, so edge IDs all refer to one population: `drivers_df`
+    and `passengers_df` when given, otherwise pools of `pool_size` rows
+    generated once up front.
+    """
+    if dataset not in STREAMABLE_DATASETS:
+        raise ValueError(f"Cannot stream dataset '{dataset}', expected one of {STREAMABLE_DATASETS}")
+
+    if dataset == 'edges':
+        if drivers_df is None:
+            drivers_df = generate_driver_data(num_drivers=pool_size)
+        if passengers_df is None:
+            passengers_df = generate_passenger_data(num_passengers=pool_size)
+
+    remaining = total_rows
+    while remaining > 0:
+        rows = min(chunk_size, remaining)
+
+        if dataset == 'drivers':
+            chunk = generate_driver_data(num_drivers=rows)
+        elif dataset == 'passengers':
+            chunk = generate_passenger_data(num_passengers=rows)
+        else:
+            chunk = calculate_edge_features(drivers_df, passengers_df, num_edges=rows)
+
+        yield chunk
+        remaining -= rows
+
+def _print_progress(written, total, started_at):
+    """Single-line progress indicator for streaming runs."""
+    elapsed = time.perf_counter() - started_at
+    rate = written / elapsed if elapsed > 0 else 0
+    percent = (written / total) * 100 if total else 100
+    sys.stderr.write(f"\r{written:,}/{total:,} rows ({percent:5.1f}%) - {rate:,.0f} rows/s")
+    sys.stderr.flush()
+
+def stream_dataset_to_disk(dataset, total_rows, chunk_size=100_000, path=None, file_format="csv",
+                           drivers_df=None, passengers_df=None):
+    """Generate `total_rows` of a dataset chunk by chunk and append each chunk to disk.
+
+    Supports 'csv', 'parquet' (one row group per chunk) and 'jsonl'. Edges are
+    matched against `drivers_df` and `passengers_df` when given.
+    """
+    if path is None:
+        path = f"{DATASET_FILES[dataset]}.{file_format}"
+
+    if file_format not in ('csv', 'parquet', 'jsonl'):
+        raise ValueError(f"Unsupported stream format '{file_format}'")
+
+    if file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    out = None if file_format == 'parquet' else open(path, 'w', newline='')
+    parquet_writer = None
+    written = 0
+    started_at = time.perf_counter()
+
+    try:
+        for chunk in iter_dataset_chunks(dataset, total_rows, chunk_size,
+                                         drivers_df=drivers_df, passengers_df=passengers_df):
+            if file_format == 'csv':
+                chunk.to_csv(out, index=False, header=(written == 0))
+            elif file_format == 'jsonl':
+                chunk.to_json(out, orient='records', lines=True, date_format='iso')
+            else:
+                table = pa.Table.from_pandas(to_columnar(chunk, dataset), preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(path, table.schema)
+                parquet_writer.write_table(table)
+
+            written += len(chunk)
+            _print_progress(written, total_rows, started_at)
+    finally:
+        if out is not None:
+            out.close()
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    sys.stderr.write("\n")
+    print(f"Streamed {written:,} {dataset} rows to {path} in {time.perf_counter() - started_at:.1f}s")
+    return path
+
+# Sub-stream ids so each dataset draws from its own branch of the master seed
+DATASET_STREAM_IDS = {'drivers': 0, 'passengers': 1, 'edges': 2, 'heatmap': 3}
+
+_EDGE_WORKER_POOLS = {}
+
+def _init_edge_worker(drivers_df, passengers_df):
+    """Process-pool initializer that keeps the edge matching pools resident in each worker."""
+    _EDGE_WORKER_POOLS['drivers'] = drivers_df
+    _EDGE_WORKER_POOLS['passengers'] = passengers_df
+
+def _generate_shard(task):
+    """Generate one shard from its own Generator; runs inside a pool worker."""
+    dataset, rows, seed_sequence, base_time = task
+    rng = np.random.default_rng(seed_sequence)
+
+    if dataset == 'drivers':
+        return generate_driver_data(num_drivers=rows, rng=rng, base_time=base_time)
+    if dataset == 'passengers':
+        return generate_passenger_data(num_passengers=rows, rng=rng, base_time=base_time)
+    return calculate_edge_features(
+        _EDGE_WORKER_POOLS['drivers'], _EDGE_WORKER_POOLS['passengers'], num_edges=rows, rng=rng
+    )
+
+def generate_parallel(dataset, total_rows, workers=None, master_seed=DEFAULT_SEED, shard_size=10_000,
+                      base_time=None, drivers_df=None, passengers_df=None):
+    """Generate a dataset across a process pool with deterministic per-shard streams.
+
+    The work is cut into fixed-size shards and shard i always draws from child i
+    of SeedSequence([master_seed, dataset stream id]), so the concatenated output
+    depends only on the seed, shard size and base_time, never on `workers`.
+    Edges need `drivers_df` and `passengers_df` to match against.
+    """
+    if dataset not in STREAMABLE_DATASETS:
+        raise ValueError(f"Cannot generate dataset '{dataset}' in parallel, expected one of {STREAMABLE_DATASETS}")
+    if dataset == 'edges' and (drivers_df is None or passengers_df is None):
+        raise ValueError("Parallel edge generation needs drivers_df and passengers_df")
+
+    base_time = base_time or datetime.now()
+    shard_rows = [min(shard_size, total_rows - start) for start in range(0, total_rows, shard_size)]
+    seeds = np.random.SeedSequence([master_seed, DATASET_STREAM_IDS[dataset]]).spawn(len(shard_rows))
+    tasks = [(dataset, rows, seed, base_time) for rows, seed in zip(shard_rows, seeds)]
+
+    initargs = (drivers_df, passengers_df)
+    if workers == 1:
+        _init_edge_worker(*initargs)
+        try:
+            shards = [_generate_shard(task) for task in tasks]
+        finally:
+            _EDGE_WORKER_POOLS.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_edge_worker, initargs=initargs) as pool:
+            shards = list(pool.map(_generate_shard, tasks))
+
+    return pd.concat(shards, ignore_index=True)
+
+def generate_datasets_parallel(num_drivers=1000, num_passengers=1500, num_edges=5000, workers=None,
+                               master_seed=DEFAULT_SEED, shard_size=10_000, base_time=None):
+    """Parallel, seed-reproducible counterpart of generate_datasets."""
+    base_time = base_time or datetime.now()
+
+    print(f"Generating driver data with {workers or os.cpu_count()} workers...")
+    drivers_df = generate_parallel('drivers', num_drivers, workers, master_seed, shard_size, base_time)
+
+    print("Generating passenger data...")
+    passengers_df = generate_parallel('passengers', num_passengers, workers, master_seed, shard_size, base_time)
+
+    print("Calculating edge features...")
+    edges_df = generate_parallel('edges', num_edges, workers, master_seed, shard_size, base_time,
+                                 drivers_df=drivers_df, passengers_df=passengers_df)
+
+    print("Generating initial heatmap data...")
+    heatmap_rng = np.random.default_rng(np.random.SeedSequence([master_seed, DATASET_STREAM_IDS['heatmap']]))
+    heatmap_df = generate_heatmap_data(rng=heatmap_rng)
+
+    return {
+        'drivers': drivers_df,
+        'passengers': passengers_df,
+        'edges': edges_df,
+        'heatmap': heatmap_df
+    }
+
+def _frame_digest(df):
+    """Stable content hash of a DataFrame, used to check cross-worker determinism."""
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+def benchmark_parallel_scaling(dataset='passengers', total_rows=100_000, max_workers=None,
+                               shard_size=10_000, master_seed=DEFAULT_SEED):
+    """Time parallel generation for 1..max_workers processes and verify identical output."""
+    max_workers = max_workers or os.cpu_count()
+    base_time = datetime(2025, 1, 1)
+
+    pools = {}
+    if dataset == 'edges':
+        pools['drivers_df'] = generate_parallel('drivers', 1000, 1, master_seed, shard_size, base_time)
+        pools['passengers_df'] = generate_parallel('passengers', 1500, 1, master_seed, shard_size, base_time)
+
+    results = []
+    reference_digest = None
+    baseline_seconds = None
+
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        df = generate_parallel(dataset, total_rows, workers, master_seed, shard_size, base_time, **pools)
+        elapsed = time.perf_counter() - start
+
+        digest = _frame_digest(df)
+        if reference_digest is None:
+            reference_digest = digest
+            baseline_seconds = elapsed
+
+        results.append({
+            'workers': workers,
+            'seconds': round(elapsed, 3),
+            'rows_per_s': round(total_rows / elapsed),
+            'speedup': round(baseline_seconds / elapsed, 2),
+            'identical_output': digest == reference_digest
+        })
+
+    benchmark = pd.DataFrame(results)
+    print(benchmark.to_string(index=False))
+    return benchmark
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic Namma Yatri datasets.")
+    parser.add_argument("--format", choices=["csv", "parquet", "jsonl"], default="csv",
+                        help="Output format for the generated datasets (jsonl only with --stream)")
+    parser.add_argument("--output-dir", default="parquet_data",
+                        help="Directory for Parquet output")
+    parser.add_argument("--partition-by", choices=["date", "location"], default=None,
+                        help="Hive-partition Parquet output by date or location")
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare CSV and Parquet file sizes and load times after writing")
+    parser.add_argument("--stream", choices=STREAMABLE_DATASETS, default=None,
+                        help="Stream one dataset to disk in fixed-size chunks")
+    parser.add_argument("--rows", type=int, default=1_000_000,
+                        help="Target row count for --stream")
+    parser.add_argument("--chunk-size", type=int, default=100_000,
+                        help="Rows generated and written per chunk for --stream")
+    parser.add_argument("--output", default=None,
+                        help="Output file for --stream (defaults to <dataset>.<format>)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Generate with a process pool of this many workers (deterministic per --seed)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help="Master seed for parallel generation")
+    parser.add_argument("--shard-size", type=int, default=10_000,
+                        help="Rows per deterministic shard in parallel generation")
+    parser.add_argument("--benchmark-scaling", choices=STREAMABLE_DATASETS, default=None,
+                        help="Benchmark parallel generation of a dataset for 1..--workers cores")
+    args = parser.parse_args()
+
+    if args.format == "jsonl" and not args.stream:
+        parser.error("--format jsonl is only supported together with --stream")
+
+    return args
 
 if __name__ == "__main__":
-    save_data_to_csv()
\ No newline at end of file
+    args = parse_args()
+
+    if args.benchmark_scaling:
+        benchmark_parallel_scaling(args.benchmark_scaling, args.rows, args.workers, args.shard_size, args.seed)
+    elif args.stream:
+        stream_dataset_to_disk(args.stream, args.rows, args.chunk_size, args.output, args.format)
+    else:
+        datasets = None
+        if args.workers:
+            datasets = generate_datasets_parallel(workers=args.workers, master_seed=args.seed,
+                                                  shard_size=args.shard_size)
+
+        if args.format == "parquet":
+            save_data_to_parquet(output_dir=args.output_dir, partition_by=args.partition_by, datasets=datasets)
+        else:
+            save_data_to_csv(datasets=datasets)
+
+    if args.compare:
+        compare_storage_formats(parquet_dir=args.output_dir)
\ No newline at end of file
@@ -0,0 +1,317 @@
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from demand_heatmap import trip_started_at
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+HORIZONS_MINUTES = (15, 30, 45, 60)
+HISTORY_DAYS = 28
+# Residual lags fed to the regressor, and its ridge penalty
+LAGS = 4
+RIDGE = 1.0
+# Forecasts are recomputed this often; coefficients are refitted every TRAIN_SECONDS
+REFRESH_SECONDS = 300
+TRAIN_SECONDS = 3600
+# Traffic rows fetched per query when catching up
+REFRESH_BATCH = 5000
+
+def slot_for(at):
+    """Index of the SLOT_MINUTES slot containing `at`."""
+    return int(at.timestamp() // (SLOT_MINUTES * 60))
+
+def horizon_steps(horizons_minutes=HORIZONS_MINUTES):
+    # Forecasts are made from the last complete slot, so "15 minutes ahead" is two slots on from it
+    return np.array([minutes // SLOT_MINUTES + 1 for minutes in horizons_minutes])
+
+class DemandModel:
+    """Per-location seasonal baseline plus a ridge regression on recent deviations from it.
+
+    The baseline is the mean demand for each slot of the day. The regressor
+    predicts how far each horizon will sit from its baseline from the last
+    LAGS deviations, with coefficients solved in closed form for every
+    location at once (one batched linear solve, no gradient descent).
+    Slots before a location's first observation are left out of both, so
+    a short history isn't averaged with zeros from before it started.
+    """
+
+    def __init__(self, baseline, coefficients, steps):
+        self.baseline = baseline  # (locations, SLOTS_PER_DAY)
+        self.coefficients = coefficients  # (locations, LAGS + 1, horizons)
+        self.steps = steps
+
+    @classmethod
+    def fit(cls, demand, end_slot, steps, lags=LAGS, ridge=RIDGE, first_columns=None):
+        """Fit on `demand` (locations x slots), whose last column is slot `end_slot`.
+
+        `first_columns` is the column of each location's first observation;
+        all columns count when it is None.
+        """
+        locations, slots = demand.shape
+        slot_of_day = np.arange(end_slot - slots + 1, end_slot + 1) % SLOTS_PER_DAY
+        if first_columns is None:
+            first_columns = np.zeros(locations, dtype=int)
+        observed = np.arange(slots)[None, :] >= np.asarray(first_columns)[:, None]
+        sums = np.zeros((SLOTS_PER_DAY, locations))
+        np.add.at(sums, slot_of_day, (demand * observed).T)
+        counts = np.zeros((SLOTS_PER_DAY, locations))
+        np.add.at(counts, slot_of_day, observed.T)
+        baseline = (sums / np.maximum(counts, 1)).T
+
+        coefficients = np.zeros((locations, lags + 1, len(steps)))
+        rows = slots - lags + 1 - steps.max()
+        if rows > lags + 1:
+            residual = demand - baseline[:, slot_of_day]
+            origins = np.arange(lags - 1, lags - 1 + rows)
+            # Rows whose lags reach back before the first observation are zeroed out of the solve
+            weight = observed[:, origins - lags + 1][:, :, None]
+            features = cls._features(residual, origins, lags) * weight
+            targets = np.stack([residual[:, origins + step] for step in steps], axis=-1) * weight
+            gram = features.transpose(0, 2, 1) @ features + ridge * np.eye(lags + 1)
+            coefficients = np.linalg.solve(gram, features.transpose(0, 2, 1) @ targets)
+        return cls(baseline, coefficients, steps)
+
+    @staticmethod
+    def _features(residual, origins, lags):
+        """(locations, origins, lags + 1): the last `lags` residuals up to each origin, then an intercept."""
+        lagged = [residual[:, origins - lag] for lag in range(lags)]
+        intercept = np.ones((residual.shape[0], len(origins)))
+        return np.stack(lagged + [intercept], axis=-1)
+
+    def predict(self, recent, end_slot):
+        """(locations, horizons) forecasts from the last LAGS slots of demand, ending at `end_slot`."""
+        lags = self.coefficients.shape[1] - 1
+        recent_slots = np.arange(end_slot - lags + 1, end_slot + 1) % SLOTS_PER_DAY
+        residual = recent[:, -lags:] - self.baseline[:, recent_slots]
+        features = self._features(residual, np.array([lags - 1]), lags)[:, 0, :]
+        adjustment = np.einsum('lf,lfh->lh', features, self.coefficients)
+        baseline = self.baseline[:, (end_slot + self.steps) % SLOTS_PER_DAY]
+        return np.clip(baseline + adjustment, 0, None)
+
+class DemandForecaster:
+    """15-60 minute demand forecasts for every location, precomputed into one array.
+
+    Demand per location and slot is trip requests picked up there plus the
+    ride requests reported in its traffic readings. History lives in a ring
+    buffer of history_days worth of slots per location, so building the
+    model's input is one indexed read however long the history is.
+
+    refresh() catches up on new traffic rows by traffic_id and recounts the
+    trips of the days since the last refresh, then recomputes the forecast
+    table, refitting the model every TRAIN_SECONDS. Readers get
+    (location_ids, table, generated_at) from snapshot(), so serving every
+    location is one array read, and a refresh swaps the whole snapshot at once.
+    """
+
+    REQUESTS, TRIPS = range(2)
+
+    def __init__(self, history_days=HISTORY_DAYS, horizons_minutes=HORIZONS_MINUTES,
+                 refresh_seconds=REFRESH_SECONDS, train_seconds=TRAIN_SECONDS):
+        self.history_slots = history_days * SLOTS_PER_DAY
+        self.horizons_minutes = tuple(horizons_minutes)
+        self.steps = horizon_steps(self.horizons_minutes)
+        self.refresh_seconds = refresh_seconds
+        self.train_seconds = train_seconds
+        self._lock = threading.Lock()
+        # (REQUESTS/TRIPS, location row, slot % ring size); one slot more than the history for the current one
+        self._ring = self.history_slots + 1
+        # Rows are allocated in doubling blocks; _first_slot is each row's earliest slot with demand
+        self._history = np.zeros((2, 0, self._ring))
+        self._first_slot = np.zeros(0, dtype=np.int64)
+        self._rows = {}  # location_id -> row of _history
+        self._latest_slot = None
+        self._last_traffic_id = 0
+        self._trips_from = None
+        self._model = None
+        self._model_locations = None
+        self._trained_at = None
+        self._snapshot = (np.array([], dtype=int), np.zeros((0, len(self.horizons_minutes)), dtype=np.float32), None)
+        self.train_seconds_taken = None
+        self.refresh_seconds_taken = None
+
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def generated_at(self):
+        return self._snapshot[2]
+
+    def due(self):
+        generated_at = self.generated_at
+        return generated_at is None or (datetime.now() - generated_at).total_seconds() >= self.refresh_seconds
+
+    def _advance(self, slot):
+        """Move the ring forward to end at `slot`, clearing the columns it reuses."""
+        if self._latest_slot is not None and slot > self._latest_slot:
+            reused = np.arange(max(self._latest_slot + 1, slot - self._ring + 1), slot + 1) % self._ring
+            self._history[:, :, reused] = 0
+        if self._latest_slot is None or slot > self._latest_slot:
+            self._latest_slot = slot
+
+    def _row(self, location_id):
+        row = self._rows.get(location_id)
+        if row is None:
+            row = self._rows[location_id] = len(self._rows)
+            if row == self._history.shape[1]:
+                capacity = max(8, 2 * row)
+                history = np.zeros((2, capacity, self._ring))
+                history[:, :row] = self._history
+                first_slot = np.full(capacity, np.iinfo(np.int64).max)
+                first_slot[:row] = self._first_slot
+                self._history, self._first_slot = history, first_slot
+        return row
+
+    def _add(self, series, location_id, slot, amount):
+        if slot > self._latest_slot or slot <= self._latest_slot - self._ring:
+            return
+        row = self._row(location_id)
+        self._history[series, row, slot % self._ring] += amount
+        self._first_slot[row] = min(self._first_slot[row], slot)
+
+    def _load(self, db, now):
+        self._advance(slot_for(now))
+        while True:
+            rows = db.list_traffic_data_since(self._last_traffic_id, REFRESH_BATCH)
+            for row in rows:
+                self._add(self.REQUESTS, row.location_id, slot_for(row.created_at), row.ride_requests)
+                self._last_traffic_id = max(self._last_traffic_id, row.traffic_id)
+            if len(rows) < REFRESH_BATCH:
+                break
+
+        # Trips have no increasing key, so the days since the last load are counted again
+        trips_from = self._trips_from or (now - timedelta(minutes=self.history_slots * SLOT_MINUTES)).date()
+        first_slot = max(slot_for(datetime.combine(trips_from, datetime.min.time())),
+                         self._latest_slot - self._ring + 1)
+        self._history[self.TRIPS][:, np.arange(first_slot, self._latest_slot + 1) % self._ring] = 0
+        for trip in db.list_trips(start_date=trips_from):
+            self._add(self.TRIPS, trip.pickup_location_id, slot_for(trip_started_at(trip.trip_date, trip.trip_time)), 1)
+        self._trips_from = now.date()
+
+    def _demand(self, location_ids, end_slot, slots=None):
+        """(locations, slots) demand matrix whose last column is `end_slot`; the whole history by default."""
+        slots = slots or self.history_slots
+        columns = np.arange(end_slot - slots + 1, end_slot + 1) % self._ring
+        totals = self._history[:, :, columns].sum(axis=0)
+        demand = np.zeros((len(location_ids), slots))
+        known = [(index, self._rows[location_id]) for index, location_id in enumerate(location_ids)
+                 if location_id in self._rows]
+        if known:
+            indexes, rows = zip(*known)
+            demand[list(indexes)] = totals[list(rows)]
+        return demand
+
+    def _first_columns(self, location_ids, end_slot, slots=None):
+        """Column of each location's first observation in _demand's matrix; `slots` for none yet."""
+        slots = slots or self.history_slots
+        first_slot = np.array([self._first_slot[self._rows[location_id]] if location_id in self._rows
+                               else np.iinfo(np.int64).max for location_id in location_ids], dtype=np.int64)
+        return np.clip(first_slot - (end_slot - slots + 1), 0, slots)
+
+    def refresh(self, db, force=False):
+        """Load new history and recompute the forecast table; a no-op within refresh_seconds unless forced."""
+        if not force and not self.due():
+            return False
+
+        with self._lock:
+            started = time.perf_counter()
+            now = datetime.now()
+            self._load(db, now)
+            location_ids = np.array(sorted(location.location_id for location in db.list_locations()), dtype=int)
+            # The last complete slot; the current one is still filling up
+            end_slot = slot_for(now) - 1
+
+            retrain = (self._model is None or not np.array_equal(location_ids, self._model_locations)
+                       or (now - self._trained_at).total_seconds() >= self.train_seconds)
+            if retrain:
+                train_started = time.perf_counter()
+                self._model = DemandModel.fit(self._demand(location_ids, end_slot), end_slot, self.steps,
+                                              first_columns=self._first_columns(location_ids, end_slot))
+                self._model_locations = location_ids
+                self._trained_at = now
+                self.train_seconds_taken = time.perf_counter() - train_started
+
+            table = self._model.predict(self._demand(location_ids, end_slot, LAGS), end_slot).astype(np.float32)
+            self._snapshot = (location_ids, table, now)
+            self.refresh_seconds_taken = time.perf_counter() - started
+        return True
+
+def synthetic_demand(locations, days, seed=42):
+    """Demand with morning and evening peaks, a per-location scale and autocorrelated noise."""
+    rng = np.random.default_rng(seed)
+    slots = days * SLOTS_PER_DAY
+    hours = (np.arange(slots) % SLOTS_PER_DAY) * SLOT_MINUTES / 60
+    daily = 1 + 0.9 * np.exp(-((hours - 9) ** 2) / 3) + 1.1 * np.exp(-((hours - 18.5) ** 2) / 4)
+    scale = rng.uniform(2, 12, (locations, 1))
+
+    noise = np.zeros((locations, slots))
+    shocks = rng.normal(0, 0.35, (locations, slots))
+    for slot in range(1, slots):
+        noise[:, slot] = 0.85 * noise[:, slot - 1] + shocks[:, slot]
+    return rng.poisson(np.clip(scale * daily * (1 + noise), 0, None)).astype(float)
+
+def run_benchmark(locations=200, history_days=(7, 14, 28, 56), seed=42):
+    """Fit and refresh time as history grows, and holdout error against the seasonal baseline alone.
+
+    Refresh covers reading the demand matrix out of the history ring as
+    well as predicting, which is what the API does on its schedule
+    between refits.
+
+    The last day of each synthetic history is held out; forecasts are made
+    from each of its slots with a model fitted on the days before it.
+    """
+    steps = horizon_steps()
+    results = []
+    for days in history_days:
+        demand = synthetic_demand(locations, days + 1, seed)
+        train, end_slot = demand[:, :-SLOTS_PER_DAY], days * SLOTS_PER_DAY - 1
+
+        started = time.perf_counter()
+        model = DemandModel.fit(train, end_slot, steps)
+        fit_seconds = time.perf_counter() - started
+
+        # A scheduled refresh: read the demand matrix out of the history ring, then predict
+        forecaster = DemandForecaster(history_days=days)
+        location_ids = np.arange(locations)
+        forecaster._advance(end_slot + 1)
+        forecaster._rows = {location_id: location_id for location_id in location_ids}
+        forecaster._history = np.zeros((2, locations, forecaster._ring))
+        forecaster._first_slot = np.full(locations, end_slot - train.shape[1] + 1)
+        forecaster._history[DemandForecaster.REQUESTS][:, np.arange(end_slot - train.shape[1] + 1, end_slot + 1) % forecaster._ring] = train
+        started = time.perf_counter()
+        model.predict(forecaster._demand(location_ids, end_slot, LAGS), end_slot)
+        refresh_seconds = time.perf_counter() - started
+
+        model_errors, baseline_errors = [], []
+        for origin in range(end_slot, end_slot + SLOTS_PER_DAY - steps.max()):
+            forecast = model.predict(demand[:, origin - LAGS + 1:origin + 1], origin)
+            actual = demand[:, origin + steps]
+            model_errors.append(np.abs(forecast - actual).mean(axis=0))
+            baseline_errors.append(np.abs(model.baseline[:, (origin + steps) % SLOTS_PER_DAY] - actual).mean(axis=0))
+
+        results.append({
+            'history_days': days,
+            'fit_seconds': fit_seconds,
+            'refresh_seconds': refresh_seconds,
+            'mae': np.mean(model_errors, axis=0),
+            'baseline_mae': np.mean(baseline_errors, axis=0)
+        })
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark demand forecast training and refresh as history grows.")
+    parser.add_argument("--locations", type=int, default=200, help="Locations to forecast")
+    parser.add_argument("--days", type=int, nargs='+', default=[7, 14, 28, 56], help="History lengths in days")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic demand")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Forecasting {', '.join(f'{m} min' for m in HORIZONS_MINUTES)} ahead for {args.locations} locations")
+    for result in run_benchmark(args.locations, args.days, args.seed):
+        errors = ' '.join(f"{mae:.2f}/{baseline:.2f}" for mae, baseline in zip(result['mae'], result['baseline_mae']))
+        print(f"{result['history_days']:>3} days: fit {result['fit_seconds'] * 1000:7.1f} ms, "
+              f"refresh {result['refresh_seconds'] * 1000:6.1f} ms, MAE model/baseline per horizon {errors}")
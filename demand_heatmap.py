@@ -0,0 +1,204 @@
+import math
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# Web Mercator zoom levels kept precomputed; 10 covers the city in a few tiles, 14 is street level
+ZOOM_LEVELS = (10, 12, 14)
+# Cells per tile side; tiles are GRID_SIZE x GRID_SIZE, flattened row-major from the north-west corner
+GRID_SIZE = 16
+BUCKET_MINUTES = 15
+RETENTION_HOURS = 24
+# Traffic rows fetched per query when catching up
+REFRESH_BATCH = 5000
+REFRESH_SECONDS = 15
+
+# Per-cell accumulators; traffic intensity is served as sum / samples
+LAYERS = ('pickups', 'ride_requests', 'traffic_intensity_sum', 'traffic_samples')
+PICKUPS, RIDE_REQUESTS, INTENSITY_SUM, TRAFFIC_SAMPLES = range(len(LAYERS))
+
+def tile_position(latitude, longitude, zoom, grid=GRID_SIZE):
+    """(tile x, tile y, cell index within the tile) of a point at a zoom level."""
+    n = 2 ** zoom
+    x = (longitude + 180) / 360 * n
+    y = (1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n
+    tile_x, tile_y = int(x), int(y)
+    cell_x = min(grid - 1, int((x - tile_x) * grid))
+    cell_y = min(grid - 1, int((y - tile_y) * grid))
+    return tile_x, tile_y, cell_y * grid + cell_x
+
+def tile_bounds(zoom, tile_x, tile_y):
+    """[west, south, east, north] of a tile in degrees."""
+    n = 2 ** zoom
+
+    def latitude(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+    return [tile_x / n * 360 - 180, latitude(tile_y + 1), (tile_x + 1) / n * 360 - 180, latitude(tile_y)]
+
+class DemandHeatmap:
+    """Trip pickups and traffic readings aggregated into map tiles at several zooms and time buckets.
+
+    Every location maps to one cell per zoom level, worked out once. Adding
+    a trip or reading therefore updates len(ZOOM_LEVELS) arrays, and a query
+    only sums the buckets in its time range for the tiles it returns.
+
+    Trips arrive as post-commit events (handle()) and are counted once per
+    trip_id. Traffic readings are pulled from the database by traffic_id,
+    the way TrafficProfile does, every refresh_seconds on the API's refresh
+    schedule. Buckets older than the retention window are dropped as time
+    moves on.
+    """
+
+    def __init__(self, location_loader, zooms=ZOOM_LEVELS, grid=GRID_SIZE,
+                 bucket_minutes=BUCKET_MINUTES, retention_hours=RETENTION_HOURS,
+                 refresh_seconds=REFRESH_SECONDS):
+        self.location_loader = location_loader
+        self.zooms = tuple(zooms)
+        self.grid = grid
+        self.refresh_seconds = refresh_seconds
+        self.bucket_minutes = bucket_minutes
+        self.retention_buckets = retention_hours * 60 // bucket_minutes
+        self._lock = threading.Lock()
+        self._tiles = {}  # (zoom, x, y) -> {bucket: array of shape (len(LAYERS), grid * grid)}
+        self._placements = {}  # location_id -> [(tile key, cell index)] across zooms
+        self._trip_ids = {}  # bucket -> trip IDs already counted
+        self._oldest_bucket = None
+        self._last_traffic_id = 0
+        self.warmed = False
+
+    def bucket_for(self, at):
+        return int(at.timestamp() // (self.bucket_minutes * 60))
+
+    def _placements_for(self, location_id):
+        placements = self._placements.get(location_id)
+        if placements is None:
+            # New location: reload coordinates once
+            for loaded_id, (latitude, longitude) in self.location_loader().items():
+                self._placements[loaded_id] = []
+                for zoom in self.zooms:
+                    tile_x, tile_y, cell = tile_position(latitude, longitude, zoom, self.grid)
+                    self._placements[loaded_id].append(((zoom, tile_x, tile_y), cell))
+            placements = self._placements.get(location_id)
+        return placements
+
+    def _prune(self, newest_bucket):
+        oldest = newest_bucket - self.retention_buckets + 1
+        if self._oldest_bucket is not None and oldest <= self._oldest_bucket:
+            return
+        self._oldest_bucket = oldest
+        for buckets in self._tiles.values():
+            for bucket in [b for b in buckets if b < oldest]:
+                del buckets[bucket]
+        for bucket in [b for b in self._trip_ids if b < oldest]:
+            del self._trip_ids[bucket]
+
+    def _add(self, location_id, at, values):
+        """Add `values` ({layer index: amount}) at a location's cell in every zoom; False if not placeable."""
+        bucket = self.bucket_for(at)
+        if self._oldest_bucket is not None and bucket < self._oldest_bucket:
+            return False
+        placements = self._placements_for(location_id)
+        if not placements:
+            return False
+
+        for key, cell in placements:
+            buckets = self._tiles.setdefault(key, {})
+            counts = buckets.get(bucket)
+            if counts is None:
+                counts = buckets[bucket] = np.zeros((len(LAYERS), self.grid * self.grid), dtype=np.float32)
+            for layer, amount in values.items():
+                counts[layer, cell] += amount
+        self._prune(max(bucket, self.bucket_for(datetime.now())))
+        return True
+
+    def handle(self, event):
+        """Post-commit handler: count a processed trip as a pickup at its pickup location."""
+        trip_at = trip_started_at(event['trip_date'], event.get('trip_time'))
+        with self._lock:
+            bucket = self.bucket_for(trip_at)
+            counted = self._trip_ids.setdefault(bucket, set())
+            if event['trip_id'] in counted:
+                return
+            if self._add(event['pickup_location_id'], trip_at, {PICKUPS: 1}):
+                counted.add(event['trip_id'])
+
+    def add_traffic(self, row):
+        with self._lock:
+            self._add(row.location_id, row.created_at, {
+                RIDE_REQUESTS: row.ride_requests,
+                INTENSITY_SUM: row.traffic_intensity,
+                TRAFFIC_SAMPLES: 1
+            })
+
+    def retention_start(self):
+        return datetime.now() - timedelta(minutes=self.retention_buckets * self.bucket_minutes)
+
+    def warm(self, db):
+        """Load processed trips from the retention window; later trips arrive through handle()."""
+        start = self.retention_start()
+        for trip in db.list_trips(start_date=start.date(), end_date=date.today()):
+            if trip.processed_at is not None or trip.coins_earned:
+                self.handle({
+                    'trip_id': trip.trip_id,
+                    'pickup_location_id': trip.pickup_location_id,
+                    'trip_date': trip.trip_date.isoformat(),
+                    'trip_time': str(trip.trip_time) if trip.trip_time is not None else None
+                })
+        self.warmed = True
+
+    def refresh(self, db, force=False):
+        """Warm up on first use, then fold in traffic readings stored since the last refresh.
+
+        Only readings inside the retention window are read. Meant to run off
+        the event loop; `force` is accepted for the refresh schedule and
+        changes nothing, as every call catches up.
+        """
+        if not self.warmed:
+            self.warm(db)
+        created_since = self.retention_start()
+        while True:
+            rows = db.list_traffic_data_since(self._last_traffic_id, REFRESH_BATCH, created_since)
+            for row in rows:
+                self.add_traffic(row)
+                self._last_traffic_id = max(self._last_traffic_id, row.traffic_id)
+            if len(rows) < REFRESH_BATCH:
+                break
+
+    def tiles(self, zoom, start, end, tile_x=None, tile_y=None):
+        """Tiles with data at `zoom` between `start` and `end`, each with flat per-cell arrays."""
+        first, last = self.bucket_for(start), self.bucket_for(end)
+        results = []
+        with self._lock:
+            for (tile_zoom, x, y), buckets in self._tiles.items():
+                if tile_zoom != zoom or (tile_x is not None and x != tile_x) or (tile_y is not None and y != tile_y):
+                    continue
+                selected = [counts for bucket, counts in buckets.items() if first <= bucket <= last]
+                if not selected:
+                    continue
+                totals = np.sum(selected, axis=0)
+                if not totals.any():
+                    continue
+                intensity = np.divide(totals[INTENSITY_SUM], totals[TRAFFIC_SAMPLES],
+                                      out=np.zeros(self.grid * self.grid, dtype=np.float32),
+                                      where=totals[TRAFFIC_SAMPLES] > 0)
+                results.append({
+                    'x': x,
+                    'y': y,
+                    'bounds': tile_bounds(zoom, x, y),
+                    'pickups': totals[PICKUPS].astype(int).tolist(),
+                    'ride_requests': totals[RIDE_REQUESTS].astype(int).tolist(),
+                    'traffic_intensity': np.round(intensity.astype(float), 3).tolist()
+                })
+        return sorted(results, key=lambda tile: (tile['x'], tile['y']))
+
+def trip_started_at(trip_date, trip_time):
+    """Datetime of a trip from its date (or ISO string) and "HH:MM:SS" / "H:MM:SS" time; midnight when missing."""
+    if isinstance(trip_date, str):
+        trip_date = date.fromisoformat(trip_date)
+    started_at = datetime.combine(trip_date, datetime.min.time())
+    if trip_time:
+        hours, minutes, seconds = (int(float(part)) for part in str(trip_time).split(':'))
+        started_at += timedelta(hours=hours, minutes=minutes, seconds=seconds)
+    return started_at
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# Events are full state snapshots, so a slow subscriber only needs the latest few
+QUEUE_SIZE = 16
+
+def _json_default(value):
+    # Datetimes as ISO 8601, matching what the JSON endpoints return
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+class DriverEventBroker:
+    """In-process fan-out of driver state events to connected subscribers.
+
+    Every subscriber gets its own bounded asyncio queue. Each event is encoded
+    once and the same string is queued for every subscriber of the driver. A
+    subscriber that falls behind loses its oldest events instead of blocking
+    the publisher; since every event is a full snapshot, the newest one is
+    all a client needs. Everything runs on one event loop, so publish() must
+    be called from that loop (the API's endpoints are all async).
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, driver_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[driver_id].add(queue)
+        return queue
+
+    def unsubscribe(self, driver_id, queue):
+        queues = self._subscribers.get(driver_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[driver_id]
+
+    def has_subscribers(self, driver_id):
+        return driver_id in self._subscribers
+
+    def subscriber_count(self):
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, driver_id, kind, payload):
+        """Queue (kind, JSON payload) for every subscriber of the driver; returns how many got it."""
+        queues = self._subscribers.get(driver_id)
+        if not queues:
+            return 0
+
+        message = (kind, json.dumps(payload, default=_json_default))
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+        self.published += 1
+        self.delivered += len(queues)
+        return len(queues)
+
+def format_sse(kind, data):
+    """One Server-Sent Events frame."""
+    return f"event: {kind}\ndata: {data}\n\n"
+
+async def _subscriber(broker, driver_id, expected, latencies):
+    """Benchmark consumer: frame each event the way the SSE endpoint would and record its latency."""
+    queue = broker.subscribe(driver_id)
+    try:
+        for _ in range(expected):
+            kind, data = await queue.get()
+            format_sse(kind, data)
+            latencies.append(time.perf_counter() - json.loads(data)['sent_at'])
+    finally:
+        broker.unsubscribe(driver_id, queue)
+
+async def run_fanout_benchmark(subscribers=10000, drivers=2000, events=20000, seed=42):
+    """Fan `events` state updates for random drivers out to `subscribers` connections.
+
+    Subscribers are spread round-robin over `drivers`, so each event reaches
+    subscribers / drivers connections. Publishing yields to the loop after every
+    event, like an endpoint returning, so consumers run between publishes.
+    """
+    rng = np.random.default_rng(seed)
+    broker = DriverEventBroker()
+    driver_ids = [f"D{index:05d}" for index in range(drivers)]
+    targets = rng.integers(0, drivers, events)
+
+    # Each subscriber waits for exactly the events published for its driver
+    per_driver = np.bincount(targets, minlength=drivers)
+    latencies = []
+    tasks = [
+        asyncio.create_task(_subscriber(broker, driver_ids[index % drivers], int(per_driver[index % drivers]), latencies))
+        for index in range(subscribers)
+    ]
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    for target in targets:
+        broker.publish(driver_ids[target], 'trip_processed', {
+            'driver_id': driver_ids[target],
+            'coins_earned': 42,
+            'distance_covered_today': 63.5,
+            'multiplier_active': False,
+            'sent_at': time.perf_counter()
+        })
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'subscribers': subscribers,
+        'events_published': broker.published,
+        'messages_delivered': broker.delivered,
+        'messages_dropped': broker.dropped,
+        'seconds': elapsed,
+        'deliveries_per_second': broker.delivered / elapsed if elapsed else 0.0,
+        'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark in-process fan-out of driver events to subscribers.")
+    parser.add_argument("--subscribers", type=int, default=10000, help="Open subscriber connections")
+    parser.add_argument("--drivers", type=int, default=2000, help="Drivers the subscribers are spread over")
+    parser.add_argument("--events", type=int, default=20000, help="State updates to publish")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for which drivers get updates")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Fanning {args.events:,} events out to {args.subscribers:,} subscribers over {args.drivers:,} drivers...")
+    result = asyncio.run(run_fanout_benchmark(args.subscribers, args.drivers, args.events, args.seed))
+    print(f"Delivered {result['messages_delivered']:,} messages in {result['seconds']:.2f}s "
+          f"({result['deliveries_per_second']:,.0f}/s), dropped {result['messages_dropped']:,}")
+    print(f"Publish-to-consume latency: p50 {result['latency_p50_ms']:.2f} ms, p99 {result['latency_p99_ms']:.2f} ms")
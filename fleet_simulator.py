@@ -0,0 +1,376 @@
+import argparse
+import heapq
+import os
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import incentive_rules
+from data_generator import DATASET_FILES, DEFAULT_SEED
+from incentive_rules import DEFAULT_PARAMS, DailyState, DriverProfile, TripInput
+from request_stream import iter_request_chunks, load_request_stream
+
+# Event kinds, in tie-break order when two events share a timestamp
+SHIFT_START, MULTIPLIER_EXPIRY, DROPOFF, PICKUP, REQUEST, GO_HOME, SHIFT_END = range(7)
+EVENT_NAMES = ['shift_start', 'multiplier_expiry', 'dropoff', 'pickup', 'request', 'go_home', 'shift_end']
+
+# Online hours per preferred shift: 8-hour shifts overlapping that time of day
+SHIFT_HOURS = {'Morning': (5, 13), 'Afternoon': (11, 19), 'Evening': (16, 24), 'Night': (0, 8), 'All Day': (7, 22)}
+TIME_OF_DAY_CODES = {'Morning': 0, 'Afternoon': 1, 'Evening': 2, 'Night': 3}
+ALL_DAY = 4
+TRIP_TYPE_CODES = {'Short': 0, 'Long': 1, 'Both': 2}
+
+KM_PER_DEGREE = 111
+KM_PER_DEGREE_LONG = 111 * np.cos(np.radians(13))
+AVERAGE_SPEED_KMH = 20  # Same city speed data_generator uses for pickup times
+
+MAX_PICKUP_KM = 8.0      # Requests are never offered to drivers further away than this
+OFFERS_PER_ATTEMPT = 3   # Best-scoring drivers offered a request before it waits for a retry
+RETRY_SECONDS = 60
+MAX_WAIT_SECONDS = 600   # Passengers give up after this long without a driver
+GO_HOME_BEFORE_END_HOURS = 1
+HOME_RADIUS_KM = 2.0     # A go-home driver within this of home logs off after the trip
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    return np.sqrt(((lat1 - lat2) * KM_PER_DEGREE)**2 + ((lon1 - lon2) * KM_PER_DEGREE_LONG)**2)
+
+def load_drivers(path=None, count=None, seed=DEFAULT_SEED):
+    """Drivers from drivers_data.csv (or Parquet), optionally a random sample of `count`."""
+    path = path or f"{DATASET_FILES['drivers']}.csv"
+    drivers = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+    if count is not None and count < len(drivers):
+        drivers = drivers.sample(count, random_state=seed)
+    return drivers.reset_index(drop=True)
+
+def load_requests(path=None, day=None, scale=1.0, seed=DEFAULT_SEED):
+    """One day of ride requests, from a written stream or generated by request_stream."""
+    if path:
+        return load_request_stream(path)
+    return pd.concat(iter_request_chunks(day or date.today(), days=1, scale=scale, seed=seed), ignore_index=True)
+
+class FleetSimulator:
+    """All drivers and requests of one day advanced together on a single event heap.
+
+    Requests are offered to the best-scoring idle drivers (the compatibility
+    rules from data_generator.calculate_edge_features, vectorized over the
+    fleet), who accept at their historical acceptance rate, raised by an
+    active multiplier. Accepted trips run pickup -> dropoff; completed trips
+    earn coins through incentive_rules, and drivers activate multipliers and
+    go-home mode as their coins and shifts allow. Driver state lives in numpy
+    arrays so scoring a request is a handful of array operations.
+    """
+
+    def __init__(self, drivers, requests, params=DEFAULT_PARAMS, seed=DEFAULT_SEED):
+        self.params = params
+        self.rng = np.random.default_rng(seed)
+        n, m = len(drivers), len(requests)
+
+        self.driver_ids = drivers['driver_id'].to_numpy()
+        self.lat = drivers['latitude'].to_numpy(dtype=float).copy()
+        self.lon = drivers['longitude'].to_numpy(dtype=float).copy()
+        self.home_lat = drivers['home_latitude'].to_numpy(dtype=float)
+        self.home_lon = drivers['home_longitude'].to_numpy(dtype=float)
+        self.peak_acceptance = drivers['peak_acceptance_rate'].to_numpy(dtype=float) / 100
+        self.off_peak_acceptance = drivers['off_peak_acceptance_rate'].to_numpy(dtype=float) / 100
+        self.responsiveness = drivers['incentive_responsiveness'].to_numpy(dtype=float)
+        self.shift_start = np.array([SHIFT_HOURS[shift][0] for shift in drivers['preferred_shift']]) * 3600.0
+        self.shift_end = np.array([SHIFT_HOURS[shift][1] for shift in drivers['preferred_shift']]) * 3600.0
+        self.scheduled = (drivers['online_status'] == 'Online').to_numpy()
+        # Score penalty for each (trip length, time of day) a request can have: 8 columns per driver
+        trip_type = drivers['preferred_trip_type'].map(TRIP_TYPE_CODES).to_numpy()
+        shift = drivers['preferred_shift'].map({**TIME_OF_DAY_CODES, 'All Day': ALL_DAY}).to_numpy()
+        is_long, time_of_day = np.divmod(np.arange(8), 4)
+        self.preference_penalty = (
+            20 * ((trip_type[:, None] != TRIP_TYPE_CODES['Both']) & (trip_type[:, None] != is_long[None, :])) +
+            15 * ((shift[:, None] != ALL_DAY) & (shift[:, None] != time_of_day[None, :]))
+        )
+        self.profiles = [
+            DriverProfile(row.daily_avg_distance_km, row.ride_acceptance_rate, row.cancellation_rate)
+            for row in drivers.itertuples(index=False)
+        ]
+
+        self.online = np.zeros(n, dtype=bool)
+        self.busy = np.zeros(n, dtype=bool)
+        self.available = np.zeros(n, dtype=bool)  # online and not busy
+        self.home_dir_lat = np.zeros(n)  # Unit vector from the driver's position towards home
+        self.home_dir_lon = np.zeros(n)
+        self.go_home = np.zeros(n, dtype=bool)
+        self.reached_home = np.zeros(n, dtype=bool)
+        self.multiplier = np.ones(n)
+        self.best_multiplier = np.ones(n)
+        # A multiplier is activated at most once per day, so it doesn't come back after expiring
+        self.multiplier_used = np.zeros(n, dtype=bool)
+        self.online_since = np.zeros(n)
+        self.online_seconds = np.zeros(n)
+        self.busy_seconds = np.zeros(n)
+        self.trips = np.zeros(n, dtype=int)
+        self.earnings = np.zeros(n)
+        self.states = [DailyState() for _ in range(n)]
+
+        day_start = requests['request_time'].min().normalize()
+        self.request_ids = requests['request_id'].to_numpy()
+        self.request_at = (requests['request_time'] - day_start).dt.total_seconds().to_numpy()
+        self.pickup_lat = requests['pickup_latitude'].to_numpy()
+        self.pickup_lon = requests['pickup_longitude'].to_numpy()
+        self.dest_lat = requests['destination_latitude'].to_numpy()
+        self.dest_lon = requests['destination_longitude'].to_numpy()
+        self.trip_km = requests['estimated_trip_distance_km'].to_numpy()
+        self.time_of_day = requests['time_of_day'].tolist()
+        self.time_of_day_code = requests['time_of_day'].map(TIME_OF_DAY_CODES).to_numpy()
+        self.at_event = requests['at_event'].to_numpy(dtype=bool)
+        self.event_type = requests['event_type'].where(requests['at_event'], None).tolist()
+        tip = requests['tip_amount'].to_numpy(dtype=float)
+
+        # Per-request draws made up front, as in calculate_edge_features
+        peak = np.isin(self.time_of_day_code, [TIME_OF_DAY_CODES['Morning'], TIME_OF_DAY_CODES['Evening']])
+        traffic = self.rng.uniform(0.8, 2.0, m)
+        traffic = traffic * np.where(peak, self.rng.uniform(1.2, 1.5, m), 1.0)
+        traffic = traffic * np.where(self.at_event, self.rng.uniform(1.1, 1.3, m), 1.0)
+        surge = 1.0 + np.where(peak, self.rng.uniform(0, 0.5, m), 0.0) + np.where(self.at_event, self.rng.uniform(0, 1.0, m), 0.0)
+        self.peak = peak
+        self.traffic = traffic
+        self.base_trip_fare = 30 + self.trip_km * 15
+        self.trip_seconds = self.trip_km / AVERAGE_SPEED_KMH * 3600 * traffic
+
+        # Score terms that depend only on the request
+        self.request_bonus = (np.minimum(tip / 2, 25) * (tip > 0)
+                              - np.where(traffic > 1.5, np.minimum(30, (traffic - 1.5) * 60), 0.0))
+        self.surge_responsive = surge > 1.2
+        self.preference_column = (self.trip_km > 5).astype(int) * 4 + self.time_of_day_code
+
+        self.assigned = np.full(m, -1)
+        self.accepted_at = np.full(m, np.nan)
+        self.picked_up_at = np.full(m, np.nan)
+        self.pickup_km = np.zeros(m)
+        self.offers = np.zeros(m, dtype=int)
+        self.abandoned = np.zeros(m, dtype=bool)
+
+        self.queue = []
+        self.sequence = 0
+        self.events = np.zeros(len(EVENT_NAMES), dtype=np.int64)
+
+    def _move(self, d, lat, lon):
+        self.lat[d], self.lon[d] = lat, lon
+        to_home_lat, to_home_lon = self.home_lat[d] - lat, self.home_lon[d] - lon
+        norm = np.hypot(to_home_lat, to_home_lon)
+        self.home_dir_lat[d], self.home_dir_lon[d] = (to_home_lat / norm, to_home_lon / norm) if norm > 0 else (0.0, 0.0)
+
+    def _push(self, at, kind, index):
+        self.sequence += 1
+        heapq.heappush(self.queue, (at, kind, self.sequence, index))
+
+    def _scores(self, r, candidates, pickup_km):
+        """Compatibility of request `r` with each candidate driver."""
+        score = (100 + self.request_bonus[r]) - np.minimum(50, pickup_km * 5) * (pickup_km > 5)
+        score -= self.preference_penalty[candidates, self.preference_column[r]]
+        if self.surge_responsive[r]:
+            score += self.responsiveness[candidates] * 20
+
+        # Towards home: destination within 45 degrees of the driver's heading home
+        to_dest_lat = self.dest_lat[r] - self.lat[candidates]
+        to_dest_lon = self.dest_lon[r] - self.lon[candidates]
+        towards_home = (self.home_dir_lat[candidates] * to_dest_lat + self.home_dir_lon[candidates] * to_dest_lon >
+                        0.7 * np.hypot(to_dest_lat, to_dest_lon))
+        score += 25 * towards_home
+
+        # Go-home drivers only take trips towards home
+        score[self.go_home[candidates] & ~towards_home] = -np.inf
+        return score
+
+    def _on_request(self, now, r):
+        available = np.flatnonzero(self.available)
+        pickup_km = _distance_km(self.lat[available], self.lon[available], self.pickup_lat[r], self.pickup_lon[r])
+        within = pickup_km <= MAX_PICKUP_KM
+        candidates, pickup_km = available[within], pickup_km[within]
+
+        if len(candidates):
+            score = self._scores(r, candidates, pickup_km)
+            top = np.argpartition(-score, min(OFFERS_PER_ATTEMPT, len(score)) - 1)[:OFFERS_PER_ATTEMPT]
+            for i in top[np.argsort(-score[top])]:
+                if score[i] == -np.inf:
+                    break
+                d = candidates[i]
+                self.offers[r] += 1
+
+                # Acceptance: historical rate, nudged by compatibility and raised by an active multiplier
+                rate = self.peak_acceptance[d] if self.peak[r] else self.off_peak_acceptance[d]
+                rate *= (0.5 + min(score[i], 100) / 200) * (1 + (self.multiplier[d] - 1) * self.responsiveness[d])
+                if self.rng.random() < rate:
+                    self.busy[d] = True
+                    self.available[d] = False
+                    self.assigned[r] = d
+                    self.accepted_at[r] = now
+                    self.pickup_km[r] = pickup_km[i]
+                    pickup_seconds = pickup_km[i] / AVERAGE_SPEED_KMH * 3600 * self.traffic[r]
+                    self._push(now + pickup_seconds, PICKUP, r)
+                    return
+
+        if now + RETRY_SECONDS <= self.request_at[r] + MAX_WAIT_SECONDS:
+            self._push(now + RETRY_SECONDS, REQUEST, r)
+        else:
+            self.abandoned[r] = True
+
+    def _on_pickup(self, now, r):
+        d = self.assigned[r]
+        self.picked_up_at[r] = now
+        self._move(d, self.pickup_lat[r], self.pickup_lon[r])
+        self._push(now + self.trip_seconds[r], DROPOFF, r)
+
+    def _on_dropoff(self, now, r):
+        d = self.assigned[r]
+        self.busy[d] = False
+        self.available[d] = self.online[d]
+        self.busy_seconds[d] += now - self.accepted_at[r]
+        self._move(d, self.dest_lat[r], self.dest_lon[r])
+
+        # The coin rules take a 0-1 traffic factor; the dispatch one runs 0.8-3.9
+        trip = TripInput(self.trip_km[r], self.pickup_km[r], min(self.traffic[r] / 2, 1.0), self.time_of_day[r],
+                         bool(self.at_event[r]), self.event_type[r], self.base_trip_fare[r])
+        state = self.states[d]
+        outcome = incentive_rules.evaluate_trip(self.profiles[d], state, trip, self.params)
+        state = self.states[d] = incentive_rules.apply_trip(state, outcome)
+        self.trips[d] += 1
+        self.earnings[d] += self.base_trip_fare[r] * self.multiplier[d]
+
+        # Responsive drivers cash in coins for the day's multiplier as soon as they can
+        if not self.multiplier_used[d]:
+            value = incentive_rules.multiplier_for_coins(state.coins_earned, self.params)
+            if value is not None and self.rng.random() < self.responsiveness[d]:
+                self.multiplier[d] = value
+                self.multiplier_used[d] = True
+                self.best_multiplier[d] = max(self.best_multiplier[d], value)
+                self._push(now + incentive_rules.MULTIPLIER_HOURS * 3600, MULTIPLIER_EXPIRY, d)
+
+        near_home = _distance_km(self.lat[d], self.lon[d], self.home_lat[d], self.home_lon[d]) <= HOME_RADIUS_KM
+        if self.go_home[d] and near_home:
+            self.reached_home[d] = True
+            self._go_offline(now, d)
+        elif now >= self.shift_end[d]:
+            self._go_offline(now, d)
+
+    def _go_offline(self, now, d):
+        if self.online[d]:
+            self.online[d] = False
+            self.available[d] = False
+            self.online_seconds[d] += now - self.online_since[d]
+
+    def _on_shift_start(self, now, d):
+        self.online[d] = True
+        self.available[d] = True
+        self.online_since[d] = now
+        self._move(d, self.lat[d], self.lon[d])
+
+    def _on_shift_end(self, now, d):
+        # Drivers mid-trip log off at dropoff
+        if not self.busy[d]:
+            self._go_offline(now, d)
+
+    def _on_go_home(self, now, d):
+        if self.online[d]:
+            self.go_home[d] = True
+
+    def _on_multiplier_expiry(self, now, d):
+        self.multiplier[d] = 1.0
+
+    def run(self):
+        """Run the whole day; returns simulated events processed."""
+        for d in np.flatnonzero(self.scheduled):
+            self._push(self.shift_start[d], SHIFT_START, d)
+            self._push(self.shift_end[d] - GO_HOME_BEFORE_END_HOURS * 3600, GO_HOME, d)
+            self._push(self.shift_end[d], SHIFT_END, d)
+        for r in range(len(self.request_at)):
+            self._push(self.request_at[r], REQUEST, r)
+
+        handlers = [self._on_shift_start, self._on_multiplier_expiry, self._on_dropoff, self._on_pickup,
+                    self._on_request, self._on_go_home, self._on_shift_end]
+        queue, events = self.queue, self.events
+        while queue:
+            now, kind, _, index = heapq.heappop(queue)
+            events[kind] += 1
+            handlers[kind](now, index)
+        return int(events.sum())
+
+    def driver_report(self):
+        """Per-driver utilization, idle time, trips, coins, earnings and incentive outcomes."""
+        online_hours = self.online_seconds / 3600
+        busy_hours = self.busy_seconds / 3600
+        return pd.DataFrame({
+            'driver_id': self.driver_ids,
+            'online_hours': online_hours.round(2),
+            'busy_hours': busy_hours.round(2),
+            'idle_hours': (online_hours - busy_hours).round(2),
+            'utilization': np.divide(busy_hours, online_hours, out=np.zeros_like(busy_hours), where=online_hours > 0).round(3),
+            'trips': self.trips,
+            'distance_km': np.round([state.distance_covered_today for state in self.states], 2),
+            'coins': [state.coins_earned for state in self.states],
+            'earnings': self.earnings.round(2),
+            'multiplier': self.best_multiplier,
+            'went_home': self.go_home,
+            'reached_home': self.reached_home
+        })[self.scheduled].reset_index(drop=True)
+
+    def request_report(self):
+        """Per-request outcome: who took it, offers made and the passenger's wait to pickup."""
+        status = np.where(self.abandoned, 'abandoned', np.where(np.isnan(self.picked_up_at), 'open', 'completed'))
+        return pd.DataFrame({
+            'request_id': self.request_ids,
+            'status': status,
+            'driver_id': np.where(self.assigned >= 0, self.driver_ids[np.maximum(self.assigned, 0)], None),
+            'offers': self.offers,
+            'wait_minutes': ((self.picked_up_at - self.request_at) / 60).round(2),
+            'pickup_km': self.pickup_km.round(2)
+        })
+
+    def summary(self):
+        """Fleet-level utilization, idle time, wait times and fulfilment."""
+        drivers = self.driver_report()
+        requests = self.request_report()
+        waits = requests['wait_minutes'].dropna()
+        return {
+            'drivers_online': len(drivers),
+            'requests': len(requests),
+            'fulfilled_pct': round(100 * (requests['status'] == 'completed').mean(), 2),
+            'abandoned_pct': round(100 * (requests['status'] == 'abandoned').mean(), 2),
+            'wait_p50_min': round(float(waits.median()), 2) if len(waits) else None,
+            'wait_p90_min': round(float(waits.quantile(0.9)), 2) if len(waits) else None,
+            'utilization_mean': round(float(drivers['utilization'].mean()), 3),
+            'idle_hours_mean': round(float(drivers['idle_hours'].mean()), 2),
+            'trips_per_driver': round(float(drivers['trips'].mean()), 2),
+            'multiplier_uptake_pct': round(100 * (drivers['multiplier'] > 1).mean(), 2),
+            'reached_home_pct': round(100 * drivers['reached_home'].sum() / max(drivers['went_home'].sum(), 1), 2)
+        }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulate the whole fleet competing for one day of ride requests.")
+    parser.add_argument("--drivers-file", default=None, help="Driver table (default: drivers_data.csv)")
+    parser.add_argument("--drivers", type=int, default=None, help="Sample this many drivers from the table")
+    parser.add_argument("--requests", default=None, help="Request stream written by request_stream.py; generated if omitted")
+    parser.add_argument("--scale", type=float, default=1.0, help="Demand multiplier when generating requests")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for requests and driver decisions")
+    parser.add_argument("--output", default=None, help="Directory for per-driver and per-request Parquet reports")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    drivers = load_drivers(args.drivers_file, args.drivers, args.seed)
+    requests = load_requests(args.requests, scale=args.scale, seed=args.seed)
+
+    simulator = FleetSimulator(drivers, requests, seed=args.seed)
+    print(f"Simulating {simulator.scheduled.sum():,} online drivers and {len(requests):,} requests...")
+    start = time.perf_counter()
+    events = simulator.run()
+    seconds = time.perf_counter() - start
+    print(f"Processed {events:,} events in {seconds:.2f}s ({events / seconds * 60:,.0f} events/min)")
+    print(pd.Series(simulator.events, index=EVENT_NAMES).to_string())
+
+    print()
+    for key, value in simulator.summary().items():
+        print(f"{key:>22}: {value}")
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        simulator.driver_report().to_parquet(os.path.join(args.output, "fleet_drivers.parquet"), index=False)
+        simulator.request_report().to_parquet(os.path.join(args.output, "fleet_requests.parquet"), index=False)
+        print(f"\nReports saved to {args.output}/")
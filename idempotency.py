@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import time
+from collections import OrderedDict
+
+# How long a stored response answers retries of the same key
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+MAX_ENTRIES = 100000
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request."""
+
+class IdempotencyStore:
+    """Responses stored by Idempotency-Key, so a retried request replays instead of re-running.
+
+    The first request with a key runs; concurrent requests with the same key
+    wait for it and get its response. Later retries within the TTL get the
+    stored response from a dict lookup. A key is tied to the request it
+    was first used with (method and path), and reusing it for another one
+    raises IdempotencyKeyReused. Failures are not stored, so a request that
+    errored can be retried with the same key.
+
+    Entries live in this process only and are evicted oldest first. Every
+    entry has the same TTL, so insertion order is also expiry order.
+    """
+
+    def __init__(self, ttl_seconds=IDEMPOTENCY_TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self.replays = 0
+
+    def _purge(self, now):
+        while self._entries:
+            key, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    async def run(self, key, request_id, func):
+        """Return (response, replayed) for `await func()` under `key`; without a key just run it."""
+        if key is None:
+            return await func(), False
+
+        now = time.monotonic()
+        self._purge(now)
+        entry = self._entries.get(key)
+        if entry is not None:
+            _, stored_request, response = entry
+            if stored_request != request_id:
+                raise IdempotencyKeyReused(f"Idempotency-Key {key} was used for {stored_request}")
+            self.replays += 1
+            return response, True
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            stored_request, future = in_flight
+            if stored_request != request_id:
+                raise IdempotencyKeyReused(f"Idempotency-Key {key} was used for {stored_request}")
+            self.replays += 1
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (request_id, future)
+        try:
+            response = await func()
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so an unawaited failure doesn't log "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, request_id, response)
+        future.set_result(response)
+        return response, False
+
+    def __len__(self):
+        return len(self._entries)
+
+async def concurrent_retry_check(retries=20):
+    """Process one trip and one cancellation with `retries` concurrent requests per key.
+
+    Runs the API in-process on the in-memory backend and checks every
+    response is identical, coins are awarded once and the cancellation
+    penalty is taken once.
+    """
+    import os
+    import tempfile
+    scratch = tempfile.mkdtemp()
+    os.environ["NAMMA_YATRI_DATABASE_URL"] = "memory://"
+    os.environ["NAMMA_YATRI_TRIP_JOURNAL"] = os.path.join(scratch, "trip_events.journal")
+    os.environ["NAMMA_YATRI_ANALYTICS_DIR"] = os.path.join(scratch, "trip_analytics")
+    import httpx
+    import namma_yatri_api as api
+
+    api.backend.drop_schema()
+    api.backend.create_schema()
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        for name, lat, lon in [("Indiranagar", 12.9784, 77.6408), ("Koramangala", 12.9352, 77.6245)]:
+            await client.post("/locations/", json={"location_name": name, "latitude": lat, "longitude": lon})
+        await client.post("/drivers/", json={
+            "driver_id": "IDEM-1", "name": "Retry Driver", "experience_years": 3, "rating": 4.5,
+            "daily_avg_distance_km": 90, "ride_acceptance_rate": 90, "cancellation_rate": 5,
+            "consecutive_target_days": 0, "home_location_id": 1, "current_location_id": 2
+        })
+        await client.post("/trips/", json={
+            "trip_id": "IDEM-T1", "driver_id": "IDEM-1", "pickup_location_id": 2, "destination_location_id": 1,
+            "estimated_trip_distance_km": 9.5, "distance_to_pickup_km": 1.2, "traffic_factor": 0.8,
+            "time_of_day": "Morning", "base_fare": 30, "base_trip_fare": 172.5, "trip_duration_minutes": 25
+        })
+        trip_responses = await asyncio.gather(*[
+            client.post("/trips/IDEM-T1/process", headers={"Idempotency-Key": "trip-key"}) for _ in range(retries)
+        ])
+
+        cancellation = (await client.post("/cancellations/", json={
+            "driver_id": "IDEM-1", "trip_id": "IDEM-T2", "time_since_accept_seconds": 300, "reason": "traffic"
+        })).json()
+        cancel_responses = await asyncio.gather(*[
+            client.post(f"/cancellations/{cancellation['cancellation_id']}/process",
+                        headers={"Idempotency-Key": "cancel-key"})
+            for _ in range(retries)
+        ])
+        # A retry without the key is caught by the processed_at marker instead
+        unkeyed = await client.post(f"/cancellations/{cancellation['cancellation_id']}/process")
+        reused = await client.post("/trips/IDEM-T1/process", headers={"Idempotency-Key": "cancel-key"})
+        stats = (await client.get("/drivers/IDEM-1/daily-stats")).json()
+
+    trip_bodies = {response.text for response in trip_responses}
+    cancel_bodies = {response.text for response in cancel_responses}
+    replayed = sum(response.headers.get("Idempotent-Replayed") == "true" for response in trip_responses + cancel_responses)
+    coins_awarded = trip_responses[0].json()["new_coins_balance"]
+    penalty = cancel_responses[0].json()["penalty_coins"]
+    checks = {
+        "all trip retries got the same response": len(trip_bodies) == 1 and trip_responses[0].status_code == 200,
+        "all cancellation retries got the same response": len(cancel_bodies) == 1 and cancel_responses[0].status_code == 200,
+        "every retry but the first was replayed": replayed == 2 * (retries - 1),
+        "coins awarded and penalty taken once": stats["coins_earned"] == coins_awarded - penalty,
+        "unkeyed retry did not penalise again": unkeyed.json()["new_coins_balance"] == stats["coins_earned"],
+        "key reused for another request is rejected": reused.status_code == 422
+    }
+    for name, passed in checks.items():
+        print(f"{'ok  ' if passed else 'FAIL'} {name}")
+    return all(checks.values())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check concurrent retries with one Idempotency-Key are processed once.")
+    parser.add_argument("--retries", type=int, default=20, help="Concurrent requests per key")
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(concurrent_retry_check(args.retries)) else 1)
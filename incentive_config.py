@@ -0,0 +1,154 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+
+from incentive_rules import DEFAULT_PARAMS, IncentiveParams, params_from_dict
+
+# Config file layout:
+# {
+#   "version": "2024-06-01.1",
+#   "experiment": "incentives",   # salt for variant assignment; keep it to keep drivers in their arms
+#   "params": {"coin_system": {...}, "traffic_weights": {...},
+#              "cancellation_penalties": {...}, "forgiveness_buffer": {...}},
+#   "variants": {"long-streaks": {"share": 0.1, "overrides": {"coin_system": {...}}}}
+# }
+# Drivers outside every variant's share get the base "params" (the "control" arm).
+CONTROL = "control"
+
+@dataclass(frozen=True)
+class IncentiveConfig:
+    """One loaded config file: base parameters plus optional A/B variants."""
+    version: str
+    params: IncentiveParams = DEFAULT_PARAMS
+    variants: tuple = ()  # (name, share, IncentiveParams) in file order
+    experiment: str = "incentives"
+    source: str = None
+    loaded_at: datetime = field(default_factory=datetime.now)
+
+    def variant_for(self, driver_id):
+        """Stable variant assignment: a driver's hash bucket picks the arm."""
+        if not self.variants:
+            return CONTROL
+        digest = hashlib.md5(f"{self.experiment}:{driver_id}".encode()).digest()
+        bucket = int.from_bytes(digest[:8], "big") / 2 ** 64
+
+        upper = 0.0
+        for name, share, _ in self.variants:
+            upper += share
+            if bucket < upper:
+                return name
+        return CONTROL
+
+    def params_for(self, driver_id):
+        """(variant name, parameters) for a driver."""
+        name = self.variant_for(driver_id)
+        for variant_name, _, params in self.variants:
+            if variant_name == name:
+                return name, params
+        return CONTROL, self.params
+
+    def describe(self):
+        """JSON-ready summary for the admin endpoints."""
+        return {
+            "version": self.version,
+            "experiment": self.experiment,
+            "source": self.source,
+            "loaded_at": self.loaded_at.isoformat(),
+            "params": self.params.to_dict(),
+            "variants": {
+                name: {"share": share, "params": params.to_dict()} for name, share, params in self.variants
+            }
+        }
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _check_params(sections, where):
+    """Raise ValueError unless `sections` is {section: {parameter: value}} shaped like DEFAULT_PARAMS."""
+    if not isinstance(sections, dict):
+        raise ValueError(f"{where} must be an object of parameter sections")
+    defaults = DEFAULT_PARAMS.to_dict()
+    for section, values in sections.items():
+        if section not in defaults:
+            raise ValueError(f"{where}: unknown incentive parameter section: {section}")
+        if not isinstance(values, dict):
+            raise ValueError(f"{where}.{section} must be an object")
+        for key, value in values.items():
+            if key not in defaults[section]:
+                raise ValueError(f"{where}.{section}: unknown parameter {key}")
+            default = defaults[section][key]
+            if isinstance(default, list):
+                check = _is_number if _is_number(default[0]) else (lambda item: isinstance(item, str))
+                if not isinstance(value, list) or not all(check(item) for item in value):
+                    kind = "numbers" if _is_number(default[0]) else "strings"
+                    raise ValueError(f"{where}.{section}.{key} must be a list of {kind}")
+            elif not _is_number(value):
+                raise ValueError(f"{where}.{section}.{key} must be a number")
+
+def parse_incentive_config(data, source=None):
+    """Build and validate a config from its decoded JSON; raises ValueError on any problem."""
+    if not isinstance(data, dict):
+        raise ValueError("Incentive config must be a JSON object")
+    if "version" not in data:
+        raise ValueError("Incentive config needs a version")
+    version = str(data["version"])
+
+    _check_params(data.get("params", {}), "params")
+    params = params_from_dict(data.get("params", {}), version=version)
+
+    variants_data = data.get("variants", {})
+    if not isinstance(variants_data, dict):
+        raise ValueError("variants must be an object of variant name to {share, overrides}")
+
+    variants = []
+    total_share = 0.0
+    for name, variant in variants_data.items():
+        if name == CONTROL:
+            raise ValueError(f"'{CONTROL}' is reserved for the base parameters")
+        if not isinstance(variant, dict):
+            raise ValueError(f"Variant {name} must be an object with share and overrides")
+        if not _is_number(variant.get("share", 0)):
+            raise ValueError(f"Variant {name}: share must be a number")
+        _check_params(variant.get("overrides", {}), f"variants.{name}.overrides")
+        share = float(variant.get("share", 0))
+        if not 0 <= share <= 1:
+            raise ValueError(f"Variant {name}: share must be between 0 and 1")
+        total_share += share
+        variant_params = params_from_dict(variant.get("overrides", {}), base=params, version=f"{version}/{name}")
+        variants.append((name, share, variant_params))
+
+    if total_share > 1:
+        raise ValueError(f"Variant shares add up to {total_share:.2f}, more than 1")
+
+    return IncentiveConfig(version=version, params=params, variants=tuple(variants),
+                           experiment=data.get("experiment", "incentives"), source=source)
+
+def load_incentive_config(path):
+    """Read and validate a config file."""
+    with open(path) as f:
+        return parse_incentive_config(json.load(f), source=path)
+
+class IncentiveConfigStore:
+    """Holds the live config; reload swaps it atomically or leaves it untouched on error.
+
+    Readers take `store.current` once per request and use that snapshot
+    throughout, so a reload never mixes two parameter sets in one request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self.current = load_incentive_config(path)
+        else:
+            self.current = IncentiveConfig(version=DEFAULT_PARAMS.version)
+
+    def reload(self, path=None):
+        """Load `path` (default: the original file) and make it live."""
+        with self._lock:
+            config = load_incentive_config(path or self.path)
+            self.current = config
+            return config
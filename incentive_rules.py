@@ -0,0 +1,410 @@
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Mapping, Optional
+import argparse
+import time
+
+import numpy as np
+
+# Default incentive parameters (the values NammaYatriIncentiveSystem has always used)
+COIN_SYSTEM = {
+    'daily_milestone_60_percent': 50,  # Coins for 60% of daily target
+    'daily_milestone_100_percent': 100,  # Coins for 100% of daily target
+    'traffic_max_coins': 20,  # Maximum coins from traffic
+    'consecutive_trip_bonus': 5,  # Bonus for consecutive trips
+    'streak_thresholds': [3, 5, 10],  # Consecutive trips needed for streak bonus
+    'streak_bonuses': [10, 15, 25]  # Coins awarded for each streak level
+}
+
+TRAFFIC_WEIGHTS = {
+    'base_weight': 0.5,
+    'time_of_day_weight': 0.3,
+    'historical_weight': 0.2
+}
+
+CANCELLATION_PENALTIES = {
+    'legitimate_reasons': ['passenger_no_show', 'passenger_request', 'vehicle_damage', 'emergency'],
+    'cooldown_minutes': 15,  # Cooldown for legitimate cancellations
+    'standard_penalty': 10,  # Default coin penalty
+    'time_thresholds': [60, 180, 300],  # Seconds since acceptance
+    'penalty_multipliers': [0.5, 1.0, 1.5]  # Penalty multipliers based on time
+}
+
+FORGIVENESS_BUFFER = {
+    'threshold_acceptance_rate': 90,  # High acceptance rate
+    'threshold_cancellation_rate': 5,  # Low cancellation rate
+    'buffer_coins': 10  # Coins protected from penalties
+}
+
+# Traffic weight by time of day; anything else gets the default
+TIME_OF_DAY_TRAFFIC_WEIGHTS = {
+    'Morning': 0.8,  # Morning rush
+    'Evening': 0.9,  # Evening rush (highest)
+    'Afternoon': 0.5,  # Moderate
+    'Night': 0.3  # Light traffic
+}
+DEFAULT_TRAFFIC_WEIGHT = 0.5
+
+# Event bonus coins by event type; other events get the default
+EVENT_BONUSES = {'Concert': 10, 'Sports': 10, 'Festival': 20}
+DEFAULT_EVENT_BONUS = 5
+
+# Multiplier tiers, unlocked at the 60% and 100% coin milestones
+MULTIPLIER_TIER_60 = 1.25
+MULTIPLIER_TIER_100 = 1.5
+MULTIPLIER_HOURS = 4
+
+PARAM_SECTIONS = ('coin_system', 'traffic_weights', 'cancellation_penalties', 'forgiveness_buffer')
+
+def _freeze(value):
+    """Read-only copy of nested dicts/lists."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _thaw(value):
+    """Plain dicts/lists again, e.g. for JSON responses."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+@dataclass(frozen=True, eq=False)
+class IncentiveParams:
+    """One complete, read-only set of incentive parameters, safe to share across requests."""
+    coin_system: Mapping = field(default_factory=lambda: COIN_SYSTEM)
+    traffic_weights: Mapping = field(default_factory=lambda: TRAFFIC_WEIGHTS)
+    cancellation_penalties: Mapping = field(default_factory=lambda: CANCELLATION_PENALTIES)
+    forgiveness_buffer: Mapping = field(default_factory=lambda: FORGIVENESS_BUFFER)
+    version: str = 'default'
+
+    def __post_init__(self):
+        defaults = {'coin_system': COIN_SYSTEM, 'traffic_weights': TRAFFIC_WEIGHTS,
+                    'cancellation_penalties': CANCELLATION_PENALTIES, 'forgiveness_buffer': FORGIVENESS_BUFFER}
+        for section in PARAM_SECTIONS:
+            values = getattr(self, section)
+            missing = set(defaults[section]) - set(values)
+            unknown = set(values) - set(defaults[section])
+            if missing or unknown:
+                raise ValueError(f"{section}: missing {sorted(missing)}, unknown {sorted(unknown)}")
+            object.__setattr__(self, section, _freeze(values))
+
+        if len(self.coin_system['streak_thresholds']) != len(self.coin_system['streak_bonuses']):
+            raise ValueError("streak_thresholds and streak_bonuses must be the same length")
+        if len(self.cancellation_penalties['time_thresholds']) != len(self.cancellation_penalties['penalty_multipliers']):
+            raise ValueError("time_thresholds and penalty_multipliers must be the same length")
+
+    def to_dict(self):
+        return {section: _thaw(getattr(self, section)) for section in PARAM_SECTIONS}
+
+DEFAULT_PARAMS = IncentiveParams()
+
+def params_from_dict(overrides, base=DEFAULT_PARAMS, version=None):
+    """`base` with per-section overrides, e.g. {'coin_system': {'streak_bonuses': [5, 10, 20]}}."""
+    sections = base.to_dict()
+    for section, values in overrides.items():
+        if section not in sections:
+            raise ValueError(f"Unknown incentive parameter section: {section}")
+        sections[section].update(values)
+    return IncentiveParams(**sections, version=version or base.version)
+
+@dataclass
+class DriverProfile:
+    """The driver attributes the rules depend on."""
+    daily_avg_distance_km: float
+    ride_acceptance_rate: float = 0.0
+    cancellation_rate: float = 100.0
+
+@dataclass
+class DailyState:
+    """A driver's running totals for one day."""
+    distance_covered_today: float = 0.0
+    coins_earned: int = 0
+    hours_active: float = 0.0
+    consecutive_trips: int = 0
+    multiplier_active: bool = False
+    multiplier_value: float = 1.0
+
+@dataclass
+class TripInput:
+    """The trip attributes the rules depend on."""
+    estimated_trip_distance_km: float
+    distance_to_pickup_km: float
+    traffic_factor: float
+    time_of_day: str
+    at_event: bool = False
+    event_type: Optional[str] = None
+    base_trip_fare: float = 0.0
+    trip_duration_minutes: int = 0
+
+@dataclass
+class TripOutcome:
+    """Result of evaluating one completed trip against a daily state."""
+    coins_earned: int
+    streak_bonus: int
+    total_distance: float
+    hours_active: float
+    consecutive_trips: int
+    multiplier_applied: float
+    final_fare: float
+
+@dataclass
+class CancellationOutcome:
+    """Result of evaluating one cancellation."""
+    is_legitimate: bool
+    penalty_coins: int
+    buffer_applied: float
+    coins_after: int
+    cooldown_minutes: int = 0
+
+def calculate_target_distances(driver_avg_distance_km):
+    """Calculate target distances for a driver based on their historical average."""
+    target_tier1_km = driver_avg_distance_km * 0.6  # 60% of daily average
+    target_tier2_km = driver_avg_distance_km  # 100% of daily average
+
+    return {
+        'target_distance_60_percent': round(target_tier1_km, 2),
+        'target_distance_100_percent': round(target_tier2_km, 2)
+    }
+
+def traffic_weight_for_time(time_of_day):
+    """Return traffic weight based on time of day."""
+    return TIME_OF_DAY_TRAFFIC_WEIGHTS.get(time_of_day, DEFAULT_TRAFFIC_WEIGHT)
+
+def event_bonus(at_event, event_type):
+    """Bonus coins for a pickup at an event."""
+    if not at_event:
+        return 0
+    return EVENT_BONUSES.get(event_type or 'Generic', DEFAULT_EVENT_BONUS)
+
+def calculate_trip_coins(driver, trip, params=DEFAULT_PARAMS, historical_traffic=None):
+    """Calculate coins earned for a trip based on distance, traffic, and other factors.
+
+    `historical_traffic` is the usual traffic intensity (0-1) at the pickup
+    for this hour, weighted by traffic_weights['historical_weight']; None
+    leaves it out.
+    """
+    # Base coins: 0.55 coin per 1% of the driver's daily average distance
+    distance_percentage = (trip.estimated_trip_distance_km / driver.daily_avg_distance_km) * 100
+    base_coins = int(distance_percentage * 0.55)
+
+    # Traffic component - extra coins for heavy traffic, capped
+    traffic_coins = (trip.traffic_factor * params.traffic_weights['base_weight'] +
+                     traffic_weight_for_time(trip.time_of_day) * params.traffic_weights['time_of_day_weight']) * 10
+    if historical_traffic is not None:
+        traffic_coins += historical_traffic * params.traffic_weights['historical_weight'] * 10
+    traffic_coins = min(traffic_coins, params.coin_system['traffic_max_coins'])
+
+    return round(base_coins + traffic_coins + event_bonus(trip.at_event, trip.event_type))
+
+def streak_bonus(consecutive_trips, params=DEFAULT_PARAMS):
+    """Bonus coins when the consecutive trip count hits a streak threshold exactly."""
+    thresholds = params.coin_system['streak_thresholds']
+    for i in range(len(thresholds) - 1, -1, -1):
+        if consecutive_trips == thresholds[i]:
+            return params.coin_system['streak_bonuses'][i]
+
+    return 0
+
+def multiplier_for_coins(coins_earned, params=DEFAULT_PARAMS):
+    """Multiplier a driver can activate with this many coins, or None below the 60% milestone."""
+    if coins_earned >= params.coin_system['daily_milestone_100_percent']:
+        return MULTIPLIER_TIER_100
+    if coins_earned >= params.coin_system['daily_milestone_60_percent']:
+        return MULTIPLIER_TIER_60
+    return None
+
+def evaluate_trip(driver, state, trip, params=DEFAULT_PARAMS, historical_traffic=None):
+    """Evaluate one completed trip for a driver whose day so far is `state`."""
+    consecutive_trips = state.consecutive_trips + 1
+    multiplier_applied = state.multiplier_value if state.multiplier_active else 1.0
+
+    return TripOutcome(
+        coins_earned=calculate_trip_coins(driver, trip, params, historical_traffic),
+        streak_bonus=streak_bonus(consecutive_trips, params),
+        total_distance=trip.estimated_trip_distance_km + trip.distance_to_pickup_km,
+        hours_active=trip.trip_duration_minutes / 60,
+        consecutive_trips=consecutive_trips,
+        multiplier_applied=multiplier_applied,
+        final_fare=trip.base_trip_fare * multiplier_applied
+    )
+
+def apply_trip(state, outcome):
+    """New daily state after a trip outcome."""
+    return replace(
+        state,
+        distance_covered_today=state.distance_covered_today + outcome.total_distance,
+        coins_earned=state.coins_earned + outcome.coins_earned + outcome.streak_bonus,
+        hours_active=state.hours_active + outcome.hours_active,
+        consecutive_trips=outcome.consecutive_trips
+    )
+
+def cancellation_time_multiplier(time_since_accept_seconds, params=DEFAULT_PARAMS):
+    """Penalty multiplier for how long after acceptance the driver cancelled."""
+    penalties = params.cancellation_penalties
+    for i, threshold in enumerate(penalties['time_thresholds']):
+        if time_since_accept_seconds <= threshold:
+            return penalties['penalty_multipliers'][i]
+    return 0.5  # Default
+
+def qualifies_for_forgiveness(driver, params=DEFAULT_PARAMS):
+    """Reliable drivers get part of each penalty forgiven."""
+    return (driver.ride_acceptance_rate >= params.forgiveness_buffer['threshold_acceptance_rate'] and
+            driver.cancellation_rate <= params.forgiveness_buffer['threshold_cancellation_rate'])
+
+def evaluate_cancellation(driver, coins_earned, time_since_accept_seconds, reason, params=DEFAULT_PARAMS):
+    """Evaluate one cancellation against a driver's current coin balance."""
+    penalties = params.cancellation_penalties
+    is_legitimate = reason in penalties['legitimate_reasons']
+
+    penalty = penalties['standard_penalty'] * cancellation_time_multiplier(time_since_accept_seconds, params)
+
+    buffer_applied = 0
+    if qualifies_for_forgiveness(driver, params):
+        buffer_applied = min(params.forgiveness_buffer['buffer_coins'], penalty)
+        penalty -= buffer_applied
+
+    penalty = round(penalty)
+
+    if is_legitimate:
+        # Legitimate reasons get a cooldown but no coin penalty
+        return CancellationOutcome(True, 0, buffer_applied, coins_earned, penalties['cooldown_minutes'])
+
+    coins_after = max(0, coins_earned - penalty) if penalty > 0 else coins_earned
+    return CancellationOutcome(False, penalty, buffer_applied, coins_after)
+
+def evaluate_driver_day(driver, trips, state=None, params=DEFAULT_PARAMS):
+    """Fold a driver's trips in order; returns the outcomes and the final daily state."""
+    state = state or DailyState()
+    outcomes = []
+    for trip in trips:
+        outcome = evaluate_trip(driver, state, trip, params)
+        state = apply_trip(state, outcome)
+        outcomes.append(outcome)
+    return outcomes, state
+
+# Batch evaluation over columnar arrays
+def _lookup(values, table, default):
+    """Map an array of labels through a small dict with one vectorized comparison per key."""
+    values = np.asarray(values)
+    mapped = np.full(values.shape, default, dtype=np.float64)
+    for label, value in table.items():
+        mapped[values == label] = value
+    return mapped
+
+def traffic_weight_for_time_batch(time_of_day):
+    return _lookup(time_of_day, TIME_OF_DAY_TRAFFIC_WEIGHTS, DEFAULT_TRAFFIC_WEIGHT)
+
+def event_bonus_batch(at_event, event_type):
+    # Missing event types fall through to the default, as 'Generic' does per trip
+    return np.where(np.asarray(at_event, dtype=bool), _lookup(event_type, EVENT_BONUSES, DEFAULT_EVENT_BONUS), 0)
+
+def calculate_trip_coins_batch(daily_avg_distance_km, estimated_trip_distance_km, traffic_factor,
+                               time_of_day, at_event, event_type, params=DEFAULT_PARAMS, historical_traffic=None):
+    """calculate_trip_coins over arrays; returns int64 coins, identical to the per-trip rule.
+
+    NaN in `historical_traffic` stands for None.
+    """
+    distance_percentage = (np.asarray(estimated_trip_distance_km, dtype=np.float64) /
+                           np.asarray(daily_avg_distance_km, dtype=np.float64)) * 100
+    base_coins = np.trunc(distance_percentage * 0.55)
+
+    traffic_coins = (np.asarray(traffic_factor, dtype=np.float64) * params.traffic_weights['base_weight'] +
+                     traffic_weight_for_time_batch(time_of_day) * params.traffic_weights['time_of_day_weight']) * 10
+    if historical_traffic is not None:
+        historical = np.nan_to_num(np.asarray(historical_traffic, dtype=np.float64), nan=0.0)
+        traffic_coins = traffic_coins + historical * params.traffic_weights['historical_weight'] * 10
+    traffic_coins = np.minimum(traffic_coins, params.coin_system['traffic_max_coins'])
+
+    # np.round rounds half to even, like Python's round
+    return np.round(base_coins + traffic_coins + event_bonus_batch(at_event, event_type)).astype(np.int64)
+
+def streak_bonus_batch(consecutive_trips, params=DEFAULT_PARAMS):
+    consecutive_trips = np.asarray(consecutive_trips)
+    thresholds = params.coin_system['streak_thresholds']
+    bonuses = params.coin_system['streak_bonuses']
+    # Highest threshold first, as in streak_bonus
+    conditions = [consecutive_trips == t for t in reversed(thresholds)]
+    return np.select(conditions, list(reversed(bonuses)), default=0).astype(np.int64)
+
+def evaluate_trip_batch(trips, params=DEFAULT_PARAMS):
+    """Evaluate many trips at once from columns (a DataFrame or dict of arrays).
+
+    Needs the TripInput columns plus daily_avg_distance_km, consecutive_trips
+    (the count including this trip) and multiplier_applied; historical_traffic
+    is optional.
+    """
+    coins = calculate_trip_coins_batch(
+        trips['daily_avg_distance_km'], trips['estimated_trip_distance_km'], trips['traffic_factor'],
+        trips['time_of_day'], trips['at_event'], trips['event_type'], params,
+        trips['historical_traffic'] if 'historical_traffic' in trips else None
+    )
+    multiplier_applied = np.asarray(trips['multiplier_applied'], dtype=np.float64)
+
+    return {
+        'coins_earned': coins,
+        'streak_bonus': streak_bonus_batch(trips['consecutive_trips'], params),
+        'total_distance': (np.asarray(trips['estimated_trip_distance_km'], dtype=np.float64) +
+                           np.asarray(trips['distance_to_pickup_km'], dtype=np.float64)),
+        'hours_active': np.asarray(trips['trip_duration_minutes'], dtype=np.float64) / 60,
+        'final_fare': np.asarray(trips['base_trip_fare'], dtype=np.float64) * multiplier_applied
+    }
+
+def _synthetic_trips(count, seed):
+    """Random trip columns for benchmarking."""
+    rng = np.random.default_rng(seed)
+    distance = np.round(rng.gamma(2, 3, count) + 1, 1)
+    return {
+        'daily_avg_distance_km': np.round(rng.normal(80, 20, count).clip(40, 150), 1),
+        'estimated_trip_distance_km': distance,
+        'distance_to_pickup_km': np.round(rng.gamma(2, 0.6, count), 2),
+        'traffic_factor': np.round(rng.uniform(0.4, 1.0, count), 2),
+        'time_of_day': rng.choice(['Morning', 'Afternoon', 'Evening', 'Night'], count),
+        'at_event': rng.random(count) < 0.1,
+        'event_type': rng.choice(np.array(['Concert', 'Sports', 'Festival', None], dtype=object), count),
+        'base_trip_fare': np.round(30 + distance * 15, 2),
+        'trip_duration_minutes': rng.integers(5, 60, count),
+        'consecutive_trips': rng.integers(1, 15, count),
+        'multiplier_applied': rng.choice([1.0, 1.25, 1.5], count)
+    }
+
+def benchmark(count=100_000, seed=42):
+    """Time per-trip and batch evaluation on the same trips and check they agree."""
+    columns = _synthetic_trips(count, seed)
+
+    start = time.perf_counter()
+    scalar_coins = np.empty(count, dtype=np.int64)
+    for i in range(count):
+        driver = DriverProfile(daily_avg_distance_km=columns['daily_avg_distance_km'][i])
+        trip = TripInput(
+            estimated_trip_distance_km=columns['estimated_trip_distance_km'][i],
+            distance_to_pickup_km=columns['distance_to_pickup_km'][i],
+            traffic_factor=columns['traffic_factor'][i],
+            time_of_day=columns['time_of_day'][i],
+            at_event=columns['at_event'][i],
+            event_type=columns['event_type'][i]
+        )
+        scalar_coins[i] = calculate_trip_coins(driver, trip)
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = evaluate_trip_batch(columns)
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = int((batch['coins_earned'] != scalar_coins).sum())
+    print(f"Per-trip: {count:,} trips in {scalar_seconds:.3f}s ({count / scalar_seconds:,.0f} trips/s)")
+    print(f"Batch:    {count:,} trips in {batch_seconds:.3f}s ({count / batch_seconds:,.0f} trips/s)")
+    print(f"Speed-up: {scalar_seconds / batch_seconds:.1f}x, coin mismatches: {mismatches}")
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the incentive rules without a database.")
+    parser.add_argument("--trips", type=int, default=100_000, help="Trips to evaluate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    if benchmark(args.trips, args.seed):
+        raise SystemExit("Batch and per-trip coins disagree")
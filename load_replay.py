@@ -0,0 +1,315 @@
+import asyncio
+import argparse
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from data_generator import BENGALURU_LOCATIONS, DEFAULT_SEED
+from request_stream import iter_request_chunks, load_request_stream
+
+# Coins needed before a driver tries to activate the multiplier (API's 60% milestone)
+MULTIPLIER_COINS = 50
+
+# Virtual hour after which drivers switch to go-home mode
+GO_HOME_HOUR = 21
+
+class LatencyRecorder:
+    """Collects per-route latencies and error counts for the final report."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, seconds, ok):
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+
+    def report(self, wall_seconds):
+        """Per-route throughput and p50/p95/p99 latency as a DataFrame."""
+        rows = []
+        for route, samples in sorted(self.latencies.items()):
+            samples_ms = np.array(samples) * 1000
+            rows.append({
+                'route': route,
+                'requests': len(samples),
+                'errors': self.errors[route],
+                'req_per_s': round(len(samples) / wall_seconds, 1),
+                'p50_ms': round(np.percentile(samples_ms, 50), 2),
+                'p95_ms': round(np.percentile(samples_ms, 95), 2),
+                'p99_ms': round(np.percentile(samples_ms, 99), 2),
+                'max_ms': round(samples_ms.max(), 2)
+            })
+        return pd.DataFrame(rows)
+
+class ReplayClient:
+    """Thin wrapper over a pooled httpx.AsyncClient that times every call by route."""
+
+    def __init__(self, base_url, max_connections, recorder, timeout=30.0):
+        self.recorder = recorder
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+
+    async def call(self, method, route, url, **kwargs):
+        """Issue one request, recording its latency under the route template."""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.recorder.record(route, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    async def close(self):
+        await self.client.aclose()
+
+# The replay's own scratch database, emptied before every run
+DEFAULT_DATABASE_URL = "sqlite:///./load_replay.db"
+
+def start_local_server(database_url, port, reset_schema=False):
+    """Run the API in a background uvicorn thread against `database_url`.
+
+    Tables are created if missing; existing data is only dropped with
+    `reset_schema`, so pointing this at a real database never wipes it.
+    """
+    os.environ["NAMMA_YATRI_DATABASE_URL"] = database_url
+
+    import uvicorn
+    import namma_yatri_api
+
+    if reset_schema:
+        namma_yatri_api.backend.drop_schema()
+    namma_yatri_api.backend.create_schema()
+
+    config = uvicorn.Config(namma_yatri_api.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+
+    while not server.started:
+        time.sleep(0.05)
+
+    return server, thread
+
+def stop_local_server(server, thread, timeout=10):
+    """Ask a server from start_local_server to shut down and wait for its thread."""
+    server.should_exit = True
+    thread.join(timeout)
+
+async def seed_locations_and_drivers(client, drivers_df):
+    """Create every Bengaluru location and the replay drivers; returns the location id map."""
+    location_ids = {}
+    for name, (lat, long) in BENGALURU_LOCATIONS.items():
+        response = await client.call("POST", "POST /locations/", "/locations/",
+                                     json={"location_name": name, "latitude": lat, "longitude": long})
+        if response is None:
+            raise RuntimeError(f"Could not create location {name}")
+        location_ids[name] = response.json()["location_id"]
+
+    async def create_driver(row):
+        payload = {
+            "driver_id": row.driver_id,
+            "name": f"Driver {row.driver_id[:8]}",
+            "experience_years": int(row.experience_years),
+            "rating": float(row.rating),
+            "daily_avg_distance_km": float(row.daily_avg_distance_km),
+            "ride_acceptance_rate": float(row.ride_acceptance_rate),
+            "cancellation_rate": float(row.cancellation_rate),
+            "consecutive_target_days": 0,
+            "home_location_id": location_ids[row.home_location],
+            "current_location_id": location_ids[row.location]
+        }
+        await client.call("POST", "POST /drivers/", "/drivers/", json=payload)
+
+    await asyncio.gather(*(create_driver(row) for row in drivers_df.itertuples(index=False)))
+    return location_ids
+
+def trip_payload(request, driver_id, location_ids, rng):
+    """Build a TripCreate body from one generated ride request."""
+    distance = float(request.estimated_trip_distance_km)
+    peak = request.time_of_day in ('Morning', 'Evening')
+    traffic_factor = rng.uniform(0.7, 1.0) if peak else rng.uniform(0.4, 0.8)
+
+    return {
+        "trip_id": request.request_id,
+        "driver_id": driver_id,
+        "pickup_location_id": location_ids[request.pickup_location],
+        "destination_location_id": location_ids[request.destination_location],
+        "estimated_trip_distance_km": distance,
+        "distance_to_pickup_km": round(float(rng.gamma(2, 0.6)), 2),
+        "traffic_factor": round(float(traffic_factor), 2),
+        "time_of_day": request.time_of_day,
+        "at_event": bool(request.at_event),
+        "event_type": None if request.event_type == 'None' else request.event_type,
+        "base_fare": 30,
+        "base_trip_fare": round(30 + distance * 15, 2),
+        "trip_duration_minutes": max(1, int(distance / 20 * 60 * (1 + traffic_factor)))
+    }
+
+class ReplayDriverState:
+    """Client-side view of one driver, used to decide multiplier/go-home actions."""
+
+    def __init__(self):
+        self.coins = 0
+        self.multiplier_requested = False
+        self.go_home_requested = False
+        self.lock = asyncio.Lock()
+
+async def replay_request(client, request, driver_id, state, location_ids, rng, args):
+    """Drive one ride request through the API: trip or cancellation, then follow-up actions."""
+    if rng.random() < args.cancel_rate:
+        cancellation = {
+            "driver_id": driver_id,
+            "trip_id": request.request_id,
+            "time_since_accept_seconds": int(rng.integers(10, 400)),
+            "reason": rng.choice(['passenger_no_show', 'destination_too_far', 'traffic', 'emergency'])
+        }
+        response = await client.call("POST", "POST /cancellations/", "/cancellations/", json=cancellation)
+        if response is not None:
+            cancellation_id = response.json()["cancellation_id"]
+            await client.call("POST", "POST /cancellations/{id}/process",
+                              f"/cancellations/{cancellation_id}/process")
+        return
+
+    # A driver's trips are processed in order, like a real phone would
+    async with state.lock:
+        payload = trip_payload(request, driver_id, location_ids, rng)
+        created = await client.call("POST", "POST /trips/", "/trips/", json=payload)
+        if created is None:
+            return
+
+        processed = await client.call("POST", "POST /trips/{id}/process", f"/trips/{request.request_id}/process")
+        if processed is not None:
+            state.coins = processed.json().get("new_coins_balance", state.coins)
+
+        if state.coins >= MULTIPLIER_COINS and not state.multiplier_requested:
+            state.multiplier_requested = True
+            await client.call("POST", "POST /drivers/{id}/activate-multiplier",
+                              f"/drivers/{driver_id}/activate-multiplier")
+
+        if request.request_time.hour >= GO_HOME_HOUR and not state.go_home_requested:
+            state.go_home_requested = True
+            await client.call("POST", "POST /drivers/{id}/activate-go-home", f"/drivers/{driver_id}/activate-go-home")
+            await client.call("GET", "GET /drivers/{id}/go-home-recommendations",
+                              f"/drivers/{driver_id}/go-home-recommendations")
+
+    if rng.random() < args.stats_rate:
+        await client.call("GET", "GET /drivers/{id}/daily-stats", f"/drivers/{driver_id}/daily-stats")
+        await client.call("GET", "GET /trips/", "/trips/", params={"driver_id": driver_id, "limit": 20})
+
+def load_requests(args):
+    """Requests to replay: a stream file if given, else one generated day."""
+    if args.requests:
+        requests_df = load_request_stream(args.requests)
+    else:
+        start_date = datetime.now().date()
+        requests_df = pd.concat(iter_request_chunks(start_date, days=1, scale=args.scale, seed=args.seed),
+                                ignore_index=True)
+
+    if args.max_requests:
+        requests_df = requests_df.head(args.max_requests)
+    return requests_df
+
+async def run_replay(args, base_url):
+    """Seed the API, replay the request stream at the configured speed-up and report latencies."""
+    rng = np.random.default_rng(args.seed)
+    recorder = LatencyRecorder()
+    client = ReplayClient(base_url, args.concurrency, recorder)
+
+    drivers_df = pd.read_csv(args.drivers).head(args.num_drivers)
+    requests_df = load_requests(args)
+
+    print(f"Seeding {len(BENGALURU_LOCATIONS)} locations and {len(drivers_df)} drivers...")
+    location_ids = await seed_locations_and_drivers(client, drivers_df)
+
+    driver_ids = drivers_df['driver_id'].tolist()
+    states = {driver_id: ReplayDriverState() for driver_id in driver_ids}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(request, driver_id):
+        async with semaphore:
+            await replay_request(client, request, driver_id, states[driver_id], location_ids, rng, args)
+
+    # Measure only the replay itself, not seeding
+    recorder.latencies.clear()
+    recorder.errors.clear()
+
+    print(f"Replaying {len(requests_df):,} requests at {args.speedup}x...")
+    first_request_time = requests_df['request_time'].iloc[0]
+    started_at = time.perf_counter()
+    tasks = []
+
+    for request in requests_df.itertuples(index=False):
+        if args.speedup > 0:
+            due = (request.request_time - first_request_time).total_seconds() / args.speedup
+            delay = due - (time.perf_counter() - started_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        driver_id = driver_ids[int(rng.integers(0, len(driver_ids)))]
+        tasks.append(asyncio.create_task(bounded(request, driver_id)))
+
+    await asyncio.gather(*tasks)
+    wall_seconds = time.perf_counter() - started_at
+    await client.close()
+
+    report = recorder.report(wall_seconds)
+    total = int(report['requests'].sum()) if not report.empty else 0
+    print(report.to_string(index=False))
+    print(f"\n{total:,} HTTP requests in {wall_seconds:.1f}s ({total / wall_seconds:,.1f} req/s overall)")
+    return report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay generated traffic against the incentive API and report latency.")
+    parser.add_argument("--base-url", default=None,
+                        help="Target an already running API instead of starting a local one")
+    parser.add_argument("--database-url", default=None,
+                        help=f"Database for the locally started API (SQLite file, memory:// or a local MySQL URL); "
+                             f"defaults to {DEFAULT_DATABASE_URL}, which is reset every run")
+    parser.add_argument("--reset-schema", action="store_true",
+                        help="Drop and recreate the tables of --database-url before seeding")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the locally started API")
+    parser.add_argument("--drivers", default="drivers_data.csv", help="Driver CSV from data_generator")
+    parser.add_argument("--num-drivers", type=int, default=200, help="Drivers to seed and replay")
+    parser.add_argument("--requests", default=None,
+                        help="Request stream (JSONL/Parquet) from request_stream; generated if omitted")
+    parser.add_argument("--scale", type=float, default=0.1, help="Arrival-rate scale when generating requests")
+    parser.add_argument("--max-requests", type=int, default=None, help="Replay at most this many requests")
+    parser.add_argument("--speedup", type=float, default=600.0,
+                        help="Virtual seconds per wall second; 0 replays as fast as possible")
+    # Against MySQL the async endpoints check connections out of a 5+10 pool on the event loop,
+    # so going past ~15 in-flight requests stalls the server until pool checkout times out
+    parser.add_argument("--concurrency", type=int, default=8, help="Pooled connections / in-flight requests")
+    parser.add_argument("--cancel-rate", type=float, default=0.08, help="Share of requests that end in a cancellation")
+    parser.add_argument("--stats-rate", type=float, default=0.3, help="Share of requests followed by stats reads")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed")
+    parser.add_argument("--report-csv", default=None, help="Also write the latency report to this CSV")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        database_url = args.database_url or DEFAULT_DATABASE_URL
+        server, thread = start_local_server(database_url, args.port, args.reset_schema or args.database_url is None)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        report = asyncio.run(run_replay(args, base_url))
+        if args.report_csv:
+            report.to_csv(args.report_csv, index=False)
+    finally:
+        if server is not None:
+            stop_local_server(server, thread)
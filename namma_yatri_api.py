@@ -1,22 +1,76 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Date, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
-from pydantic import BaseModel, Field, model_validator
-from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from typing import List, Literal, Optional
 from urllib.parse import quote_plus
 from datetime import datetime, date, time, timedelta
 import math
 import random
 import numpy as np
 from typing import Dict, Any
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+from contextlib import asynccontextmanager
+import hashlib
+import json
+import os
+
+import incentive_rules
+from demand_forecast import DemandForecaster
+from repositioning import RepositioningRecommender
+from surge_engine import SurgeEngine, trip_fare
+from demand_heatmap import ZOOM_LEVELS, DemandHeatmap
+from driver_events import DriverEventBroker, format_sse
+from idempotency import IdempotencyKeyReused, IdempotencyStore
+from incentive_rules import DailyState
+from incentive_config import IncentiveConfigStore
+from traffic_profile import TrafficProfile
+from trip_pipeline import HourlyRollup, LiveLeaderboard, PostCommitPipeline, TripAnalyticsWriter
+from storage import (
+    Location, Driver, DriverDailyStat, Trip, Cancellation, TrafficData,
+    IncentiveRepository, create_backend
+)
+
+def refresh_with_repository(precomputed, force=False):
+    """Run precomputed.refresh(db, force) with a repository of its own, for use off the event loop."""
+    db = backend.repository()
+    try:
+        return precomputed.refresh(db, force)
+    finally:
+        db.close()
+
+async def run_refresh_schedule(precomputed, name):
+    """Refresh a precomputed table every refresh_seconds, off the event loop."""
+    while True:
+        try:
+            await asyncio.to_thread(refresh_with_repository, precomputed)
+        except Exception as e:
+            print(f"{name} refresh failed: {e}")
+        await asyncio.sleep(precomputed.refresh_seconds)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Tables created by an older version lack columns added since; add them before serving
+    await asyncio.to_thread(backend.add_missing_columns)
+    # Deliver anything left in the post-commit journal from the last run
+    trip_pipeline.start()
+    schedules = [
+        asyncio.create_task(run_refresh_schedule(traffic_profile, "Traffic profile")),
+        asyncio.create_task(run_refresh_schedule(demand_forecaster, "Demand forecast")),
+        asyncio.create_task(run_refresh_schedule(repositioning, "Repositioning")),
+        asyncio.create_task(run_refresh_schedule(demand_heatmap, "Heatmap"))
+    ]
+    yield
+    for schedule in schedules:
+        schedule.cancel()
+    await asyncio.to_thread(trip_pipeline.stop)
 
 # Create FastAPI app
 app = FastAPI(
     title="Namma Yatri Incentive System API",
     description="API for managing the Namma Yatri driver incentive system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Database connection
@@ -27,113 +81,73 @@ DB_HOST = "localhost"
 DB_PORT = "3306"  # Explicitly specify the port
 DB_NAME = "namma_yatri"
 
-DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Database Models
-class Location(Base):
-    __tablename__ = "locations"
-    
-    location_id = Column(Integer, primary_key=True, index=True)
-    location_name = Column(String(100), nullable=False)
-    latitude = Column(Float, nullable=False)
-    longitude = Column(Float, nullable=False)
-
-class Driver(Base):
-    __tablename__ = "drivers"
-    
-    driver_id = Column(String(50), primary_key=True, index=True)
-    name = Column(String(100))
-    experience_years = Column(Integer)
-    rating = Column(Float)
-    home_location_id = Column(Integer, ForeignKey("locations.location_id"))
-    current_location_id = Column(Integer, ForeignKey("locations.location_id"))
-    daily_avg_distance_km = Column(Float)
-    target_distance_60_percent = Column(Float)
-    target_distance_100_percent = Column(Float)
-    ride_acceptance_rate = Column(Float)
-    cancellation_rate = Column(Float)
-    consecutive_target_days = Column(Integer)
-    created_at = Column(DateTime, default=datetime.now)
-    
-    home_location = relationship("Location", foreign_keys=[home_location_id])
-    current_location = relationship("Location", foreign_keys=[current_location_id])
-
-class DriverDailyStat(Base):
-    __tablename__ = "driver_daily_stats"
-    
-    stat_id = Column(Integer, primary_key=True, index=True)
-    driver_id = Column(String(50), ForeignKey("drivers.driver_id"))
-    date = Column(Date, default=date.today)
-    distance_covered_today = Column(Float, default=0)
-    coins_earned = Column(Integer, default=0)
-    hours_active = Column(Float, default=0)
-    consecutive_trips = Column(Integer, default=0)
-    multiplier_active = Column(Boolean, default=False)
-    multiplier_value = Column(Float, default=1.0)
-    multiplier_expires_at = Column(DateTime, nullable=True)
-    go_home_mode_active = Column(Boolean, default=False)
-    
-    driver = relationship("Driver")
-
-class Trip(Base):
-    __tablename__ = "trips"
-    
-    trip_id = Column(String(50), primary_key=True, index=True)
-    driver_id = Column(String(50), ForeignKey("drivers.driver_id"))
-    pickup_location_id = Column(Integer, ForeignKey("locations.location_id"))
-    destination_location_id = Column(Integer, ForeignKey("locations.location_id"))
-    estimated_trip_distance_km = Column(Float)
-    distance_to_pickup_km = Column(Float)
-    traffic_factor = Column(Float)
-    time_of_day = Column(String(20))
-    at_event = Column(Boolean, default=False)
-    event_type = Column(String(50), nullable=True)
-    base_fare = Column(Float)
-    base_trip_fare = Column(Float)
-    multiplier_applied = Column(Float, default=1.0)
-    final_fare = Column(Float)
-    trip_duration_minutes = Column(Integer)
-    trip_date = Column(Date, default=date.today)
-    trip_time = Column(String(10))
-    coins_earned = Column(Integer)
-    created_at = Column(DateTime, default=datetime.now)
-    
-    driver = relationship("Driver")
-    pickup_location = relationship("Location", foreign_keys=[pickup_location_id])
-    destination_location = relationship("Location", foreign_keys=[destination_location_id])
-
-class Cancellation(Base):
-    __tablename__ = "cancellations"
-    
-    cancellation_id = Column(Integer, primary_key=True, index=True)
-    driver_id = Column(String(50), ForeignKey("drivers.driver_id"))
-    trip_id = Column(String(50))
-    time_since_accept_seconds = Column(Integer)
-    reason = Column(String(100))
-    penalty_coins = Column(Integer, default=0)
-    cooldown_minutes = Column(Integer, default=0)
-    cooldown_until = Column(DateTime, nullable=True)
-    cancellation_date = Column(Date, default=date.today)
-    created_at = Column(DateTime, default=datetime.now)
-    
-    driver = relationship("Driver")
-
-class TrafficData(Base):
-    __tablename__ = "traffic_data"
-    
-    traffic_id = Column(Integer, primary_key=True, index=True)
-    location_id = Column(Integer, ForeignKey("locations.location_id"))
-    time_of_day = Column(String(20))
-    traffic_intensity = Column(Float)
-    ride_requests = Column(Integer)
-    date = Column(Date, default=date.today)
-    created_at = Column(DateTime, default=datetime.now)
-    
-    location = relationship("Location")
+# Set NAMMA_YATRI_DATABASE_URL to run against another backend instead:
+# sqlite:///./namma_yatri.db for a local file, or memory:// for the in-memory store
+DATABASE_URL = os.environ.get(
+    "NAMMA_YATRI_DATABASE_URL",
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+backend = create_backend(DATABASE_URL)
+
+# Incentive parameters are loaded once and shared; POST /admin/incentive-config/reload swaps them live
+INCENTIVE_CONFIG_PATH = os.environ.get(
+    "NAMMA_YATRI_INCENTIVE_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "incentive_config.json")
+)
+incentive_config = IncentiveConfigStore(INCENTIVE_CONFIG_PATH)
+
+# Driver state changes are pushed to GET /drivers/{driver_id}/events subscribers after each commit
+driver_events = DriverEventBroker()
+
+# Usual traffic per location and hour, fed to the coin calculation as its historical component;
+# rebuilt and caught up on a schedule by the lifespan task
+traffic_profile = TrafficProfile()
+
+# Per-location surge from sliding-window requests and available drivers; prices trips created without a fare
+surge_engine = SurgeEngine()
+
+# 15-60 minute demand forecasts per location, recomputed on a schedule by the lifespan task
+demand_forecaster = DemandForecaster()
+# Where idle drivers should head, recomputed for all of them every minute from the forecasts
+repositioning = RepositioningRecommender(demand_forecaster)
+
+# Processing endpoints replay the stored response for a repeated Idempotency-Key header
+idempotency_keys = IdempotencyStore()
+
+# Work derived from processed trips runs off the request path; the journal makes it survive restarts
+TRIP_EVENT_COLUMNS = [
+    'trip_id', 'driver_id', 'trip_date', 'trip_time', 'time_of_day', 'pickup_location_id',
+    'destination_location_id', 'total_distance', 'coins_earned', 'multiplier_applied', 'base_trip_fare',
+    'final_fare', 'new_coins_balance', 'distance_covered_today', 'incentive_variant', 'config_version',
+    'processed_at'
+]
+def load_location_coordinates():
+    """{location_id: (latitude, longitude)} for every location, read with a repository of its own."""
+    db = backend.repository()
+    try:
+        return {location.location_id: (location.latitude, location.longitude) for location in db.list_locations()}
+    finally:
+        db.close()
+
+hourly_rollup = HourlyRollup()
+live_leaderboard = LiveLeaderboard()
+# Pickups and traffic per map tile and time bucket, served by GET /heatmap
+demand_heatmap = DemandHeatmap(load_location_coordinates)
+# Post-commit journal and trip analytics files; NAMMA_YATRI_TRIP_JOURNAL / NAMMA_YATRI_ANALYTICS_DIR override each
+DATA_DIR = os.environ.get("NAMMA_YATRI_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+trip_pipeline = PostCommitPipeline(
+    {
+        'hourly_rollup': hourly_rollup,
+        'live_leaderboard': live_leaderboard,
+        'heatmap': demand_heatmap,
+        'surge': surge_engine,
+        'analytics': TripAnalyticsWriter(os.environ.get("NAMMA_YATRI_ANALYTICS_DIR", os.path.join(DATA_DIR, "trip_analytics")),
+                                         TRIP_EVENT_COLUMNS)
+    },
+    # Opened when the lifespan starts the pipeline, so importing the API creates no files
+    journal_path=os.environ.get("NAMMA_YATRI_TRIP_JOURNAL", os.path.join(DATA_DIR, "trip_events.journal"))
+)
 
 # Pydantic Models for API
 class LocationBase(BaseModel):
@@ -224,6 +238,8 @@ class TripBase(BaseModel):
 
 class TripCreate(TripBase):
     trip_id: str
+    # Omit to have it priced from distance and the pickup location's current surge
+    base_trip_fare: Optional[float] = None
 
 class TripResponse(TripBase):
     trip_id: str
@@ -232,7 +248,10 @@ class TripResponse(TripBase):
     trip_date: date
     trip_time: str
     coins_earned: int
+    surge_multiplier: Optional[float] = 1.0
     created_at: datetime
+    processed_at: Optional[datetime] = None
+    historical_traffic: Optional[float] = None
     
     class Config:
         orm_mode = True
@@ -267,6 +286,7 @@ class CancellationResponse(CancellationBase):
     cooldown_until: Optional[datetime] = None
     cancellation_date: date
     created_at: datetime
+    processed_at: Optional[datetime] = None
     
     class Config:
         orm_mode = True
@@ -315,6 +335,41 @@ class GoHomeRecommendationsResponse(BaseModel):
     message: str
     recommendations: List[TripRecommendation] = []
 
+class RepositioningResponse(BaseModel):
+    driver_id: str
+    generated_at: datetime
+    current_location_id: int
+    target_location_id: int
+    target_location_name: str
+    stay: bool
+    distance_km: float
+    eta_minutes: float
+    forecast_demand: float
+    idle_drivers_at_target: int
+    score: float
+
+class DashboardStats(DriverDailyStatBase):
+    date: date
+    multiplier_expires_at: Optional[datetime] = None
+    multiplier_minutes_left: int = 0
+
+class DashboardProgress(BaseModel):
+    target_distance_60_percent: float
+    target_distance_100_percent: float
+    distance_progress_60_percent: float
+    distance_progress_100_percent: float
+    coins_for_60_percent_tier: int
+    coins_for_100_percent_tier: int
+    multiplier_available: Optional[float] = None
+
+class DriverDashboardResponse(BaseModel):
+    driver: DriverResponse
+    stats: DashboardStats
+    progress: DashboardProgress
+    recent_trips: List[TripResponse]
+    incentive_variant: str
+    config_version: str
+
 class ProcessTripResponse(BaseModel):
     driver_id: str
     trip_id: str
@@ -326,6 +381,8 @@ class ProcessTripResponse(BaseModel):
     streak_bonus_earned: int = 0
     multiplier_applied: float = 1.0
     final_fare: float
+    incentive_variant: Optional[str] = None
+    config_version: Optional[str] = None
 
 class ProcessCancellationResponse(BaseModel):
     success: bool
@@ -335,74 +392,172 @@ class ProcessCancellationResponse(BaseModel):
     cooldown_minutes: int = 0
     cooldown_until: Optional[datetime] = None
 
-# Dependency to get DB session
+class TrafficProfileResponse(BaseModel):
+    location_id: int
+    hour: int
+    intensity: float
+    ride_requests: float
+    samples: int
+    last_reading_at: Optional[datetime] = None
+
+class HeatmapTile(BaseModel):
+    x: int
+    y: int
+    bounds: List[float]
+    pickups: List[int]
+    ride_requests: List[int]
+    traffic_intensity: List[float]
+
+class HeatmapResponse(BaseModel):
+    zoom: int
+    grid_size: int
+    start: datetime
+    end: datetime
+    tiles: List[HeatmapTile]
+
+class SurgeZoneResponse(BaseModel):
+    zone_id: int
+    multiplier: float
+    target_multiplier: float
+    open_requests: int
+    available_drivers: int
+    window_seconds: int
+
+class SurgeSnapshotResponse(BaseModel):
+    location_ids: List[int]
+    multipliers: List[float]
+
+class SurgeEventCreate(BaseModel):
+    location_id: int
+    kind: Literal['request', 'driver_available']
+    count: int = Field(1, ge=1)
+
+class DemandForecastResponse(BaseModel):
+    generated_at: Optional[datetime] = None
+    horizons_minutes: List[int]
+    location_ids: List[int]
+    forecasts: List[List[float]]
+
+class BulkRejectedRow(BaseModel):
+    row: int
+    id: Optional[str] = None
+    error: str
+
+class BulkIngestResponse(BaseModel):
+    accepted: int
+    rejected: int
+    rejected_rows: List[BulkRejectedRow]
+
+# Dependency to get a storage repository
 def get_db():
-    db = SessionLocal()
+    db = backend.repository()
     try:
         yield db
     finally:
         db.close()
 
+def publish_driver_state(kind: str, driver_stats: DriverDailyStat, **extra):
+    """Push a committed daily-stats snapshot to the driver's event subscribers, if any."""
+    if not driver_events.has_subscribers(driver_stats.driver_id):
+        return
+    driver_events.publish(driver_stats.driver_id, kind, {
+        'event': kind,
+        'driver_id': driver_stats.driver_id,
+        'coins_earned': driver_stats.coins_earned,
+        'distance_covered_today': driver_stats.distance_covered_today,
+        'consecutive_trips': driver_stats.consecutive_trips,
+        'multiplier_active': driver_stats.multiplier_active,
+        'multiplier_value': driver_stats.multiplier_value,
+        'multiplier_expires_at': driver_stats.multiplier_expires_at,
+        'go_home_mode_active': driver_stats.go_home_mode_active,
+        'at': datetime.now(),
+        **extra
+    })
+
+# How long bulk endpoints trust their cached driver and location IDs
+REFERENCE_IDS_TTL_SECONDS = 60
+
+class ReferenceIds:
+    """Cached driver and location IDs, so bulk rows are validated without a query per row.
+    
+    The sets are reloaded when older than the TTL, and at most once per lookup
+    when a row names an ID they don't contain, which picks up drivers and
+    locations created by other API processes.
+    """
+    
+    def __init__(self, ttl_seconds=REFERENCE_IDS_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.driver_ids = None
+        self.location_ids = None
+        self.loaded_at = None
+    
+    def _load(self, db: IncentiveRepository):
+        self.driver_ids = db.driver_ids()
+        self.location_ids = db.location_ids()
+        self.loaded_at = datetime.now()
+    
+    def unknown(self, db: IncentiveRepository, driver_ids=(), location_ids=()):
+        """(unknown driver IDs, unknown location IDs) among those given."""
+        reloaded = False
+        if self.loaded_at is None or (datetime.now() - self.loaded_at).total_seconds() > self.ttl_seconds:
+            self._load(db)
+            reloaded = True
+        
+        missing_drivers = set(driver_ids) - self.driver_ids
+        missing_locations = set(location_ids) - self.location_ids
+        if (missing_drivers or missing_locations) and not reloaded:
+            self._load(db)
+            missing_drivers = set(driver_ids) - self.driver_ids
+            missing_locations = set(location_ids) - self.location_ids
+        return missing_drivers, missing_locations
+    
+    def add_driver(self, driver_id: str):
+        if self.driver_ids is not None:
+            self.driver_ids.add(driver_id)
+    
+    def add_location(self, location_id: int):
+        if self.location_ids is not None:
+            self.location_ids.add(location_id)
+
+reference_ids = ReferenceIds()
+
+def trip_hour(trip) -> int:
+    """Hour of day a trip was recorded at; the current hour for trips not stored yet."""
+    trip_time = getattr(trip, 'trip_time', None)
+    if isinstance(trip_time, timedelta):
+        return int(trip_time.total_seconds() // 3600) % 24
+    if isinstance(trip_time, str) and trip_time:
+        return int(trip_time.split(':')[0]) % 24
+    return datetime.now().hour
+
 # Core business logic
 class NammaYatriIncentiveSystem:
-    def __init__(self, db: Session):
+    def __init__(self, db: IncentiveRepository, params: Optional[incentive_rules.IncentiveParams] = None):
         self.db = db
-        # Coin system parameters
-        self.coin_system = {
-            'daily_milestone_60_percent': 50,  # Coins for 60% of daily target
-            'daily_milestone_100_percent': 100,  # Coins for 100% of daily target
-            'traffic_max_coins': 20,  # Maximum coins from traffic
-            'consecutive_trip_bonus': 5,  # Bonus for consecutive trips
-            'streak_thresholds': [3, 5, 10],  # Consecutive trips needed for streak bonus
-            'streak_bonuses': [10, 15, 25]  # Coins awarded for each streak level
-        }
-        
-        # Traffic component weights
-        self.traffic_weights = {
-            'base_weight': 0.5,
-            'time_of_day_weight': 0.3,
-            'historical_weight': 0.2
-        }
-        
-        # Cancellation penalty system
-        self.cancellation_penalties = {
-            'legitimate_reasons': ['passenger_no_show', 'passenger_request', 'vehicle_damage', 'emergency'],
-            'cooldown_minutes': 15,  # Cooldown for legitimate cancellations
-            'standard_penalty': 10,  # Default coin penalty
-            'time_thresholds': [60, 180, 300],  # Seconds since acceptance
-            'penalty_multipliers': [0.5, 1.0, 1.5]  # Penalty multipliers based on time
-        }
-        
-        # Forgiveness buffer for reliable drivers
-        self.forgiveness_buffer = {
-            'threshold_acceptance_rate': 90,  # High acceptance rate
-            'threshold_cancellation_rate': 5,  # Low cancellation rate
-            'buffer_coins': 10  # Coins protected from penalties
-        }
+        # One config snapshot per request; `params` pins a parameter set for every driver instead
+        self.config = incentive_config.current
+        self.params = params
+    
+    def params_for(self, driver_id: str):
+        """(variant name, parameters) that apply to this driver."""
+        if self.params is not None:
+            return self.params.version, self.params
+        return self.config.params_for(driver_id)
     
     def calculate_target_distances(self, driver_avg_distance_km: float):
         """Calculate target distances for a driver based on their historical average."""
-        target_tier1_km = driver_avg_distance_km * 0.6  # 60% of daily average
-        target_tier2_km = driver_avg_distance_km  # 100% of daily average
-        
-        return {
-            'target_distance_60_percent': round(target_tier1_km, 2),
-            'target_distance_100_percent': round(target_tier2_km, 2)
-        }
+        return incentive_rules.calculate_target_distances(driver_avg_distance_km)
     
     def get_driver_daily_stats(self, driver_id: str, stats_date: date = None):
         """Get or create driver's daily stats."""
         if stats_date is None:
             stats_date = date.today()
             
-        stats = self.db.query(DriverDailyStat).filter(
-            DriverDailyStat.driver_id == driver_id,
-            DriverDailyStat.date == stats_date
-        ).first()
+        stats = self.db.get_daily_stats(driver_id, stats_date)
         
         if not stats:
             # Create new daily stats for today
-            driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
+            driver = self.db.get_driver(driver_id)
             if not driver:
                 raise HTTPException(status_code=404, detail=f"Driver {driver_id} not found")
                 
@@ -417,7 +572,7 @@ class NammaYatriIncentiveSystem:
                 multiplier_value=1.0,
                 go_home_mode_active=False
             )
-            self.db.add(stats)
+            self.db.add_daily_stats(stats)
             self.db.commit()
             self.db.refresh(stats)
             
@@ -425,89 +580,86 @@ class NammaYatriIncentiveSystem:
     
     def _get_traffic_weight_for_time(self, time_of_day: str):
         """Return traffic weight based on time of day."""
-        if time_of_day == 'Morning':
-            return 0.8  # Morning rush
-        elif time_of_day == 'Evening':
-            return 0.9  # Evening rush (highest)
-        elif time_of_day == 'Afternoon':
-            return 0.5  # Moderate
-        elif time_of_day == 'Night':
-            return 0.3  # Light traffic
-        else:
-            return 0.5  # Default
+        return incentive_rules.traffic_weight_for_time(time_of_day)
     
     def _calculate_coins_for_trip(self, driver, trip_data):
         """Calculate coins earned for a trip based on distance, traffic, and other factors."""
-        # Base coins based on percentage of daily target distance
-        base_daily_distance = driver.daily_avg_distance_km
-        trip_distance = trip_data.estimated_trip_distance_km
-        distance_percentage = (trip_distance / base_daily_distance) * 100
-        
-        # Base coins: 1 coin per 1% of daily target
-        base_coins = int(distance_percentage * 0.55)
-        
-        # Traffic component - extra coins for heavy traffic
-        traffic_factor = trip_data.traffic_factor
-        traffic_time_of_day = self._get_traffic_weight_for_time(trip_data.time_of_day)
-        
-        # Traffic coins calculation
-        traffic_coins = (traffic_factor * self.traffic_weights['base_weight'] + 
-                         traffic_time_of_day * self.traffic_weights['time_of_day_weight']) * 10
-        
-        # Apply cap to traffic coins
-        traffic_coins = min(traffic_coins, self.coin_system['traffic_max_coins'])
-        
-        # Event bonus
-        event_bonus = 0
-        if trip_data.at_event:
-            event_type = trip_data.event_type or 'Generic'
-            event_bonus = 5  # Default bonus
-            
-            # Higher bonus for special events
-            if event_type in ['Concert', 'Sports']:
-                event_bonus = 10
-            elif event_type == 'Festival':
-                event_bonus = 20
-        
-        # Total coins for this trip
-        total_coins = base_coins + traffic_coins + event_bonus
-        
-        # Round to nearest whole number
-        return round(total_coins)
+        return incentive_rules.calculate_trip_coins(driver, trip_data, self.params_for(driver.driver_id)[1])
     
-    def _check_for_streak_bonus(self, consecutive_trips: int):
+    def _check_for_streak_bonus(self, consecutive_trips: int, driver_id: str = None):
         """Check if driver qualifies for a streak bonus based on consecutive trips."""
-        # Check each streak threshold (highest first)
-        for i in range(len(self.coin_system['streak_thresholds']) - 1, -1, -1):
-            threshold = self.coin_system['streak_thresholds'][i]
-            if consecutive_trips == threshold:  # Exact match for streak
-                return self.coin_system['streak_bonuses'][i]
+        return incentive_rules.streak_bonus(consecutive_trips, self.params_for(driver_id)[1])
+    
+    def _historical_traffic(self, trip_data):
+        """Usual traffic at the trip's pickup and hour; the value stored on the trip once it has one."""
+        stored = getattr(trip_data, 'historical_traffic', None)
+        if stored is not None:
+            return stored
+        return traffic_profile.intensity(trip_data.pickup_location_id, trip_hour(trip_data))
+    
+    def _apply_trip(self, driver, driver_stats, trip_data, historical_traffic, params):
+        """Run the trip rules against today's stats and write the outcome back."""
+        state = DailyState(
+            distance_covered_today=driver_stats.distance_covered_today,
+            coins_earned=driver_stats.coins_earned,
+            hours_active=driver_stats.hours_active,
+            consecutive_trips=driver_stats.consecutive_trips,
+            multiplier_active=driver_stats.multiplier_active,
+            multiplier_value=driver_stats.multiplier_value
+        )
+        outcome = incentive_rules.evaluate_trip(driver, state, trip_data, params, historical_traffic)
+        new_state = incentive_rules.apply_trip(state, outcome)
+        
+        driver_stats.distance_covered_today = new_state.distance_covered_today
+        driver_stats.coins_earned = new_state.coins_earned
+        driver_stats.hours_active = new_state.hours_active
+        driver_stats.consecutive_trips = new_state.consecutive_trips
+        
+        # Update driver's current location
+        driver.current_location_id = trip_data.destination_location_id
         
-        return 0  # No streak bonus
+        return outcome
+    
+    @staticmethod
+    def _record_outcome(trip, outcome, variant, params):
+        trip.multiplier_applied = outcome.multiplier_applied
+        trip.final_fare = outcome.final_fare
+        trip.coins_earned = outcome.coins_earned
+        trip.streak_bonus = outcome.streak_bonus
+        trip.incentive_variant = variant
+        trip.config_version = params.version
+        trip.processed_at = datetime.now()
+
+    @staticmethod
+    def trip_result(trip, driver_stats):
+        """Response for a processed trip, from the outcome stored on it; also used to answer a repeated call."""
+        return {
+            "driver_id": trip.driver_id,
+            "trip_id": trip.trip_id,
+            "success": True,
+            "coins_earned": trip.coins_earned,
+            "total_distance": trip.estimated_trip_distance_km + trip.distance_to_pickup_km,
+            "distance_covered_today": driver_stats.distance_covered_today if driver_stats else 0,
+            "new_coins_balance": driver_stats.coins_earned if driver_stats else 0,
+            # Trips processed before these columns existed have none stored
+            "streak_bonus_earned": trip.streak_bonus or 0,
+            "multiplier_applied": trip.multiplier_applied,
+            "final_fare": trip.final_fare,
+            "incentive_variant": trip.incentive_variant,
+            "config_version": trip.config_version
+        }
     
     def process_new_trip(self, driver_id: str, trip_data: TripCreate):
         """Process a new completed trip and update driver incentives."""
         # Get driver and daily stats
-        driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
+        driver = self.db.get_driver(driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail=f"Driver {driver_id} not found")
             
         driver_stats = self.get_driver_daily_stats(driver_id)
-        
-        # Calculate pickup + trip distance
-        total_distance = trip_data.estimated_trip_distance_km + trip_data.distance_to_pickup_km
-        
-        # Update driver's distance covered today
-        driver_stats.distance_covered_today += total_distance
-        
-        # Calculate coins earned from this trip
-        coins_earned = self._calculate_coins_for_trip(driver, trip_data)
-        
-        # Determine if multiplier applies
-        multiplier_applied = driver_stats.multiplier_value if driver_stats.multiplier_active else 1.0
-        
-        # Calculate final fare
-        final_fare = trip_data.base_trip_fare * multiplier_applied
+        historical_traffic = self._historical_traffic(trip_data)
+        variant, params = self.params_for(driver_id)
+        outcome = self._apply_trip(driver, driver_stats, trip_data, historical_traffic, params)
         
         # Create new trip record
         new_trip = Trip(
@@ -523,49 +675,46 @@ class NammaYatriIncentiveSystem:
             event_type=trip_data.event_type,
             base_fare=trip_data.base_fare,
             base_trip_fare=trip_data.base_trip_fare,
-            multiplier_applied=multiplier_applied,
-            final_fare=final_fare,
             trip_duration_minutes=trip_data.trip_duration_minutes,
             trip_date=date.today(),
             trip_time=datetime.now().strftime('%H:%M:%S'),
-            coins_earned=coins_earned
+            historical_traffic=historical_traffic
         )
+        self._record_outcome(new_trip, outcome, variant, params)
+        # Built before the commit expires the rows' attributes
+        result = self.trip_result(new_trip, driver_stats)
         
-        # Update driver stats
-        driver_stats.consecutive_trips += 1
-        driver_stats.coins_earned += coins_earned
-        driver_stats.hours_active += (trip_data.trip_duration_minutes / 60)
-        
-        # Check for streak bonus
-        streak_bonus = self._check_for_streak_bonus(driver_stats.consecutive_trips)
-        if streak_bonus > 0:
-            driver_stats.coins_earned += streak_bonus
+        # Save all changes
+        self.db.add_trip(new_trip)
+        self.db.commit()
+        self.db.refresh(driver_stats)
+        self.db.refresh(new_trip)
+        publish_driver_state('trip_processed', driver_stats, trip_id=trip_data.trip_id)
         
-        # Update driver's current location
-        destination_loc = self.db.query(Location).filter(
-            Location.location_id == trip_data.destination_location_id
-        ).first()
+        return result
+    
+    def process_trip(self, trip: Trip):
+        """Apply incentives to a trip already stored via POST /trips/."""
+        driver = self.db.get_driver(trip.driver_id)
+        if not driver:
+            raise HTTPException(status_code=404, detail=f"Driver {trip.driver_id} not found")
+            
+        driver_stats = self.get_driver_daily_stats(trip.driver_id)
+        trip.historical_traffic = self._historical_traffic(trip)
+        variant, params = self.params_for(trip.driver_id)
+        outcome = self._apply_trip(driver, driver_stats, trip, trip.historical_traffic, params)
         
-        driver.current_location_id = trip_data.destination_location_id
+        # Update the existing trip record with the calculated values
+        self._record_outcome(trip, outcome, variant, params)
+        # Built before the commit expires the rows' attributes
+        result = self.trip_result(trip, driver_stats)
         
         # Save all changes
-        self.db.add(new_trip)
         self.db.commit()
         self.db.refresh(driver_stats)
-        self.db.refresh(new_trip)
+        publish_driver_state('trip_processed', driver_stats, trip_id=trip.trip_id)
         
-        return {
-            "driver_id": driver_id,
-            "trip_id": trip_data.trip_id,
-            "success": True,
-            "coins_earned": coins_earned,
-            "total_distance": total_distance,
-            "distance_covered_today": driver_stats.distance_covered_today,
-            "new_coins_balance": driver_stats.coins_earned,
-            "streak_bonus_earned": streak_bonus,
-            "multiplier_applied": multiplier_applied,
-            "final_fare": final_fare
-        }
+        return result
     
     def activate_multiplier(self, driver_id: str):
         """Activate a driver's multiplier if they have enough coins."""
@@ -578,16 +727,12 @@ class NammaYatriIncentiveSystem:
                 'message': "Multiplier already active."
             }
         
-        # Check if they have enough coins for the 1.25x multiplier (50 coins)
-        if driver_stats.coins_earned >= self.coin_system['daily_milestone_60_percent']:
-            # Determine multiplier value based on coins
-            if driver_stats.coins_earned >= self.coin_system['daily_milestone_100_percent']:
-                multiplier_value = 1.5  # 100+ coins
-            else:
-                multiplier_value = 1.25  # 50-99 coins
-                
+        # 1.25x from 50 coins, 1.5x from 100 coins
+        _, params = self.params_for(driver_id)
+        multiplier_value = incentive_rules.multiplier_for_coins(driver_stats.coins_earned, params)
+        if multiplier_value is not None:
             # Set expiration time (4 hours from now)
-            expires_at = datetime.now() + timedelta(hours=4)
+            expires_at = datetime.now() + timedelta(hours=incentive_rules.MULTIPLIER_HOURS)
             
             # Update driver stats
             driver_stats.multiplier_active = True
@@ -596,6 +741,7 @@ class NammaYatriIncentiveSystem:
             
             self.db.commit()
             self.db.refresh(driver_stats)
+            publish_driver_state('multiplier_activated', driver_stats)
             
             return {
                 'success': True,
@@ -607,7 +753,7 @@ class NammaYatriIncentiveSystem:
         else:
             return {
                 'success': False,
-                'message': f"Not enough coins. Need {self.coin_system['daily_milestone_60_percent']} coins for multiplier activation."
+                'message': f"Not enough coins. Need {params.coin_system['daily_milestone_60_percent']} coins for multiplier activation."
             }
     
     def activate_go_home_mode(self, driver_id: str):
@@ -617,6 +763,7 @@ class NammaYatriIncentiveSystem:
         
         self.db.commit()
         self.db.refresh(driver_stats)
+        publish_driver_state('go_home_activated', driver_stats)
         
         return {
             'success': True,
@@ -641,7 +788,7 @@ class NammaYatriIncentiveSystem:
     def find_optimal_trips_for_go_home(self, driver_id: str):
         """Find optimal trips for a driver in go-home mode."""
         # Get driver info
-        driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
+        driver = self.db.get_driver(driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail=f"Driver {driver_id} not found")
             
@@ -654,13 +801,9 @@ class NammaYatriIncentiveSystem:
             }
         
         # Get driver home and current location
-        home_loc = self.db.query(Location).filter(
-            Location.location_id == driver.home_location_id
-        ).first()
+        home_loc = self.db.get_location(driver.home_location_id)
         
-        current_loc = self.db.query(Location).filter(
-            Location.location_id == driver.current_location_id
-        ).first()
+        current_loc = self.db.get_location(driver.current_location_id)
         
         if not home_loc or not current_loc:
             return {
@@ -670,7 +813,7 @@ class NammaYatriIncentiveSystem:
         
         # Generate sample trips (in a real scenario, these would come from real-time data)
         # For demo, we'll generate 3 potential trips
-        all_locations = self.db.query(Location).all()
+        all_locations = self.db.list_locations()
         potential_trips = []
         
         # Calculate current distance to home
@@ -735,56 +878,39 @@ class NammaYatriIncentiveSystem:
             'recommendations': potential_trips
         }
     
-    def process_cancellation(self, driver_id: str, cancellation_data: CancellationCreate):
-        """Process a cancellation and determine any penalties."""
+    def process_cancellation(self, driver_id: str, cancellation_data: CancellationCreate,
+                             record: Optional[Cancellation] = None):
+        """Process a cancellation and determine any penalties.
+        
+        `record` is the stored cancellation being processed; without one a new record is created.
+        """
         # Get driver info
-        driver = self.db.query(Driver).filter(Driver.driver_id == driver_id).first()
+        driver = self.db.get_driver(driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail=f"Driver {driver_id} not found")
             
         driver_stats = self.get_driver_daily_stats(driver_id)
         
-        # Check if reason is legitimate
-        is_legitimate = cancellation_data.reason in self.cancellation_penalties['legitimate_reasons']
-        
-        # Determine time-based multiplier
-        time_multiplier = 0.5  # Default
-        for i, threshold in enumerate(self.cancellation_penalties['time_thresholds']):
-            if cancellation_data.time_since_accept_seconds <= threshold:
-                time_multiplier = self.cancellation_penalties['penalty_multipliers'][i]
-                break
-        
-        # Calculate initial penalty
-        base_penalty = self.cancellation_penalties['standard_penalty']
-        penalty = base_penalty * time_multiplier
-        
-        # Apply forgiveness buffer for reliable drivers
-        buffer_applied = 0
-        if (driver.ride_acceptance_rate >= self.forgiveness_buffer['threshold_acceptance_rate'] and
-            driver.cancellation_rate <= self.forgiveness_buffer['threshold_cancellation_rate']):
-            # Driver qualifies for forgiveness buffer
-            available_buffer = self.forgiveness_buffer['buffer_coins']
-            buffer_applied = min(available_buffer, penalty)
-            penalty -= buffer_applied
-        
-        # Round penalty to nearest whole number
-        penalty = round(penalty)
-        
-        # Create cancellation record
-        new_cancellation = Cancellation(
-            driver_id=driver_id,
-            trip_id=cancellation_data.trip_id,
-            time_since_accept_seconds=cancellation_data.time_since_accept_seconds,
-            reason=cancellation_data.reason,
-            penalty_coins=penalty if not is_legitimate else 0
+        outcome = incentive_rules.evaluate_cancellation(
+            driver, driver_stats.coins_earned,
+            cancellation_data.time_since_accept_seconds, cancellation_data.reason, self.params_for(driver_id)[1]
         )
         
-        # Apply the penalty or set cooldown
-        result = {}
+        new_cancellation = record
+        if new_cancellation is None:
+            # Create cancellation record
+            new_cancellation = Cancellation(
+                driver_id=driver_id,
+                trip_id=cancellation_data.trip_id,
+                time_since_accept_seconds=cancellation_data.time_since_accept_seconds,
+                reason=cancellation_data.reason
+            )
+        new_cancellation.penalty_coins = outcome.penalty_coins
+        new_cancellation.processed_at = datetime.now()
         
-        if is_legitimate:
+        if outcome.is_legitimate:
             # For legitimate reasons, apply cooldown but no coin penalty
-            cooldown_minutes = self.cancellation_penalties['cooldown_minutes']
+            cooldown_minutes = outcome.cooldown_minutes
             cooldown_until = datetime.now() + timedelta(minutes=cooldown_minutes)
             
             new_cancellation.cooldown_minutes = cooldown_minutes
@@ -800,27 +926,23 @@ class NammaYatriIncentiveSystem:
             }
         else:
             # For non-legitimate reasons, deduct coins
-            if penalty > 0:
-                driver_stats.coins_earned = max(0, driver_stats.coins_earned - penalty)
-                result = {
-                    'success': True,
-                    'penalty_coins': penalty,
-                    'new_coins_balance': driver_stats.coins_earned,
-                    'message': f"Coin penalty applied: {penalty} coins deducted"
-                }
-            else:
-                result = {
-                    'success': True,
-                    'penalty_coins': 0,
-                    'new_coins_balance': driver_stats.coins_earned,
-                    'message': "No penalty applied due to forgiveness buffer."
-                }
+            driver_stats.coins_earned = outcome.coins_after
+            result = {
+                'success': True,
+                'penalty_coins': outcome.penalty_coins,
+                'new_coins_balance': driver_stats.coins_earned,
+                'message': (f"Coin penalty applied: {outcome.penalty_coins} coins deducted" if outcome.penalty_coins > 0
+                            else "No penalty applied due to forgiveness buffer.")
+            }
         
         # Save changes
-        self.db.add(new_cancellation)
+        if record is None:
+            self.db.add_cancellation(new_cancellation)
         self.db.commit()
         self.db.refresh(driver_stats)
         self.db.refresh(new_cancellation)
+        publish_driver_state('cancellation_processed', driver_stats,
+                             penalty_coins=outcome.penalty_coins, cooldown_until=new_cancellation.cooldown_until)
         
         return result
 
@@ -831,36 +953,37 @@ async def root():
 
 # Location endpoints
 @app.get("/locations/", response_model=List[LocationResponse])
-async def get_locations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    locations = db.query(Location).offset(skip).limit(limit).all()
+async def get_locations(skip: int = 0, limit: int = 100, db: IncentiveRepository = Depends(get_db)):
+    locations = db.list_locations(skip, limit)
     return locations
 
 @app.post("/locations/", response_model=LocationResponse)
-async def create_location(location: LocationCreate, db: Session = Depends(get_db)):
+async def create_location(location: LocationCreate, db: IncentiveRepository = Depends(get_db)):
     new_location = Location(**location.dict())
-    db.add(new_location)
+    db.add_location(new_location)
     db.commit()
     db.refresh(new_location)
+    reference_ids.add_location(new_location.location_id)
     return new_location
 
 @app.get("/locations/{location_id}", response_model=LocationResponse)
-async def get_location(location_id: int, db: Session = Depends(get_db)):
-    location = db.query(Location).filter(Location.location_id == location_id).first()
+async def get_location(location_id: int, db: IncentiveRepository = Depends(get_db)):
+    location = db.get_location(location_id)
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
     return location
 
 # Driver endpoints
 @app.get("/drivers/", response_model=List[DriverResponse])
-async def get_drivers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    drivers = db.query(Driver).offset(skip).limit(limit).all()
+async def get_drivers(skip: int = 0, limit: int = 100, db: IncentiveRepository = Depends(get_db)):
+    drivers = db.list_drivers(skip, limit)
     return drivers
 
 @app.post("/drivers/", response_model=DriverResponse)
-async def create_driver(driver: DriverCreate, db: Session = Depends(get_db)):
+async def create_driver(driver: DriverCreate, db: IncentiveRepository = Depends(get_db)):
     # Check if home and current locations exist
-    home_loc = db.query(Location).filter(Location.location_id == driver.home_location_id).first()
-    current_loc = db.query(Location).filter(Location.location_id == driver.current_location_id).first()
+    home_loc = db.get_location(driver.home_location_id)
+    current_loc = db.get_location(driver.current_location_id)
     
     if not home_loc or not current_loc:
         raise HTTPException(status_code=400, detail="Invalid location IDs")
@@ -874,31 +997,23 @@ async def create_driver(driver: DriverCreate, db: Session = Depends(get_db)):
     driver_data.update(targets)
     new_driver = Driver(**driver_data)
     
-    db.add(new_driver)
+    db.add_driver(new_driver)
     db.commit()
     db.refresh(new_driver)
-    
-    # Create initial daily stats
-    DriverDailyStat(
-        driver_id=new_driver.driver_id,
-        date=date.today()
-    )
-    
-    db.add(new_driver)
-    db.commit()
+    reference_ids.add_driver(new_driver.driver_id)
     
     return new_driver
 
 @app.get("/drivers/{driver_id}", response_model=DriverResponse)
-async def get_driver(driver_id: str, db: Session = Depends(get_db)):
-    driver = db.query(Driver).filter(Driver.driver_id == driver_id).first()
+async def get_driver(driver_id: str, db: IncentiveRepository = Depends(get_db)):
+    driver = db.get_driver(driver_id)
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     return driver
 
 @app.put("/drivers/{driver_id}", response_model=DriverResponse)
-async def update_driver(driver_id: str, driver_update: DriverUpdate, db: Session = Depends(get_db)):
-    driver = db.query(Driver).filter(Driver.driver_id == driver_id).first()
+async def update_driver(driver_id: str, driver_update: DriverUpdate, db: IncentiveRepository = Depends(get_db)):
+    driver = db.get_driver(driver_id)
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
@@ -930,7 +1045,7 @@ async def update_driver(driver_id: str, driver_update: DriverUpdate, db: Session
 async def get_driver_daily_stats(
     driver_id: str, 
     stats_date: date = Query(None, description="Date for stats (defaults to today)"),
-    db: Session = Depends(get_db)
+    db: IncentiveRepository = Depends(get_db)
 ):
     system = NammaYatriIncentiveSystem(db)
     stats = system.get_driver_daily_stats(driver_id, stats_date)
@@ -938,21 +1053,140 @@ async def get_driver_daily_stats(
         raise HTTPException(status_code=404, detail=f"No daily stats found for driver {driver_id}")
     return stats
 
+# How many of the driver's latest trips the dashboard carries
+DASHBOARD_TRIPS = 10
+
+def _etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header names `etag` (weak validators compare equal)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+@app.get("/drivers/{driver_id}/dashboard", response_model=DriverDashboardResponse)
+async def get_driver_dashboard(driver_id: str, request: Request, db: IncentiveRepository = Depends(get_db)):
+    """Everything the driver screen shows, in three queries: driver with locations, today's stats, recent trips.
+
+    The ETag is a hash of the body, so a poller sending it back in If-None-Match
+    gets an empty 304 until something on the screen changes.
+    """
+    driver = db.get_driver(driver_id, with_locations=True)
+    if not driver:
+        raise HTTPException(status_code=404, detail="Driver not found")
+    
+    today = date.today()
+    stats = db.get_daily_stats(driver_id, today)
+    trips = db.list_trips(driver_id, limit=DASHBOARD_TRIPS)
+    
+    # Reading the dashboard never creates today's stats row; a driver without one shows zeros
+    stats_data = DriverDailyStatBase.model_validate(stats, from_attributes=True).model_dump() if stats else {}
+    expires_at = stats.multiplier_expires_at if stats else None
+    minutes_left = 0
+    if stats_data.get("multiplier_active") and expires_at:
+        minutes_left = max(0, int((expires_at - datetime.now()).total_seconds() // 60))
+    stats_model = DashboardStats(**stats_data, date=today, multiplier_expires_at=expires_at,
+                                 multiplier_minutes_left=minutes_left)
+    
+    variant, params = NammaYatriIncentiveSystem(db).params_for(driver_id)
+    distance = stats_model.distance_covered_today
+    
+    def percent_of(target):
+        return round(min(100.0, 100 * distance / target), 1) if target else 0.0
+    
+    multiplier_available = None
+    if not stats_model.multiplier_active:
+        multiplier_available = incentive_rules.multiplier_for_coins(stats_model.coins_earned, params)
+    
+    progress = DashboardProgress(
+        target_distance_60_percent=driver.target_distance_60_percent,
+        target_distance_100_percent=driver.target_distance_100_percent,
+        distance_progress_60_percent=percent_of(driver.target_distance_60_percent),
+        distance_progress_100_percent=percent_of(driver.target_distance_100_percent),
+        coins_for_60_percent_tier=params.coin_system['daily_milestone_60_percent'],
+        coins_for_100_percent_tier=params.coin_system['daily_milestone_100_percent'],
+        multiplier_available=multiplier_available
+    )
+    
+    dashboard = DriverDashboardResponse(
+        driver=DriverResponse.model_validate(driver, from_attributes=True),
+        stats=stats_model,
+        progress=progress,
+        recent_trips=[TripResponse.from_orm(trip) for trip in trips],
+        incentive_variant=variant,
+        config_version=params.version
+    )
+    
+    body = jsonable_encoder(dashboard)
+    etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=body, headers=headers)
+
+# Seconds between SSE comment lines that keep idle connections open through proxies
+EVENT_KEEPALIVE_SECONDS = 15
+
+async def _driver_event_stream(driver_id: str, snapshot: str):
+    # Subscribed here rather than in the endpoint: a client that disconnects before the
+    # first chunk never starts the generator, and its queue would never be unsubscribed
+    queue = driver_events.subscribe(driver_id)
+    try:
+        yield snapshot
+        while True:
+            try:
+                kind, data = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(kind, data)
+    finally:
+        # Runs when the client disconnects and Starlette cancels the stream
+        driver_events.unsubscribe(driver_id, queue)
+
+@app.get("/drivers/{driver_id}/events")
+async def stream_driver_events(driver_id: str):
+    """Server-Sent Events stream of the driver's state, replacing stats polling.
+
+    Opens with a `snapshot` event of today's stats, then sends one event per
+    committed change: trip_processed, cancellation_processed (with
+    cooldown_until), multiplier_activated, go_home_activated and
+    daily_stats_reset. Every event carries the full state, so a client that
+    misses one only needs the next.
+    """
+    # The repository is only needed for the snapshot, not for the life of the connection
+    db = backend.repository()
+    try:
+        if not db.get_driver(driver_id):
+            raise HTTPException(status_code=404, detail="Driver not found")
+        stats = db.get_daily_stats(driver_id, date.today())
+        stats_data = DriverDailyStatBase.model_validate(stats, from_attributes=True).model_dump() if stats else {}
+        expires_at = stats.multiplier_expires_at if stats else None
+    finally:
+        db.close()
+    
+    snapshot = DashboardStats(**stats_data, date=date.today(), multiplier_expires_at=expires_at)
+    data = json.dumps({'event': 'snapshot', 'driver_id': driver_id, **jsonable_encoder(snapshot)})
+    return StreamingResponse(
+        _driver_event_stream(driver_id, format_sse('snapshot', data)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Trip endpoints
 @app.post("/trips/", response_model=TripResponse)
-async def create_trip(trip: TripCreate, db: Session = Depends(get_db)):
+async def create_trip(trip: TripCreate, db: IncentiveRepository = Depends(get_db)):
     try:
         # Check if driver exists
-        driver = db.query(Driver).filter(Driver.driver_id == trip.driver_id).first()
+        driver = db.get_driver(trip.driver_id)
         if not driver:
             raise HTTPException(status_code=404, detail="Driver not found")
             
         # Check if locations exist
-        pickup_loc = db.query(Location).filter(Location.location_id == trip.pickup_location_id).first()
+        pickup_loc = db.get_location(trip.pickup_location_id)
         if not pickup_loc:
             raise HTTPException(status_code=400, detail=f"Pickup location ID {trip.pickup_location_id} not found")
             
-        dest_loc = db.query(Location).filter(Location.location_id == trip.destination_location_id).first()
+        dest_loc = db.get_location(trip.destination_location_id)
         if not dest_loc:
             raise HTTPException(status_code=400, detail=f"Destination location ID {trip.destination_location_id} not found")
         
@@ -962,6 +1196,12 @@ async def create_trip(trip: TripCreate, db: Session = Depends(get_db)):
         if trip_dict.get('event_type') == "NULL":
             trip_dict['event_type'] = None
         
+        # A missing fare is priced at the zone's current surge; the request only counts once the trip is stored
+        surge = surge_engine.multiplier(trip.pickup_location_id)
+        if trip_dict['base_trip_fare'] is None:
+            trip_dict['base_trip_fare'] = trip_fare(trip.base_fare, trip.estimated_trip_distance_km, surge)
+            trip_dict['surge_multiplier'] = surge
+        
         new_trip = Trip(**trip_dict)
         
         # IMPORTANT: Store trip_time as a string
@@ -969,12 +1209,13 @@ async def create_trip(trip: TripCreate, db: Session = Depends(get_db)):
         new_trip.trip_time = datetime.now().strftime('%H:%M:%S')  # Store as string
         
         new_trip.multiplier_applied = 1.0  # Default value
-        new_trip.final_fare = trip.base_trip_fare  # Default before processing
+        new_trip.final_fare = new_trip.base_trip_fare  # Default before processing
         new_trip.coins_earned = 0  # Will be set during processing
         
-        db.add(new_trip)
+        db.add_trip(new_trip)
         db.commit()
         db.refresh(new_trip)
+        surge_engine.record_request(trip.pickup_location_id)
         
         # Manually create the response dictionary
         response_data = {
@@ -996,6 +1237,7 @@ async def create_trip(trip: TripCreate, db: Session = Depends(get_db)):
             "trip_date": new_trip.trip_date.isoformat(),
             "trip_time": new_trip.trip_time if isinstance(new_trip.trip_time, str) else datetime.now().strftime('%H:%M:%S'),
             "coins_earned": new_trip.coins_earned,
+            "surge_multiplier": new_trip.surge_multiplier,
             "created_at": new_trip.created_at.isoformat()
         }
         
@@ -1006,8 +1248,115 @@ async def create_trip(trip: TripCreate, db: Session = Depends(get_db)):
         print(error_detail)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Largest request the bulk endpoints accept
+MAX_BULK_ROWS = 10000
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+async def read_bulk_rows(request: Request):
+    """(rows, rejected) of a bulk body: a JSON array, or NDJSON when the content type says so.
+    
+    rows are (row number, parsed object); NDJSON lines that aren't valid JSON
+    are rejected on their own, while a malformed JSON array fails the request.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    
+    rows, rejected = [], []
+    if content_type in NDJSON_CONTENT_TYPES:
+        lines = [line for line in body.splitlines() if line.strip()]
+        for index, line in enumerate(lines):
+            try:
+                rows.append((index, json.loads(line)))
+            except ValueError:
+                rejected.append({'row': index, 'error': "Invalid JSON"})
+    else:
+        try:
+            parsed = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array, or NDJSON with an NDJSON content type")
+        if not isinstance(parsed, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of rows")
+        rows = list(enumerate(parsed))
+    
+    if len(rows) + len(rejected) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ROWS} rows per request")
+    return rows, rejected
+
+def validate_bulk_rows(rows, model, id_field, rejected):
+    """Rows that pass `model` as (row number, model instance); the rest are added to `rejected`."""
+    valid = []
+    for index, row in rows:
+        try:
+            valid.append((index, model.model_validate(row)))
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+            row_id = row.get(id_field) if isinstance(row, dict) else None
+            rejected.append({'row': index, 'id': None if row_id is None else str(row_id), 'error': errors})
+    return valid
+
+def bulk_result(accepted, rejected):
+    return {'accepted': accepted, 'rejected': len(rejected), 'rejected_rows': sorted(rejected, key=lambda r: r['row'])}
+
+@app.post("/trips/bulk", response_model=BulkIngestResponse)
+async def create_trips_bulk(request: Request, db: IncentiveRepository = Depends(get_db)):
+    """Store many unprocessed trips in one transaction, as POST /trips/ does for one.
+    
+    Driver and location IDs are checked against the cached ID sets and trip IDs
+    with one lookup per 500; rows that fail are reported and the rest inserted.
+    """
+    rows, rejected = await read_bulk_rows(request)
+    trips = validate_bulk_rows(rows, TripCreate, 'trip_id', rejected)
+    
+    unknown_drivers, unknown_locations = reference_ids.unknown(
+        db,
+        {trip.driver_id for _, trip in trips},
+        {trip.pickup_location_id for _, trip in trips} | {trip.destination_location_id for _, trip in trips}
+    )
+    existing = db.existing_trip_ids({trip.trip_id for _, trip in trips})
+    
+    now = datetime.now()
+    trip_time = now.strftime('%H:%M:%S')
+    accepted_ids = set()
+    mappings = []
+    for index, trip in trips:
+        if trip.driver_id in unknown_drivers:
+            error = f"Driver {trip.driver_id} not found"
+        elif trip.pickup_location_id in unknown_locations:
+            error = f"Pickup location ID {trip.pickup_location_id} not found"
+        elif trip.destination_location_id in unknown_locations:
+            error = f"Destination location ID {trip.destination_location_id} not found"
+        elif trip.trip_id in existing or trip.trip_id in accepted_ids:
+            error = f"Trip {trip.trip_id} already exists"
+        else:
+            error = None
+        if error:
+            rejected.append({'row': index, 'id': trip.trip_id, 'error': error})
+            continue
+        
+        accepted_ids.add(trip.trip_id)
+        mapping = trip.model_dump()
+        if mapping.get('event_type') == "NULL":
+            mapping['event_type'] = None
+        # Bulk rows are not live requests, so a missing fare is priced without surge
+        if mapping['base_trip_fare'] is None:
+            mapping['base_trip_fare'] = trip_fare(trip.base_fare, trip.estimated_trip_distance_km)
+        mapping.update(
+            trip_date=now.date(), trip_time=trip_time, multiplier_applied=1.0,
+            final_fare=mapping['base_trip_fare'], surge_multiplier=1.0, coins_earned=0, created_at=now
+        )
+        mappings.append(mapping)
+    
+    try:
+        db.bulk_add_trips(mappings)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"No trips stored: {e}")
+    
+    return bulk_result(len(mappings), rejected)
+
 @app.post("/trips/test", response_model=None)
-async def create_test_trip(trip: dict, db: Session = Depends(get_db)):
+async def create_test_trip(trip: dict, db: IncentiveRepository = Depends(get_db)):
     """A simpler test endpoint without Pydantic validation"""
     try:
         # Create new trip record manually
@@ -1032,7 +1381,7 @@ async def create_test_trip(trip: dict, db: Session = Depends(get_db)):
             coins_earned=0
         )
         
-        db.add(new_trip)
+        db.add_trip(new_trip)
         db.commit()
         
         return {"message": "Trip created successfully", "trip_id": new_trip.trip_id}
@@ -1061,20 +1410,9 @@ async def get_trips(
     end_date: date = None,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: IncentiveRepository = Depends(get_db)
 ):
-    query = db.query(Trip)
-    
-    if driver_id:
-        query = query.filter(Trip.driver_id == driver_id)
-    
-    if start_date:
-        query = query.filter(Trip.trip_date >= start_date)
-    
-    if end_date:
-        query = query.filter(Trip.trip_date <= end_date)
-    
-    trips = query.order_by(Trip.created_at.desc()).offset(skip).limit(limit).all()
+    trips = db.list_trips(driver_id, start_date, end_date, skip, limit)
     
     # Convert all trip_time fields to strings
     for trip in trips:
@@ -1084,8 +1422,8 @@ async def get_trips(
 
 # Update the get_trip endpoint
 @app.get("/trips/{trip_id}", response_model=TripResponse)
-async def get_trip(trip_id: str, db: Session = Depends(get_db)):
-    trip = db.query(Trip).filter(Trip.trip_id == trip_id).first()
+async def get_trip(trip_id: str, db: IncentiveRepository = Depends(get_db)):
+    trip = db.get_trip(trip_id)
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
     
@@ -1095,114 +1433,91 @@ async def get_trip(trip_id: str, db: Session = Depends(get_db)):
     return trip
 
 
-@app.post("/trips/{trip_id}/process", response_model=ProcessTripResponse)
-async def process_trip(trip_id: str, db: Session = Depends(get_db)):
+def trip_event_fields(trip: Trip):
+    """The trip columns carried by its post-commit event."""
+    return {
+        'trip_id': trip.trip_id,
+        'driver_id': trip.driver_id,
+        'trip_date': trip.trip_date.isoformat(),
+        'trip_time': str(trip.trip_time) if trip.trip_time is not None else None,
+        'time_of_day': trip.time_of_day,
+        'pickup_location_id': trip.pickup_location_id,
+        'destination_location_id': trip.destination_location_id,
+        'base_trip_fare': trip.base_trip_fare
+    }
+
+def trip_processed_event(fields: dict, result: dict):
+    """JSON-ready post-commit event for a processed trip."""
+    return {
+        **fields,
+        'total_distance': result['total_distance'],
+        'coins_earned': result['coins_earned'],
+        'multiplier_applied': result['multiplier_applied'],
+        'final_fare': result['final_fare'],
+        'new_coins_balance': result['new_coins_balance'],
+        'distance_covered_today': result['distance_covered_today'],
+        'incentive_variant': result['incentive_variant'],
+        'config_version': result['config_version'],
+        'processed_at': datetime.now().isoformat()
+    }
+
+async def run_idempotent(request: Request, idempotency_key: Optional[str], response_model, func):
+    """Run the processing coroutine `func` once per Idempotency-Key.
+    
+    Without a key the result is returned as usual. With one, the response is
+    stored and retries get the same body back with Idempotent-Replayed: true.
+    """
+    async def run():
+        return jsonable_encoder(response_model(**await func()))
+    
     try:
-        # Get trip data
-        trip = db.query(Trip).filter(Trip.trip_id == trip_id).first()
-        if not trip:
-            raise HTTPException(status_code=404, detail="Trip not found")
-        
-        # Check if trip has already been processed (coins already earned)
-        if trip.coins_earned > 0:
-            # Trip already processed, return existing data
-            driver_stats = db.query(DriverDailyStat).filter(
-                DriverDailyStat.driver_id == trip.driver_id,
-                DriverDailyStat.date == trip.trip_date
-            ).first()
+        body, replayed = await idempotency_keys.run(idempotency_key, f"{request.method} {request.url.path}", run)
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if idempotency_key is None:
+        return body
+    return JSONResponse(content=body, headers={"Idempotent-Replayed": "true" if replayed else "false"})
+
+@app.post("/trips/{trip_id}/process", response_model=ProcessTripResponse)
+async def process_trip(
+    trip_id: str,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: IncentiveRepository = Depends(get_db)
+):
+    async def apply():
+        try:
+            # Get trip data
+            trip = db.get_trip(trip_id)
+            if not trip:
+                raise HTTPException(status_code=404, detail="Trip not found")
             
-            return {
-                "driver_id": trip.driver_id,
-                "trip_id": trip.trip_id,
-                "success": True,
-                "coins_earned": trip.coins_earned,
-                "total_distance": trip.estimated_trip_distance_km + trip.distance_to_pickup_km,
-                "distance_covered_today": driver_stats.distance_covered_today if driver_stats else 0,
-                "new_coins_balance": driver_stats.coins_earned if driver_stats else 0,
-                "streak_bonus_earned": 0,
-                "multiplier_applied": trip.multiplier_applied,
-                "final_fare": trip.final_fare
-            }
-        
-        # Initialize the incentive system
-        system = NammaYatriIncentiveSystem(db)
-        
-        # Get driver and daily stats
-        driver = db.query(Driver).filter(Driver.driver_id == trip.driver_id).first()
-        if not driver:
-            raise HTTPException(status_code=404, detail=f"Driver {trip.driver_id} not found")
+            # Trips processed before processed_at existed are recognised by their coins
+            if trip.processed_at is not None or trip.coins_earned > 0:
+                # Trip already processed, return the stored outcome in the same shape
+                driver_stats = db.get_daily_stats(trip.driver_id, trip.trip_date)
+                return NammaYatriIncentiveSystem.trip_result(trip, driver_stats)
             
-        driver_stats = system.get_driver_daily_stats(trip.driver_id)
-        
-        # Calculate total distance (trip + distance to pickup)
-        trip_distance = trip.estimated_trip_distance_km
-        pickup_distance = trip.distance_to_pickup_km
-        total_distance = trip_distance + pickup_distance
-        
-        # Print values for debugging
-        print(f"DEBUG - Trip processing: trip={trip_id}, driver={trip.driver_id}")
-        print(f"DEBUG - Before update: distance_covered={driver_stats.distance_covered_today}")
-        print(f"DEBUG - Trip distance: trip={trip_distance}, pickup={pickup_distance}, total={total_distance}")
-        
-        # Update driver's distance covered today
-        driver_stats.distance_covered_today += total_distance
-        
-        print(f"DEBUG - After update: distance_covered={driver_stats.distance_covered_today}")
-        
-        # Calculate coins earned from this trip
-        coins_earned = system._calculate_coins_for_trip(driver, trip)
-        
-        # Determine if multiplier applies
-        multiplier_applied = driver_stats.multiplier_value if driver_stats.multiplier_active else 1.0
-        
-        # Calculate final fare
-        final_fare = trip.base_trip_fare * multiplier_applied
-        
-        # Update the existing trip record with the calculated values
-        trip.multiplier_applied = multiplier_applied
-        trip.final_fare = final_fare
-        trip.coins_earned = coins_earned
-        
-        # Update driver stats
-        driver_stats.consecutive_trips += 1
-        driver_stats.coins_earned += coins_earned
-        driver_stats.hours_active += (trip.trip_duration_minutes / 60)
-        
-        # Check for streak bonus
-        streak_bonus = system._check_for_streak_bonus(driver_stats.consecutive_trips)
-        if streak_bonus > 0:
-            driver_stats.coins_earned += streak_bonus
-        
-        # Update driver's current location
-        driver.current_location_id = trip.destination_location_id
-        
-        # Save all changes
-        db.commit()
-        db.refresh(driver_stats)
-        
-        # Return processed trip details
-        return {
-            "driver_id": trip.driver_id,
-            "trip_id": trip.trip_id,
-            "success": True,
-            "coins_earned": coins_earned,
-            "total_distance": total_distance,
-            "distance_covered_today": driver_stats.distance_covered_today,
-            "new_coins_balance": driver_stats.coins_earned,
-            "streak_bonus_earned": streak_bonus,
-            "multiplier_applied": multiplier_applied,
-            "final_fare": final_fare
-        }
-    except Exception as e:
-        import traceback
-        error_detail = f"Error processing trip: {str(e)}\n{traceback.format_exc()}"
-        print(error_detail)
-        raise HTTPException(status_code=500, detail=str(e))
+            system = NammaYatriIncentiveSystem(db)
+            # Read the trip's columns now; the commit in process_trip expires them
+            event = trip_event_fields(trip)
+            result = system.process_trip(trip)
+        except Exception as e:
+            import traceback
+            error_detail = f"Error processing trip: {str(e)}\n{traceback.format_exc()}"
+            print(error_detail)
+            raise HTTPException(status_code=500, detail=str(e))
+        
+        # Committed by now: a pipeline failure is dead-lettered there and the request still succeeds
+        await trip_pipeline.submit(trip_processed_event(event, result))
+        return result
+    
+    return await run_idempotent(request, idempotency_key, ProcessTripResponse, apply)
 # Cancellation endpoints
 @app.post("/cancellations/", response_model=CancellationResponse)
-async def create_cancellation(cancellation: CancellationCreate, db: Session = Depends(get_db)):
+async def create_cancellation(cancellation: CancellationCreate, db: IncentiveRepository = Depends(get_db)):
     # Check if driver exists
-    driver = db.query(Driver).filter(Driver.driver_id == cancellation.driver_id).first()
+    driver = db.get_driver(cancellation.driver_id)
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
@@ -1210,50 +1525,66 @@ async def create_cancellation(cancellation: CancellationCreate, db: Session = De
     new_cancellation = Cancellation(**cancellation.dict())
     new_cancellation.cancellation_date = date.today()
     
-    db.add(new_cancellation)
+    db.add_cancellation(new_cancellation)
     db.commit()
     db.refresh(new_cancellation)
     
     return new_cancellation
 
 @app.post("/cancellations/{cancellation_id}/process", response_model=ProcessCancellationResponse)
-async def process_cancellation(cancellation_id: int, db: Session = Depends(get_db)):
-    # Get cancellation data
-    cancellation = db.query(Cancellation).filter(Cancellation.cancellation_id == cancellation_id).first()
-    if not cancellation:
-        raise HTTPException(status_code=404, detail="Cancellation not found")
-    
-    # Initialize the incentive system
-    system = NammaYatriIncentiveSystem(db)
-    
-    # Process the cancellation
-    cancellation_data = CancellationCreate(
-        driver_id=cancellation.driver_id,
-        trip_id=cancellation.trip_id,
-        time_since_accept_seconds=cancellation.time_since_accept_seconds,
-        reason=cancellation.reason
-    )
+async def process_cancellation(
+    cancellation_id: int,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: IncentiveRepository = Depends(get_db)
+):
+    async def apply():
+        # Get cancellation data
+        cancellation = db.get_cancellation(cancellation_id)
+        if not cancellation:
+            raise HTTPException(status_code=404, detail="Cancellation not found")
+        
+        if cancellation.processed_at is not None:
+            # Already processed: report the stored outcome instead of penalising again
+            driver_stats = db.get_daily_stats(cancellation.driver_id, cancellation.cancellation_date)
+            return {
+                'success': True,
+                'message': "Cancellation already processed.",
+                'penalty_coins': cancellation.penalty_coins,
+                'new_coins_balance': driver_stats.coins_earned if driver_stats else 0,
+                'cooldown_minutes': cancellation.cooldown_minutes or 0,
+                'cooldown_until': cancellation.cooldown_until
+            }
+        
+        # Initialize the incentive system
+        system = NammaYatriIncentiveSystem(db)
+        
+        # Process the cancellation
+        cancellation_data = CancellationCreate(
+            driver_id=cancellation.driver_id,
+            trip_id=cancellation.trip_id,
+            time_since_accept_seconds=cancellation.time_since_accept_seconds,
+            reason=cancellation.reason
+        )
+        
+        return system.process_cancellation(cancellation.driver_id, cancellation_data, record=cancellation)
     
-    result = system.process_cancellation(cancellation.driver_id, cancellation_data)
-    return result
+    return await run_idempotent(request, idempotency_key, ProcessCancellationResponse, apply)
 @app.post("/drivers/{driver_id}/reset-daily-stats", response_model=DriverDailyStatResponse)
 async def reset_driver_daily_stats(
     driver_id: str, 
     data: dict,
-    db: Session = Depends(get_db)
+    db: IncentiveRepository = Depends(get_db)
 ):
     """Reset or create daily stats for a driver, used for simulation"""
     # Check if driver exists
-    driver = db.query(Driver).filter(Driver.driver_id == driver_id).first()
+    driver = db.get_driver(driver_id)
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
     # Check if stats for today already exist
     today = date.today()
-    existing_stats = db.query(DriverDailyStat).filter(
-        DriverDailyStat.driver_id == driver_id,
-        DriverDailyStat.date == today
-    ).first()
+    existing_stats = db.get_daily_stats(driver_id, today)
     
     if existing_stats:
         # Reset existing stats
@@ -1268,6 +1599,7 @@ async def reset_driver_daily_stats(
         
         db.commit()
         db.refresh(existing_stats)
+        publish_driver_state('daily_stats_reset', existing_stats)
         return existing_stats
     else:
         # Create new stats
@@ -1283,9 +1615,10 @@ async def reset_driver_daily_stats(
             go_home_mode_active=False
         )
         
-        db.add(new_stats)
+        db.add_daily_stats(new_stats)
         db.commit()
         db.refresh(new_stats)
+        publish_driver_state('daily_stats_reset', new_stats)
         return new_stats
 
 @app.get("/cancellations/", response_model=List[CancellationResponse])
@@ -1295,25 +1628,14 @@ async def get_cancellations(
     end_date: date = None,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: IncentiveRepository = Depends(get_db)
 ):
-    query = db.query(Cancellation)
-    
-    if driver_id:
-        query = query.filter(Cancellation.driver_id == driver_id)
-    
-    if start_date:
-        query = query.filter(Cancellation.cancellation_date >= start_date)
-    
-    if end_date:
-        query = query.filter(Cancellation.cancellation_date <= end_date)
-    
-    cancellations = query.order_by(Cancellation.created_at.desc()).offset(skip).limit(limit).all()
+    cancellations = db.list_cancellations(driver_id, start_date, end_date, skip, limit)
     return cancellations
 
 # Driver action endpoints
 @app.post("/drivers/{driver_id}/activate-multiplier", response_model=ActivateMultiplierResponse)
-async def activate_multiplier(driver_id: str, db: Session = Depends(get_db)):
+async def activate_multiplier(driver_id: str, db: IncentiveRepository = Depends(get_db)):
     # Initialize the incentive system
     system = NammaYatriIncentiveSystem(db)
     
@@ -1322,7 +1644,7 @@ async def activate_multiplier(driver_id: str, db: Session = Depends(get_db)):
     return result
 
 @app.post("/drivers/{driver_id}/activate-go-home", response_model=ActivateGoHomeResponse)
-async def activate_go_home(driver_id: str, db: Session = Depends(get_db)):
+async def activate_go_home(driver_id: str, db: IncentiveRepository = Depends(get_db)):
     # Initialize the incentive system
     system = NammaYatriIncentiveSystem(db)
     
@@ -1331,7 +1653,7 @@ async def activate_go_home(driver_id: str, db: Session = Depends(get_db)):
     return result
 
 @app.get("/drivers/{driver_id}/go-home-recommendations", response_model=GoHomeRecommendationsResponse)
-async def get_go_home_recommendations(driver_id: str, db: Session = Depends(get_db)):
+async def get_go_home_recommendations(driver_id: str, db: IncentiveRepository = Depends(get_db)):
     # Initialize the incentive system
     system = NammaYatriIncentiveSystem(db)
     
@@ -1339,19 +1661,60 @@ async def get_go_home_recommendations(driver_id: str, db: Session = Depends(get_
     result = system.find_optimal_trips_for_go_home(driver_id)
     return result
 
+@app.get("/drivers/{driver_id}/repositioning", response_model=RepositioningResponse)
+async def get_repositioning(driver_id: str):
+    """Where an idle driver should head next, from the last batch of recommendations."""
+    if repositioning.generated_at is None:
+        # Right after startup the scheduled refreshes may not have run yet; forecasts come first
+        if demand_forecaster.generated_at is None:
+            await asyncio.to_thread(refresh_with_repository, demand_forecaster)
+        await asyncio.to_thread(refresh_with_repository, repositioning)
+    recommendation = repositioning.recommendation(driver_id)
+    if recommendation is None:
+        raise HTTPException(status_code=404,
+                            detail=f"No repositioning recommendation for driver {driver_id}; they were not idle at the last refresh")
+    return recommendation
+
 # Traffic data endpoints
 @app.post("/traffic-data/", response_model=TrafficDataResponse)
-async def create_traffic_data(traffic_data: TrafficDataCreate, db: Session = Depends(get_db)):
+async def create_traffic_data(traffic_data: TrafficDataCreate, db: IncentiveRepository = Depends(get_db)):
     # Create new traffic data record
     new_traffic_data = TrafficData(**traffic_data.dict())
     new_traffic_data.date = date.today()
     
-    db.add(new_traffic_data)
+    db.add_traffic_data(new_traffic_data)
     db.commit()
     db.refresh(new_traffic_data)
+    traffic_profile.catch_up(db)
     
     return new_traffic_data
 
+@app.post("/traffic-data/bulk", response_model=BulkIngestResponse)
+async def create_traffic_data_bulk(request: Request, db: IncentiveRepository = Depends(get_db)):
+    """Store many traffic readings in one transaction; rows for unknown locations are rejected."""
+    rows, rejected = await read_bulk_rows(request)
+    readings = validate_bulk_rows(rows, TrafficDataCreate, 'location_id', rejected)
+    _, unknown_locations = reference_ids.unknown(db, location_ids={reading.location_id for _, reading in readings})
+    
+    now = datetime.now()
+    mappings = []
+    for index, reading in readings:
+        if reading.location_id in unknown_locations:
+            rejected.append({'row': index, 'id': str(reading.location_id),
+                             'error': f"Location ID {reading.location_id} not found"})
+            continue
+        mappings.append({**reading.model_dump(), 'date': now.date(), 'created_at': now})
+    
+    try:
+        db.bulk_add_traffic_data(mappings)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"No traffic data stored: {e}")
+    
+    traffic_profile.catch_up(db)
+    return bulk_result(len(mappings), rejected)
+
 @app.get("/traffic-data/", response_model=List[TrafficDataResponse])
 async def get_traffic_data(
     location_id: int = None,
@@ -1359,45 +1722,137 @@ async def get_traffic_data(
     date_filter: date = None,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db)
+    db: IncentiveRepository = Depends(get_db)
 ):
-    query = db.query(TrafficData)
-    
-    if location_id:
-        query = query.filter(TrafficData.location_id == location_id)
-    
-    if time_of_day:
-        query = query.filter(TrafficData.time_of_day == time_of_day)
-    
-    if date_filter:
-        query = query.filter(TrafficData.date == date_filter)
-    
-    traffic_data = query.order_by(TrafficData.created_at.desc()).offset(skip).limit(limit).all()
+    traffic_data = db.list_traffic_data(location_id, time_of_day, date_filter, skip, limit)
     return traffic_data
 
+def traffic_profile_row(location_id: int, hour: int, cell):
+    return {
+        'location_id': location_id,
+        'hour': hour,
+        'intensity': cell.intensity,
+        'ride_requests': cell.ride_requests,
+        'samples': cell.samples,
+        'last_reading_at': cell.last_reading_at
+    }
+
+@app.get("/traffic-profile/", response_model=List[TrafficProfileResponse])
+async def get_traffic_profile(
+    hour: int = Query(None, ge=0, le=23, description="Hour of day (defaults to the current hour)")
+):
+    """Moving-average traffic for every location with readings in an hour."""
+    hour = datetime.now().hour if hour is None else hour
+    return [traffic_profile_row(location_id, hour, cell)
+            for location_id, cell in sorted(traffic_profile.hour_snapshot(hour).items())]
+
+@app.get("/traffic-profile/{location_id}", response_model=List[TrafficProfileResponse])
+async def get_location_traffic_profile(location_id: int):
+    """A location's moving-average traffic for each hour it has readings in."""
+    rows = []
+    for hour in range(24):
+        cell = traffic_profile.cell(location_id, hour)
+        if cell:
+            rows.append(traffic_profile_row(location_id, hour, cell))
+    return rows
+
+@app.get("/heatmap", response_model=HeatmapResponse)
+async def get_heatmap(
+    zoom: int = Query(12, description=f"Tile zoom level, one of {', '.join(map(str, ZOOM_LEVELS))}"),
+    start: datetime = Query(None, description="Start of the time range (defaults to an hour before end)"),
+    end: datetime = Query(None, description="End of the time range (defaults to now)"),
+    x: int = Query(None, description="Only this tile column"),
+    y: int = Query(None, description="Only this tile row"),
+    db: IncentiveRepository = Depends(get_db)
+):
+    """Processed-trip pickups and traffic per map tile cell over a time range.
+
+    Tiles are Web Mercator z/x/y tiles. Each array holds grid_size * grid_size
+    cells, row by row from the tile's north-west corner; tiles without data
+    are left out. Traffic readings are folded in on the refresh schedule, so
+    new ones show up within a few seconds.
+    """
+    if zoom not in ZOOM_LEVELS:
+        raise HTTPException(status_code=400, detail=f"zoom must be one of {list(ZOOM_LEVELS)}")
+    end = end or datetime.now()
+    start = start or end - timedelta(hours=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    return {
+        'zoom': zoom,
+        'grid_size': demand_heatmap.grid,
+        'start': start,
+        'end': end,
+        'tiles': demand_heatmap.tiles(zoom, start, end, x, y)
+    }
+
+def demand_forecast_body(location_ids, table, generated_at):
+    return {
+        'generated_at': generated_at,
+        'horizons_minutes': list(demand_forecaster.horizons_minutes),
+        'location_ids': location_ids.tolist(),
+        'forecasts': np.round(table.astype(float), 2).tolist()
+    }
+
+@app.get("/forecasts/demand", response_model=DemandForecastResponse)
+async def get_demand_forecasts():
+    """Forecast demand for every location; forecasts[i][j] is location_ids[i] at horizons_minutes[j]."""
+    if demand_forecaster.snapshot()[2] is None:
+        await asyncio.to_thread(refresh_with_repository, demand_forecaster)
+    return demand_forecast_body(*demand_forecaster.snapshot())
+
+@app.get("/forecasts/demand/{location_id}", response_model=DemandForecastResponse)
+async def get_location_demand_forecast(location_id: int):
+    if demand_forecaster.snapshot()[2] is None:
+        await asyncio.to_thread(refresh_with_repository, demand_forecaster)
+    location_ids, table, generated_at = demand_forecaster.snapshot()
+    rows = np.flatnonzero(location_ids == location_id)
+    if not len(rows):
+        raise HTTPException(status_code=404, detail="Location not found")
+    return demand_forecast_body(location_ids[rows], table[rows], generated_at)
+
+# Surge endpoints; a zone is a location
+@app.get("/surge", response_model=SurgeSnapshotResponse)
+async def get_surge():
+    """Quoted multiplier for every location with surge activity; multipliers[i] is for location_ids[i]."""
+    location_ids = surge_engine.zone_ids()
+    return {'location_ids': location_ids,
+            'multipliers': [round(surge_engine.multiplier(location_id), 2) for location_id in location_ids]}
+
+@app.get("/surge/{location_id}", response_model=SurgeZoneResponse)
+async def get_location_surge(location_id: int):
+    zone = surge_engine.zone(location_id)
+    if zone is None:
+        # No requests or drivers seen there yet
+        return {'zone_id': location_id, 'multiplier': 1.0, 'target_multiplier': 1.0, 'open_requests': 0,
+                'available_drivers': 0, 'window_seconds': surge_engine.window_seconds}
+    return zone
+
+@app.post("/surge/events", response_model=SurgeZoneResponse)
+async def record_surge_event(event: SurgeEventCreate, db: IncentiveRepository = Depends(get_db)):
+    """Feed requests or driver availability seen outside trip creation (e.g. app pings) into the surge windows."""
+    _, unknown_locations = reference_ids.unknown(db, location_ids={event.location_id})
+    if unknown_locations:
+        raise HTTPException(status_code=404, detail=f"Location ID {event.location_id} not found")
+    if event.kind == 'request':
+        surge_engine.record_request(event.location_id, event.count)
+    else:
+        surge_engine.record_available_driver(event.location_id, event.count)
+    return surge_engine.zone(event.location_id)
+
 # Utility endpoints
 @app.get("/stats/driver-leaderboard", response_model=List[dict])
 async def get_driver_leaderboard(
     date_filter: date = Query(None, description="Date for stats (defaults to today)"),
     limit: int = 10,
-    db: Session = Depends(get_db)
+    db: IncentiveRepository = Depends(get_db)
 ):
     if date_filter is None:
         date_filter = date.today()
     
     # Get top drivers by coins earned for the specified date
-    driver_stats = db.query(
-        DriverDailyStat.driver_id,
-        Driver.name,
-        DriverDailyStat.coins_earned,
-        DriverDailyStat.distance_covered_today
-    ).join(
-        Driver, DriverDailyStat.driver_id == Driver.driver_id
-    ).filter(
-        DriverDailyStat.date == date_filter
-    ).order_by(
-        DriverDailyStat.coins_earned.desc()
-    ).limit(limit).all()
+    driver_stats = db.leaderboard(date_filter, limit)
     
     # Format the results
     result = []
@@ -1412,42 +1867,36 @@ async def get_driver_leaderboard(
     
     return result
 
+@app.get("/stats/live-leaderboard", response_model=List[dict])
+async def get_live_leaderboard(
+    date_filter: date = Query(None, description="Date for stats (defaults to today)"),
+    limit: int = 10
+):
+    """Leaderboard kept by the post-commit pipeline, without touching the database."""
+    return live_leaderboard.top((date_filter or date.today()).isoformat(), limit)
+
+@app.get("/stats/hourly-rollup", response_model=List[dict])
+async def get_hourly_rollup(date_filter: date = Query(None, description="Date for stats (defaults to today)")):
+    """Per-hour trip totals kept by the post-commit pipeline."""
+    return hourly_rollup.table((date_filter or date.today()).isoformat())
+
 @app.get("/stats/driver-earnings", response_model=dict)
 async def get_driver_earnings(
     driver_id: str,
     start_date: date = Query(..., description="Start date for the period"),
     end_date: date = Query(..., description="End date for the period"),
-    db: Session = Depends(get_db)
+    db: IncentiveRepository = Depends(get_db)
 ):
     # Check if driver exists
-    driver = db.query(Driver).filter(Driver.driver_id == driver_id).first()
+    driver = db.get_driver(driver_id)
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
     # Get daily stats for the period
-    daily_stats = db.query(
-        DriverDailyStat.date,
-        DriverDailyStat.coins_earned,
-        DriverDailyStat.distance_covered_today,
-        DriverDailyStat.hours_active
-    ).filter(
-        DriverDailyStat.driver_id == driver_id,
-        DriverDailyStat.date >= start_date,
-        DriverDailyStat.date <= end_date
-    ).all()
+    daily_stats = db.list_daily_stats(driver_id, start_date, end_date)
     
     # Get trip data for the period
-    trips = db.query(
-        Trip.trip_date,
-        Trip.base_fare,
-        Trip.final_fare,
-        Trip.multiplier_applied,
-        Trip.coins_earned
-    ).filter(
-        Trip.driver_id == driver_id,
-        Trip.trip_date >= start_date,
-        Trip.trip_date <= end_date
-    ).all()
+    trips = db.list_trips(driver_id, start_date, end_date)
     
     # Calculate totals
     total_coins = sum(stat.coins_earned for stat in daily_stats)
@@ -1500,12 +1949,31 @@ async def get_driver_earnings(
         "daily_earnings": daily_earnings
     }
 
+# Admin endpoints
+@app.get("/admin/incentive-config", response_model=dict)
+async def get_incentive_config():
+    return incentive_config.current.describe()
+
+@app.post("/admin/incentive-config/reload", response_model=dict)
+async def reload_incentive_config():
+    """Re-read the incentive config file and swap it in; the old config stays live if it is invalid."""
+    try:
+        config = incentive_config.reload()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Incentive config not reloaded: {e}")
+    return config.describe()
+
+@app.get("/admin/post-commit", response_model=dict)
+async def get_post_commit_stats():
+    """Queue depth, delivery counters and recent dead letters of the post-commit pipeline."""
+    return trip_pipeline.stats()
+
 # Run the app with uvicorn when executed directly
 if __name__ == "__main__":
     import uvicorn
     
-    # Create tables if they don't exist
-    Base.metadata.create_all(bind=engine)
+    # Create tables if they don't exist, and add columns missing from older ones
+    backend.create_schema()
     
     # Run the app
     uvicorn.run("namma_yatri_api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
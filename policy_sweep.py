@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from incentive_rules import MULTIPLIER_HOURS, MULTIPLIER_TIER_60, MULTIPLIER_TIER_100, params_from_dict
+from recompute_incentives import DRIVER_COLUMNS, build_timeline, coin_ledger, multiplier_tiers
+from data_generator import DEFAULT_SEED, LOCATION_CATEGORIES, generate_driver_data
+from request_stream import MINUTES_PER_DAY, intensity_matrix, iter_request_chunks, usual_traffic_intensity
+
+# City-days are generated once per (drivers, trips, seed) and reused across sweeps
+CACHE_DIR = ".sweep_cache"
+# Part of the cache key; bump when build_city_day's columns change
+CITY_DAY_VERSION = 2
+
+# Grid searched when no --grid file is given: "section.key" -> candidate values
+DEFAULT_GRID = {
+    'coin_system.streak_thresholds': [[3, 5, 10], [2, 4, 8], [4, 7, 12]],
+    'coin_system.daily_milestone_60_percent': [40, 50, 60],
+    'coin_system.daily_milestone_100_percent': [80, 100, 120],
+    'cancellation_penalties.penalty_multipliers': [[0.5, 1.0, 1.5], [0.25, 0.75, 1.25]]
+}
+
+CANCELLATION_REASONS = ['passenger_no_show', 'destination_too_far', 'traffic', 'emergency']
+
+def expand_grid(grid):
+    """Cartesian product of a grid as a list of params_from_dict overrides."""
+    keys = list(grid)
+    parameter_sets = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        overrides = {}
+        for key, value in zip(keys, values):
+            section, name = key.split('.', 1)
+            overrides.setdefault(section, {})[name] = value
+
+        # The 60% milestone has to stay below the 100% one
+        coins = overrides.get('coin_system', {})
+        if coins.get('daily_milestone_60_percent', 50) >= coins.get('daily_milestone_100_percent', 100):
+            continue
+        parameter_sets.append(overrides)
+    return parameter_sets
+
+def build_city_day(num_drivers=2000, trips_per_driver=12, seed=DEFAULT_SEED, day=None):
+    """One synthetic day of trips and cancellations as a timeline for the incentive rules.
+
+    Requests come from request_stream scaled to roughly `trips_per_driver` per
+    driver and are handed to random drivers; each driver cancels at their own
+    cancellation rate. Drivers use multipliers with probability equal to their
+    incentive_responsiveness, and the most responsive (> 0.8) hold out for the
+    100% tier instead of activating at 60%. Trips carry the usual traffic at
+    their pickup and hour as historical_traffic, like trips the API processed.
+    The day defaults to today.
+    """
+    rng = np.random.default_rng(seed)
+    day = day or date.today()
+    drivers = generate_driver_data(num_drivers, rng)
+
+    expected_requests = intensity_matrix(np.arange(MINUTES_PER_DAY))[0].sum()
+    scale = num_drivers * trips_per_driver / expected_requests
+    requests = pd.concat(iter_request_chunks(day, days=1, scale=scale, seed=seed), ignore_index=True)
+    n = len(requests)
+
+    driver_idx = rng.integers(0, num_drivers, n)
+    cancelled = rng.random(n) < drivers['cancellation_rate'].to_numpy()[driver_idx] / 100
+    peak = requests['time_of_day'].isin(['Morning', 'Evening']).to_numpy()
+    traffic_factor = np.where(peak, rng.uniform(0.7, 1.0, n), rng.uniform(0.4, 0.8, n))
+    distance = requests['estimated_trip_distance_km'].to_numpy()
+
+    events = pd.DataFrame({
+        'driver_id': drivers['driver_id'].to_numpy()[driver_idx],
+        'estimated_trip_distance_km': distance,
+        'distance_to_pickup_km': np.round(rng.gamma(2, 0.6, n), 2),
+        'traffic_factor': np.round(traffic_factor, 2),
+        'time_of_day': requests['time_of_day'],
+        'at_event': requests['at_event'],
+        'event_type': requests['event_type'].where(requests['at_event'], None),
+        'base_trip_fare': np.round(30 + distance * 15, 2),
+        'multiplier_applied': 1.0,
+        'historical_traffic': np.round(usual_traffic_intensity(
+            pd.Categorical(requests['pickup_location'], categories=LOCATION_CATEGORIES).codes,
+            requests['request_time'].dt.hour.to_numpy()), 2),
+        'created_at': requests['request_time'],
+        'time_since_accept_seconds': rng.integers(10, 400, n),
+        'reason': rng.choice(CANCELLATION_REASONS, n)
+    })
+
+    trips = events.loc[~cancelled].drop(columns=['time_since_accept_seconds', 'reason']).assign(trip_id='', trip_date=day)
+    cancellations = events.loc[cancelled, ['driver_id', 'time_since_accept_seconds', 'reason', 'created_at']] \
+        .assign(cancellation_date=day)
+
+    behaviour = drivers[DRIVER_COLUMNS].assign(
+        uses_multiplier=rng.random(num_drivers) < drivers['incentive_responsiveness'].to_numpy(),
+        waits_for_top_tier=drivers['incentive_responsiveness'].to_numpy() > 0.8
+    )
+    return build_timeline(trips, behaviour, cancellations)
+
+def cached_city_day(num_drivers, trips_per_driver, seed, cache_dir=CACHE_DIR, day=None):
+    """Path to the city-day Parquet for these inputs, generating it on first use."""
+    day = day or date.today()
+    key = hashlib.sha256(json.dumps([CITY_DAY_VERSION, num_drivers, trips_per_driver, seed,
+                                     day.isoformat()]).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"city_day_{key}.parquet")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        timeline = build_city_day(num_drivers, trips_per_driver, seed, day)
+        timeline.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+    return path
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+def evaluate_policy(timeline, params, coin_value=0.0):
+    """Replay the city-day under one parameter set and summarise the outcome."""
+    group = timeline['group'].to_numpy()
+    groups = int(group.max()) + 1 if len(group) else 0
+    is_trip = timeline['is_trip'].to_numpy()
+    created_at = timeline['created_at'].to_numpy().astype('datetime64[ns]').astype(np.int64)
+
+    earned, penalty, balance_before = coin_ledger(timeline, params)
+    balance_after = balance_before + earned - penalty
+
+    # Drivers activate once their balance reaches the tier they are waiting for
+    coins = params.coin_system
+    target = np.where(timeline['waits_for_top_tier'].to_numpy(),
+                      coins['daily_milestone_100_percent'], coins['daily_milestone_60_percent'])
+    eligible = is_trip & timeline['uses_multiplier'].to_numpy() & (balance_before >= target)
+    first = eligible & (pd.Series(eligible).groupby(group).cumsum().to_numpy() == 1)
+
+    activated_at = pd.Series(np.where(first, created_at, np.nan)).groupby(group).transform('first').to_numpy()
+    tier = pd.Series(np.where(first, multiplier_tiers(balance_before, params), np.nan)).groupby(group) \
+        .transform('first').to_numpy()
+    window = MULTIPLIER_HOURS * 3600 * 10**9
+    active = is_trip & (created_at >= activated_at) & (created_at < activated_at + window)
+    multiplier = np.where(active, tier, 1.0)
+
+    base_fare = np.where(is_trip, timeline['base_trip_fare'].to_numpy(), 0.0)
+    final_fare = base_fare * multiplier
+
+    # One day, so each group is one driver
+    net_coins = np.bincount(group, weights=earned - penalty, minlength=groups)
+    fares = np.bincount(group, weights=final_fare, minlength=groups)
+    peak_balance = pd.Series(balance_after).groupby(group).max().to_numpy()
+    driver_tier = pd.Series(tier).groupby(group).first().fillna(0).to_numpy()
+
+    coins_total = float(net_coins.sum())
+    multiplier_cost = float((final_fare - base_fare).sum())
+    return {
+        'drivers': groups,
+        'trips': int(is_trip.sum()),
+        'coins_total': coins_total,
+        'coins_mean': float(net_coins.mean()) if groups else 0.0,
+        'coins_p10': _percentile(net_coins, 10),
+        'coins_p50': _percentile(net_coins, 50),
+        'coins_p90': _percentile(net_coins, 90),
+        'penalty_coins': float(penalty.sum()),
+        'reached_60_pct': float((peak_balance >= coins['daily_milestone_60_percent']).mean()) if groups else 0.0,
+        'reached_100_pct': float((peak_balance >= coins['daily_milestone_100_percent']).mean()) if groups else 0.0,
+        'multiplier_uptake': float((driver_tier > 0).mean()) if groups else 0.0,
+        'uptake_1_25x': float((driver_tier == MULTIPLIER_TIER_60).mean()) if groups else 0.0,
+        'uptake_1_5x': float((driver_tier == MULTIPLIER_TIER_100).mean()) if groups else 0.0,
+        'earnings_mean': float(fares.mean()) if groups else 0.0,
+        'earnings_p10': _percentile(fares, 10),
+        'earnings_p50': _percentile(fares, 50),
+        'multiplier_cost': multiplier_cost,
+        'platform_cost': multiplier_cost + coins_total * coin_value
+    }
+
+_SWEEP_TIMELINE = {}
+
+def _init_sweep_worker(timeline_path):
+    """Process-pool initializer: load the shared city-day once per worker."""
+    _SWEEP_TIMELINE['timeline'] = pd.read_parquet(timeline_path)
+
+def _evaluate_task(task):
+    index, overrides, coin_value = task
+    params = params_from_dict(overrides, version=f"sweep-{index}")
+    result = evaluate_policy(_SWEEP_TIMELINE['timeline'], params, coin_value)
+    return {'param_set': index, 'overrides': json.dumps(overrides, sort_keys=True), **result}
+
+def run_sweep(parameter_sets, num_drivers=2000, trips_per_driver=12, seed=DEFAULT_SEED, workers=None,
+              coin_value=0.0, cache_dir=CACHE_DIR, day=None):
+    """Evaluate every parameter set against the same cached city-day across a process pool."""
+    timeline_path = cached_city_day(num_drivers, trips_per_driver, seed, cache_dir, day)
+    tasks = [(index, overrides, coin_value) for index, overrides in enumerate(parameter_sets)]
+
+    if workers == 1:
+        _init_sweep_worker(timeline_path)
+        try:
+            rows = [_evaluate_task(task) for task in tasks]
+        finally:
+            _SWEEP_TIMELINE.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker,
+                                 initargs=(timeline_path,)) as pool:
+            rows = list(pool.map(_evaluate_task, tasks))
+
+    return pd.DataFrame(rows)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sweep incentive parameters over a synthetic city-day.")
+    parser.add_argument("--grid", default=None,
+                        help='JSON grid of "section.key": [values]; defaults to a built-in tier/streak/penalty grid')
+    parser.add_argument("--drivers", type=int, default=2000, help="Drivers in the city-day")
+    parser.add_argument("--trips-per-driver", type=int, default=12, help="Average requests per driver")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the city-day")
+    parser.add_argument("--day", type=date.fromisoformat, default=None,
+                        help="Date of the city-day, YYYY-MM-DD (default: today); part of the cache key")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--coin-value", type=float, default=0.0,
+                        help="Rupee cost per coin added to the multiplier cost in platform_cost")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Where generated city-days are cached")
+    parser.add_argument("--output", default="policy_sweep_results.csv", help="Results table")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    parameter_sets = expand_grid(grid)
+
+    print(f"Sweeping {len(parameter_sets)} parameter sets over {args.drivers:,} drivers...")
+    start = time.perf_counter()
+    results = run_sweep(parameter_sets, args.drivers, args.trips_per_driver, args.seed, args.workers,
+                        args.coin_value, args.cache_dir, args.day)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+    results.to_csv(args.output, index=False)
+    columns = ['param_set', 'coins_mean', 'coins_p50', 'multiplier_uptake', 'earnings_mean', 'platform_cost', 'overrides']
+    print(results.sort_values('platform_cost')[columns].head(10).to_string(index=False))
+    print(f"\nFull results saved to {args.output}")
@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import incentive_rules
+from incentive_rules import DEFAULT_PARAMS, MULTIPLIER_TIER_60, MULTIPLIER_TIER_100
+
+# Columns the recompute reads from each table
+TRIP_COLUMNS = ['trip_id', 'driver_id', 'estimated_trip_distance_km', 'distance_to_pickup_km', 'traffic_factor',
+                'time_of_day', 'at_event', 'event_type', 'base_trip_fare', 'multiplier_applied', 'trip_date', 'created_at']
+# Stored on trips processed by the API; older exports go without and count no historical traffic
+OPTIONAL_TRIP_COLUMNS = ['historical_traffic']
+CANCELLATION_COLUMNS = ['driver_id', 'time_since_accept_seconds', 'reason', 'cancellation_date', 'created_at']
+DRIVER_COLUMNS = ['driver_id', 'daily_avg_distance_km', 'ride_acceptance_rate', 'cancellation_rate']
+
+def _read_table(path, columns, optional_columns=()):
+    """Read a CSV or Parquet export, keeping only the columns the recompute needs.
+
+    `optional_columns` are read when the export has them.
+    """
+    if path.endswith('.parquet') or os.path.isdir(path):
+        import pyarrow.parquet as pq
+        available = set(pq.ParquetDataset(path).schema.names)
+        return pd.read_parquet(path, columns=columns + [c for c in optional_columns if c in available])
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, usecols=columns + [c for c in optional_columns if c in header])
+
+def load_history(trips_path, drivers_path, cancellations_path=None):
+    """Load historical trips, drivers and (optionally) cancellations from CSV/Parquet exports."""
+    trips = _read_table(trips_path, TRIP_COLUMNS, OPTIONAL_TRIP_COLUMNS)
+    drivers = _read_table(drivers_path, DRIVER_COLUMNS)
+    cancellations = (_read_table(cancellations_path, CANCELLATION_COLUMNS) if cancellations_path
+                     else pd.DataFrame(columns=CANCELLATION_COLUMNS))
+    return trips, drivers, cancellations
+
+def load_history_from_database(database_url):
+    """Load the same three tables straight from the API's database."""
+    from sqlalchemy import create_engine
+
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        trips = pd.read_sql_table('trips', connection, columns=TRIP_COLUMNS + OPTIONAL_TRIP_COLUMNS)
+        drivers = pd.read_sql_table('drivers', connection, columns=DRIVER_COLUMNS)
+        cancellations = pd.read_sql_table('cancellations', connection, columns=CANCELLATION_COLUMNS)
+    return trips, drivers, cancellations
+
+def synthetic_history(num_drivers=2000, days=30, trips_per_day=12, cancel_rate=0.08, seed=42):
+    """Random months of trips and cancellations, for benchmarking without an export."""
+    rng = np.random.default_rng(seed)
+    driver_ids = np.array([f"D{i:05d}" for i in range(num_drivers)])
+    drivers = pd.DataFrame({
+        'driver_id': driver_ids,
+        'daily_avg_distance_km': np.round(rng.normal(80, 20, num_drivers).clip(40, 150), 1),
+        'ride_acceptance_rate': np.round(rng.uniform(70, 100, num_drivers), 1),
+        'cancellation_rate': np.round(rng.uniform(0, 15, num_drivers), 1)
+    })
+
+    count = num_drivers * days * trips_per_day
+    start = pd.Timestamp.now().normalize() - pd.Timedelta(days=days)
+    day_offsets = rng.integers(0, days, count)
+    created_at = start + pd.to_timedelta(day_offsets, unit='D') + pd.to_timedelta(rng.integers(6 * 3600, 23 * 3600, count), unit='s')
+    distance = np.round(rng.gamma(2, 3, count) + 1, 1)
+    hours = created_at.hour
+    at_event = rng.random(count) < 0.05
+
+    trips = pd.DataFrame({
+        'trip_id': np.arange(count).astype(str),
+        'driver_id': driver_ids[rng.integers(0, num_drivers, count)],
+        'estimated_trip_distance_km': distance,
+        'distance_to_pickup_km': np.round(rng.gamma(2, 0.6, count), 2),
+        'traffic_factor': np.round(rng.uniform(0.4, 1.0, count), 2),
+        'time_of_day': np.select([hours < 12, hours < 17, hours < 21], ['Morning', 'Afternoon', 'Evening'], 'Night'),
+        'at_event': at_event,
+        'event_type': np.where(at_event, rng.choice(['Concert', 'Sports', 'Festival'], count), None),
+        'base_trip_fare': np.round(30 + distance * 15, 2),
+        # Roughly a fifth of trips were taken with a multiplier running
+        'multiplier_applied': np.where(rng.random(count) < 0.2, rng.choice([MULTIPLIER_TIER_60, MULTIPLIER_TIER_100], count), 1.0),
+        # Usual traffic at the pickup, missing where a location had no readings yet
+        'historical_traffic': np.where(rng.random(count) < 0.1, np.nan, np.round(rng.uniform(0.2, 0.95, count), 2)),
+        'trip_date': created_at.date,
+        'created_at': created_at
+    })
+
+    cancel_count = int(count * cancel_rate)
+    cancel_created = start + pd.to_timedelta(rng.integers(0, days, cancel_count), unit='D') + \
+        pd.to_timedelta(rng.integers(6 * 3600, 23 * 3600, cancel_count), unit='s')
+    cancellations = pd.DataFrame({
+        'driver_id': driver_ids[rng.integers(0, num_drivers, cancel_count)],
+        'time_since_accept_seconds': rng.integers(10, 400, cancel_count),
+        'reason': rng.choice(['passenger_no_show', 'destination_too_far', 'traffic', 'emergency'], cancel_count),
+        'cancellation_date': cancel_created.date,
+        'created_at': cancel_created
+    })
+    return trips, drivers, cancellations
+
+def build_timeline(trips, drivers, cancellations):
+    """One row per trip or cancellation, ordered within each driver-day.
+
+    Everything that does not depend on the parameters (driver attributes,
+    streak counts, day groups) is computed here once and shared by every
+    parameter set evaluated against the same history.
+    """
+    trips = trips.assign(kind='trip', day=pd.to_datetime(trips['trip_date']))
+    cancellations = cancellations.assign(kind='cancellation', day=pd.to_datetime(cancellations['cancellation_date']))
+    timeline = pd.concat([trips, cancellations.drop(columns='cancellation_date')], ignore_index=True)
+    timeline = timeline.drop(columns='trip_date').merge(drivers, on='driver_id', how='inner')
+    timeline['created_at'] = pd.to_datetime(timeline['created_at'])
+    timeline = timeline.sort_values(['driver_id', 'day', 'created_at'], kind='stable').reset_index(drop=True)
+
+    timeline['group'] = timeline.groupby(['driver_id', 'day'], sort=False).ngroup()
+    is_trip = (timeline['kind'] == 'trip').to_numpy()
+    timeline['is_trip'] = is_trip
+
+    # Streaks count trips only and restart every day (a new daily stats row)
+    timeline['consecutive_trips'] = pd.Series(is_trip.astype(np.int64)).groupby(timeline['group']).cumsum()
+
+    # The first trip a driver took with a multiplier marks when they activated it that day
+    multiplier_active = is_trip & (timeline['multiplier_applied'].fillna(1.0).to_numpy() > 1.0)
+    timeline['multiplier_active'] = multiplier_active
+    first_active = pd.Series(multiplier_active).groupby(timeline['group']).cumsum().to_numpy() == 1
+    timeline['activation'] = multiplier_active & first_active
+
+    for column in ['estimated_trip_distance_km', 'distance_to_pickup_km', 'traffic_factor', 'base_trip_fare']:
+        timeline[column] = timeline[column].fillna(0.0)
+    timeline['at_event'] = timeline['at_event'].fillna(False).astype(bool)
+    return timeline
+
+def cancellation_penalties_batch(timeline, params):
+    """Coins deducted per row (0 for trips and legitimate cancellations), before the zero floor."""
+    penalties = params.cancellation_penalties
+    seconds = timeline['time_since_accept_seconds'].fillna(0).to_numpy()
+
+    conditions = [seconds <= threshold for threshold in penalties['time_thresholds']]
+    time_multiplier = np.select(conditions, penalties['penalty_multipliers'], default=0.5)
+    penalty = penalties['standard_penalty'] * time_multiplier
+
+    buffer = params.forgiveness_buffer
+    forgiven = ((timeline['ride_acceptance_rate'].to_numpy() >= buffer['threshold_acceptance_rate']) &
+                (timeline['cancellation_rate'].to_numpy() <= buffer['threshold_cancellation_rate']))
+    penalty = penalty - np.where(forgiven, np.minimum(buffer['buffer_coins'], penalty), 0)
+    penalty = np.round(penalty)
+
+    legitimate = timeline['reason'].isin(penalties['legitimate_reasons']).to_numpy()
+    return np.where(~timeline['is_trip'].to_numpy() & ~legitimate, penalty, 0).astype(np.int64)
+
+def coin_ledger(timeline, params=DEFAULT_PARAMS):
+    """Per-row coins earned, penalty actually deducted, and the balance just before the row."""
+    is_trip = timeline['is_trip'].to_numpy()
+    group = timeline['group'].to_numpy()
+
+    trip_coins = incentive_rules.calculate_trip_coins_batch(
+        timeline['daily_avg_distance_km'], timeline['estimated_trip_distance_km'], timeline['traffic_factor'],
+        timeline['time_of_day'], timeline['at_event'], timeline['event_type'], params,
+        timeline['historical_traffic'] if 'historical_traffic' in timeline else None
+    )
+    streak = incentive_rules.streak_bonus_batch(timeline['consecutive_trips'], params)
+    earned = np.where(is_trip, trip_coins + streak, 0)
+    penalty = cancellation_penalties_batch(timeline, params)
+
+    # Running balance with the API's max(0, coins - penalty) floor:
+    # B_t = S_t - min(0, min_{s<=t} S_s) for the plain running sum S
+    running = pd.Series(earned - penalty).groupby(group).cumsum()
+    running_min = running.groupby(group).cummin().to_numpy()
+    balance = pd.Series(running.to_numpy() - np.minimum(0, running_min))
+    balance_before = balance.groupby(group).shift(1, fill_value=0).to_numpy()
+    applied_penalty = np.minimum(penalty, np.where(penalty > 0, balance_before, 0))
+    return earned, applied_penalty, balance_before
+
+def multiplier_tiers(balance, params=DEFAULT_PARAMS):
+    """Multiplier each balance would unlock (1.0 below the 60% milestone)."""
+    coins = params.coin_system
+    return np.where(balance >= coins['daily_milestone_100_percent'], MULTIPLIER_TIER_100,
+                    np.where(balance >= coins['daily_milestone_60_percent'], MULTIPLIER_TIER_60, 1.0))
+
+def recompute(timeline, params=DEFAULT_PARAMS):
+    """Coins, penalties and fares for every timeline row under one parameter set."""
+    is_trip = timeline['is_trip'].to_numpy()
+    group = timeline['group'].to_numpy()
+    earned, applied_penalty, balance_before = coin_ledger(timeline, params)
+
+    # The multiplier tier is whatever the balance allowed when the driver activated it
+    tier = multiplier_tiers(balance_before, params)
+    activation_tier = pd.Series(np.where(timeline['activation'].to_numpy(), tier, np.nan)).groupby(group).transform('first')
+    multiplier = np.where(timeline['multiplier_active'].to_numpy(), activation_tier.fillna(1.0).to_numpy(), 1.0)
+
+    return pd.DataFrame({
+        'driver_id': timeline['driver_id'],
+        'is_trip': is_trip,
+        'coins_earned': earned,
+        'penalty_coins': applied_penalty,
+        'multiplier': multiplier,
+        'final_fare': np.where(is_trip, timeline['base_trip_fare'].to_numpy() * multiplier, 0.0)
+    })
+
+def driver_totals(result):
+    """Per-driver coins, penalties, fares and trip counts from a recompute result."""
+    return result.groupby('driver_id').agg(
+        trips=('is_trip', 'sum'),
+        coins_earned=('coins_earned', 'sum'),
+        penalty_coins=('penalty_coins', 'sum'),
+        final_fare=('final_fare', 'sum')
+    )
+
+def compare_params(timeline, old_params, new_params):
+    """Per-driver totals under both parameter sets with new-minus-old deltas."""
+    old = driver_totals(recompute(timeline, old_params))
+    new = driver_totals(recompute(timeline, new_params))
+
+    report = old[['trips']].copy()
+    for column in ['coins_earned', 'penalty_coins', 'final_fare']:
+        report[f'old_{column}'] = old[column]
+        report[f'new_{column}'] = new[column]
+        report[f'delta_{column}'] = new[column] - old[column]
+    report['old_net_coins'] = old['coins_earned'] - old['penalty_coins']
+    report['new_net_coins'] = new['coins_earned'] - new['penalty_coins']
+    report['delta_net_coins'] = report['new_net_coins'] - report['old_net_coins']
+    return report.reset_index()
+
+def load_params(path):
+    """Parameter overrides from a JSON file; None means the defaults."""
+    if path is None:
+        return DEFAULT_PARAMS
+    with open(path) as f:
+        return incentive_rules.params_from_dict(json.load(f))
+
+def print_summary(report, seconds, rows):
+    print(f"Recomputed {rows:,} trips/cancellations for {len(report):,} drivers in {seconds:.2f}s")
+    print(f"Net coins:  {report['old_net_coins'].sum():,} -> {report['new_net_coins'].sum():,} "
+          f"({report['delta_net_coins'].sum():+,})")
+    print(f"Final fare: {report['old_final_fare'].sum():,.2f} -> {report['new_final_fare'].sum():,.2f} "
+          f"({report['delta_final_fare'].sum():+,.2f})")
+    print(f"Drivers better off: {(report['delta_net_coins'] > 0).sum():,}, "
+          f"worse off: {(report['delta_net_coins'] < 0).sum():,}")
+    print("\nLargest coin changes:")
+    print(report.reindex(report['delta_net_coins'].abs().sort_values(ascending=False).index)
+          .head(10).to_string(index=False))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute historical coins and fares under new incentive parameters.")
+    parser.add_argument("--new-params", required=True, help="JSON file of parameter overrides to evaluate")
+    parser.add_argument("--old-params", default=None, help="JSON overrides for the baseline (defaults if omitted)")
+    parser.add_argument("--database-url", default=None, help="Read trips/drivers/cancellations from this database")
+    parser.add_argument("--trips", default=None, help="Trips export (CSV/Parquet)")
+    parser.add_argument("--drivers", default=None, help="Drivers export (CSV/Parquet)")
+    parser.add_argument("--cancellations", default=None, help="Cancellations export (CSV/Parquet)")
+    parser.add_argument("--synthetic-drivers", type=int, default=2000,
+                        help="Drivers in the synthetic history used when no data source is given")
+    parser.add_argument("--synthetic-days", type=int, default=30, help="Days of synthetic history")
+    parser.add_argument("--output", default="incentive_deltas.csv", help="Per-driver delta report")
+    args = parser.parse_args()
+
+    if args.database_url:
+        trips, drivers, cancellations = load_history_from_database(args.database_url)
+    elif args.trips and args.drivers:
+        trips, drivers, cancellations = load_history(args.trips, args.drivers, args.cancellations)
+    else:
+        print("No data source given; using synthetic history")
+        trips, drivers, cancellations = synthetic_history(args.synthetic_drivers, args.synthetic_days)
+
+    start = time.perf_counter()
+    timeline = build_timeline(trips, drivers, cancellations)
+    report = compare_params(timeline, load_params(args.old_params), load_params(args.new_params))
+    seconds = time.perf_counter() - start
+
+    print_summary(report, seconds, len(timeline))
+    report.to_csv(args.output, index=False)
+    print(f"\nPer-driver deltas saved to {args.output}")
@@ -0,0 +1,201 @@
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Drivers without a trip created in this long are idle
+IDLE_MINUTES = 15
+# Recommendations are recomputed for every idle driver this often
+REFRESH_SECONDS = 60
+# Targets further than this are never recommended
+MAX_REPOSITION_KM = 6.0
+# Demand given up per km driven to get there
+DISTANCE_WEIGHT = 0.5
+# City driving speed used to pick which forecast horizon a driver would arrive in
+AVERAGE_SPEED_KMH = 20.0
+EARTH_RADIUS_KM = 6371
+
+def distance_matrix(latitudes, longitudes):
+    """Pairwise haversine distances in km between points given as degree arrays."""
+    lat, lon = np.radians(latitudes), np.radians(longitudes)
+    dlat = lat[None, :] - lat[:, None]
+    dlon = lon[None, :] - lon[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def assign_targets(distances, forecast, origins, horizons_minutes, distance_weight=DISTANCE_WEIGHT,
+                   max_km=MAX_REPOSITION_KM, speed_kmh=AVERAGE_SPEED_KMH):
+    """Target location for each idle driver, given as an array of origin rows.
+
+    Scores forecast demand at the target, at the horizon the driver would
+    arrive in, minus the idle drivers there, minus distance_weight per km.
+    Drivers are assigned one at a time and each one counts as supply at
+    their target from then on, so a batch fills a target's demand instead
+    of sending everyone at a location to the same place. A driver staying
+    put doesn't compete with themselves. Returns (target, score,
+    eta_minutes, expected_demand) arrays indexed like `origins`, and the
+    supply per location once every driver has moved.
+    """
+    locations = len(distances)
+    eta = distances / speed_kmh * 60
+    horizon = np.minimum(np.searchsorted(np.asarray(horizons_minutes), eta), len(horizons_minutes) - 1)
+    expected = forecast[np.arange(locations)[None, :], horizon]
+
+    # Per origin, the score of each target before supply is taken off
+    base = expected - distance_weight * distances
+    base[distances > max_km] = -np.inf
+
+    supply = np.bincount(origins, minlength=locations).astype(float)
+    target = np.empty(len(origins), dtype=int)
+    score = np.empty(len(origins))
+    for index, origin in enumerate(origins.tolist()):
+        # Out of the origin's supply while scoring, back into the chosen target's
+        supply[origin] -= 1
+        scores = base[origin] - supply
+        best = int(np.argmax(scores))
+        supply[best] += 1
+        target[index], score[index] = best, scores[best]
+    return target, score, eta[origins, target], expected[origins, target], supply.astype(int)
+
+class RepositioningRecommender:
+    """Where each idle driver should head next, recomputed for all of them every REFRESH_SECONDS.
+
+    A driver is idle without a trip created in the last IDLE_MINUTES and
+    outside go-home mode. A refresh scores each driver's origin row against
+    the cached distance matrix, which is only rebuilt when locations change,
+    and counts every assigned driver as supply at their target for the rest
+    of the batch. recommendation() is then a dict lookup. Nothing is
+    recommended until the forecaster has produced its first snapshot.
+    """
+
+    def __init__(self, forecaster, refresh_seconds=REFRESH_SECONDS, idle_minutes=IDLE_MINUTES):
+        self.forecaster = forecaster
+        self.refresh_seconds = refresh_seconds
+        self.idle_minutes = idle_minutes
+        self._lock = threading.Lock()
+        self._distance_ids = None
+        self._distances = None
+        # (driver_id -> recommendation, generated_at)
+        self._snapshot = ({}, None)
+        self.refresh_seconds_taken = None
+
+    @property
+    def generated_at(self):
+        return self._snapshot[1]
+
+    def due(self):
+        return self.generated_at is None or (datetime.now() - self.generated_at).total_seconds() >= self.refresh_seconds
+
+    def _distance_matrix(self, locations):
+        location_ids = [location.location_id for location in locations]
+        if location_ids != self._distance_ids:
+            self._distances = distance_matrix(np.array([location.latitude for location in locations]),
+                                              np.array([location.longitude for location in locations]))
+            self._distance_ids = location_ids
+        return self._distances
+
+    def refresh(self, db, force=False):
+        """Recompute every idle driver's recommendation; a no-op within refresh_seconds unless forced.
+
+        Also a no-op until the forecaster has a snapshot, which would otherwise
+        forecast no demand anywhere.
+        """
+        if self.forecaster.generated_at is None or (not force and not self.due()):
+            return False
+
+        with self._lock:
+            started = time.perf_counter()
+            now = datetime.now()
+            locations = sorted(db.list_locations(), key=lambda location: location.location_id)
+            rows = {location.location_id: row for row, location in enumerate(locations)}
+            distances = self._distance_matrix(locations)
+
+            # Forecast rows in this refresh's location order; locations without one forecast nothing
+            forecast_ids, table, _ = self.forecaster.snapshot()
+            forecast = np.zeros((len(locations), len(self.forecaster.horizons_minutes)))
+            for forecast_row, location_id in enumerate(forecast_ids.tolist()):
+                if location_id in rows:
+                    forecast[rows[location_id]] = table[forecast_row]
+
+            busy = db.driver_ids_with_trips_since(now - timedelta(minutes=self.idle_minutes))
+            busy |= {stats.driver_id for stats in db.list_daily_stats_for_date(now.date()) if stats.go_home_mode_active}
+            driver_origins = {
+                driver.driver_id: rows[driver.current_location_id]
+                for driver in db.list_drivers()
+                if driver.driver_id not in busy and driver.current_location_id in rows
+            }
+            origins = np.fromiter(driver_origins.values(), dtype=int, count=len(driver_origins))
+            target, score, eta, expected, supply = assign_targets(distances, forecast, origins,
+                                                                  self.forecaster.horizons_minutes)
+
+            recommendations = {}
+            for index, (driver_id, origin) in enumerate(driver_origins.items()):
+                best = int(target[index])
+                recommendations[driver_id] = {
+                    'current_location_id': locations[origin].location_id,
+                    'target_location_id': locations[best].location_id,
+                    'target_location_name': locations[best].location_name,
+                    'stay': best == origin,
+                    'distance_km': round(float(distances[origin, best]), 2),
+                    'eta_minutes': round(float(eta[index]), 1),
+                    'forecast_demand': round(float(expected[index]), 2),
+                    # Once this batch's drivers have moved, themselves included
+                    'idle_drivers_at_target': int(supply[best]),
+                    'score': round(float(score[index]), 2)
+                }
+            self._snapshot = (recommendations, now)
+            self.refresh_seconds_taken = time.perf_counter() - started
+        return True
+
+    def recommendation(self, driver_id):
+        """The cached recommendation for an idle driver, or None if they weren't idle at the last refresh."""
+        recommendations, generated_at = self._snapshot
+        recommendation = recommendations.get(driver_id)
+        if recommendation is None:
+            return None
+        return {'driver_id': driver_id, 'generated_at': generated_at, **recommendation}
+
+def run_benchmark(locations=500, drivers=5000, seed=42):
+    """Time the distance matrix build and one batch of recommendations for `drivers` idle drivers."""
+    rng = np.random.default_rng(seed)
+    # Points spread over roughly the size of Bengaluru
+    latitudes = rng.uniform(12.85, 13.10, locations)
+    longitudes = rng.uniform(77.50, 77.75, locations)
+    horizons = (15, 30, 45, 60)
+    # Demand per location on the order of its share of idle drivers
+    forecast = rng.gamma(2.0, drivers / locations / 2, (locations, len(horizons)))
+    origins = rng.integers(0, locations, drivers)
+
+    started = time.perf_counter()
+    distances = distance_matrix(latitudes, longitudes)
+    matrix_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    per_driver, _, _, _, _ = assign_targets(distances, forecast, origins, horizons)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        'locations': locations,
+        'drivers': drivers,
+        'matrix_seconds': matrix_seconds,
+        'batch_seconds': batch_seconds,
+        'moving': int(np.sum(per_driver != origins)),
+        'mean_move_km': float(distances[origins, per_driver][per_driver != origins].mean())
+        if np.any(per_driver != origins) else 0.0
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark batch repositioning recommendations.")
+    parser.add_argument("--locations", type=int, default=500, help="Candidate locations")
+    parser.add_argument("--drivers", type=int, default=5000, help="Idle drivers")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for locations, forecasts and drivers")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = run_benchmark(args.locations, args.drivers, args.seed)
+    print(f"Distance matrix for {result['locations']} locations: {result['matrix_seconds'] * 1000:.1f} ms")
+    print(f"Recommendations for {result['drivers']:,} idle drivers: {result['batch_seconds'] * 1000:.1f} ms, "
+          f"{result['moving']:,} told to move (mean {result['mean_move_km']:.2f} km)")
@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from data_generator import (
+    BENGALURU_LOCATIONS,
+    LOCATION_CATEGORIES,
+    LOCATION_LATS,
+    LOCATION_LONGS,
+    DEFAULT_SEED,
+    EVENT_TYPE_CATEGORIES,
+    HEAVY_TRAFFIC_LOCATIONS,
+    URGENCY_CATEGORIES,
+    generate_uuids,
+    draw_location_idx,
+    jitter_locations,
+    get_time_of_day_array,
+    to_columnar
+)
+
+# Approximate center of Bengaluru, same reference point as generate_heatmap_data
+CENTER_LAT, CENTER_LONG = 12.9716, 77.5946
+
+# Hourly demand shape: (start_hour, end_hour, factor). Hours not covered are 1.0.
+PEAK_WINDOWS = [
+    (0, 5, 0.3),    # Late night lull
+    (8, 10, 2.0),   # Morning peak
+    (17, 20, 2.0)   # Evening peak
+]
+
+# Scheduled events boost demand at one location for a window of hours
+DEFAULT_EVENTS = [
+    {'location': 'Shivajinagar', 'event_type': 'Sports', 'start_hour': 18, 'end_hour': 23, 'boost': 3.0},
+    {'location': 'Hebbal', 'event_type': 'Concert', 'start_hour': 19, 'end_hour': 23, 'boost': 2.5},
+    {'location': 'Basavanagudi', 'event_type': 'Festival', 'start_hour': 10, 'end_hour': 21, 'boost': 1.8}
+]
+
+MINUTES_PER_DAY = 24 * 60
+
+def distance_from_center():
+    """Approximate km from the centre of Bengaluru to each location."""
+    return np.sqrt(((LOCATION_LATS - CENTER_LAT) * 111)**2 +
+                   ((LOCATION_LONGS - CENTER_LONG) * 111 * np.cos(np.radians(13)))**2)
+
+def base_hourly_rates():
+    """Requests per hour at each location before time-of-day shaping.
+
+    Uses the same distance-from-centre decay as generate_heatmap_data, so the
+    centre sees ~50 requests/hour and the outskirts bottom out at 10.
+    """
+    return np.maximum(10, 50 - distance_from_center() * 5)
+
+def usual_traffic_intensity(location_idx, hours):
+    """Expected traffic intensity (0-1) at locations and hours of day, given as index/hour arrays.
+
+    The mean of generate_heatmap_data's readings: a 0.45 base, up to 0.3
+    more near the centre, 0.3 more in the morning and evening peaks and
+    0.2 more at the known bottlenecks.
+    """
+    center_factor = np.maximum(0, 1 - distance_from_center() / 20)
+    heavy = np.isin(LOCATION_CATEGORIES, HEAVY_TRAFFIC_LOCATIONS)
+    hours = np.asarray(hours)
+    peak = ((hours >= 8) & (hours < 10)) | ((hours >= 17) & (hours < 20))
+    intensity = 0.45 + center_factor[location_idx] * 0.3 + np.where(peak, 0.3, 0.0)
+    return np.minimum(0.95, np.minimum(0.95, intensity) + np.where(heavy[location_idx], 0.2, 0.0))
+
+def time_profile(minutes):
+    """Peak-window multiplier for each minute-of-day in `minutes`."""
+    hours = minutes / 60
+    profile = np.ones(len(minutes))
+    for start_hour, end_hour, factor in PEAK_WINDOWS:
+        profile[(hours >= start_hour) & (hours < end_hour)] = factor
+    return profile
+
+def event_boosts(minutes, events):
+    """Per-location, per-minute event multipliers and the event type active in each cell."""
+    boosts = np.ones((len(LOCATION_CATEGORIES), len(minutes)))
+    event_types = np.full((len(LOCATION_CATEGORIES), len(minutes)), 'None', dtype=object)
+    hours = minutes / 60
+
+    for event in events:
+        location_idx = LOCATION_CATEGORIES.index(event['location'])
+        active = (hours >= event['start_hour']) & (hours < event['end_hour'])
+        boosts[location_idx, active] *= event['boost']
+        event_types[location_idx, active] = event['event_type']
+
+    return boosts, event_types
+
+def intensity_matrix(minutes, events=None, scale=1.0):
+    """Expected requests per minute, shape (locations, minutes).
+
+    The arrival process is a non-homogeneous Poisson process per location whose
+    rate is piecewise constant per minute, so sampling Poisson counts per cell
+    is exact.
+    """
+    events = DEFAULT_EVENTS if events is None else events
+    boosts, event_types = event_boosts(minutes, events)
+    per_minute = base_hourly_rates()[:, None] / 60
+    return per_minute * time_profile(minutes)[None, :] * boosts * scale, event_types
+
+def generate_request_chunk(day_start, minute_from, minute_to, rng, events=None, scale=1.0):
+    """Sample all requests between two minutes of one day, sorted by request time."""
+    minutes = np.arange(minute_from, minute_to)
+    intensity, event_types = intensity_matrix(minutes, events, scale)
+    counts = rng.poisson(intensity)
+
+    # Expand cell counts into one row per request
+    location_grid, minute_grid = np.nonzero(counts)
+    repeats = counts[location_grid, minute_grid]
+    pickup_idx = np.repeat(location_grid, repeats)
+    minute_idx = np.repeat(minute_grid, repeats)
+    event_type = np.repeat(event_types[location_grid, minute_grid], repeats)
+    n = len(pickup_idx)
+
+    offsets = (minutes[minute_idx] * 60 + rng.uniform(0, 60, n)).astype('timedelta64[s]')
+    order = np.argsort(offsets, kind='stable')
+    pickup_idx, event_type, offsets = pickup_idx[order], event_type[order], offsets[order]
+    request_time = pd.Timestamp(day_start) + pd.to_timedelta(offsets)
+
+    pickup_lat, pickup_long, pickup_location = jitter_locations(pickup_idx, rng)
+    destination_idx = draw_location_idx(n, rng, exclude_idx=pickup_idx)
+    destination_lat, destination_long, destination_location = jitter_locations(destination_idx, rng)
+
+    lat_diff = destination_lat - pickup_lat
+    long_diff = destination_long - pickup_long
+    trip_distance = np.sqrt((lat_diff * 111)**2 + (long_diff * 111 * np.cos(np.radians(13)))**2)
+
+    return pd.DataFrame({
+        'request_id': generate_uuids(n, rng),
+        'passenger_id': generate_uuids(n, rng),
+        'request_time': request_time,
+        'pickup_location': pickup_location,
+        'pickup_latitude': pickup_lat,
+        'pickup_longitude': pickup_long,
+        'destination_location': destination_location,
+        'destination_latitude': destination_lat,
+        'destination_longitude': destination_long,
+        'estimated_trip_distance_km': np.round(trip_distance, 2),
+        'trip_urgency': rng.choice(URGENCY_CATEGORIES, size=n, p=[0.2, 0.5, 0.3]),
+        'time_of_day': get_time_of_day_array(request_time.hour.to_numpy()),
+        'at_event': event_type != 'None',
+        'event_type': event_type,
+        'tip_amount': rng.choice([0, 10, 20, 30, 50], size=n, p=[0.6, 0.2, 0.1, 0.05, 0.05])
+    })
+
+def iter_request_chunks(start_date, days=1, scale=1.0, events=None, seed=DEFAULT_SEED, chunk_minutes=60):
+    """Yield time-ordered request DataFrames, one per `chunk_minutes` of simulated time."""
+    rng = np.random.default_rng(seed)
+    day_start = datetime.combine(start_date, datetime.min.time())
+
+    for day in range(days):
+        current_day = day_start + timedelta(days=day)
+        for minute_from in range(0, MINUTES_PER_DAY, chunk_minutes):
+            minute_to = min(minute_from + chunk_minutes, MINUTES_PER_DAY)
+            yield generate_request_chunk(current_day, minute_from, minute_to, rng, events, scale)
+
+def write_request_stream(path, start_date, days=1, scale=1.0, events=None, seed=DEFAULT_SEED, file_format='jsonl'):
+    """Write a request stream to JSONL or Parquet, one hour of requests at a time."""
+    if file_format not in ('jsonl', 'parquet'):
+        raise ValueError(f"Unsupported request stream format '{file_format}'")
+
+    if file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    out = open(path, 'w') if file_format == 'jsonl' else None
+    parquet_writer = None
+    written = 0
+    started_at = time.perf_counter()
+
+    try:
+        for chunk in iter_request_chunks(start_date, days, scale, events, seed):
+            if chunk.empty:
+                continue
+
+            if file_format == 'jsonl':
+                chunk.to_json(out, orient='records', lines=True, date_format='iso')
+            else:
+                table = pa.Table.from_pandas(to_columnar(chunk, 'requests'), preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(path, table.schema)
+                parquet_writer.write_table(table)
+
+            written += len(chunk)
+            sys.stderr.write(f"\r{written:,} requests up to {chunk['request_time'].iloc[-1]}")
+            sys.stderr.flush()
+    finally:
+        if out is not None:
+            out.close()
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    sys.stderr.write("\n")
+    print(f"Wrote {written:,} requests to {path} in {time.perf_counter() - started_at:.1f}s")
+    return written
+
+def load_request_stream(path, columns=None):
+    """Load a stream written by write_request_stream, ordered by request_time."""
+    if path.endswith('.parquet'):
+        requests_df = pd.read_parquet(path, engine='pyarrow', columns=columns)
+    else:
+        requests_df = pd.read_json(path, lines=True, convert_dates=['request_time'])
+        if columns is not None:
+            requests_df = requests_df[columns]
+
+    if 'request_time' in requests_df.columns:
+        requests_df = requests_df.sort_values('request_time', kind='stable', ignore_index=True)
+    return requests_df
+
+def parse_event(value):
+    """Parse a --event argument of the form location,event_type,start_hour,end_hour,boost."""
+    location, event_type, start_hour, end_hour, boost = value.split(',')
+    if location not in BENGALURU_LOCATIONS:
+        raise argparse.ArgumentTypeError(f"Unknown location '{location}'")
+    # Parquet output stores event_type as a fixed categorical, so other names would be written as NaN
+    if event_type not in EVENT_TYPE_CATEGORIES or event_type == 'None':
+        raise argparse.ArgumentTypeError(
+            f"Unknown event type '{event_type}' (expected one of {', '.join(EVENT_TYPE_CATEGORIES[1:])})")
+    return {
+        'location': location,
+        'event_type': event_type,
+        'start_hour': float(start_hour),
+        'end_hour': float(end_hour),
+        'boost': float(boost)
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a timestamped ride-request stream for replay benchmarks.")
+    parser.add_argument("--start-date", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+                        default=datetime.now().date(), help="First simulated day (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=1, help="Number of simulated days")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplier on the per-location arrival rates")
+    parser.add_argument("--event", type=parse_event, action="append", default=None,
+                        help="Event as location,event_type,start_hour,end_hour,boost (repeatable; replaces the defaults)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output format")
+    parser.add_argument("--output", default=None, help="Output path (defaults to ride_requests.<format>)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = args.output or f"ride_requests.{args.format}"
+    write_request_stream(output, args.start_date, args.days, args.scale, args.event, args.seed, args.format)
@@ -0,0 +1,721 @@
+import argparse
+import heapq
+import itertools
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import requests
+
+import incentive_rules
+from api_client import build_session
+from data_generator import DEFAULT_SEED, generate_driver_data
+from incentive_rules import DEFAULT_PARAMS, DailyState, DriverProfile, TripInput
+
+# Headless runs of the scripted driver day from app_sim.py, for one driver or thousands,
+# in virtual time: events are popped off a heap in timestamp order and nothing sleeps.
+
+SCENARIO_LOCATIONS = {
+    "Shanti Nagar": {"lat": 12.9716, "lon": 77.5946},
+    "Koramangala": {"lat": 12.9279, "lon": 77.6271},
+    "Silk Board": {"lat": 12.9161, "lon": 77.6226},
+    "Jayanagar": {"lat": 12.9299, "lon": 77.5833},
+    "Electronic City": {"lat": 12.8445, "lon": 77.6612},
+    "Whitefield": {"lat": 12.9698, "lon": 77.7499},
+    "M. Chinnaswamy Stadium": {"lat": 12.9788, "lon": 77.5996},
+    "Indiranagar": {"lat": 12.9784, "lon": 77.6408},
+    "Domlur": {"lat": 12.9609, "lon": 77.6378},
+    "Ejipura": {"lat": 12.9432, "lon": 77.6266}
+}
+
+SCENARIO_START = datetime(2023, 11, 14, 8, 0, 0)
+SCENARIO_END = datetime(2023, 11, 14, 22, 0, 0)
+
+# The demo driver the scripted day was written for
+SCRIPTED_DRIVER = {
+    'driver_id': 'KA01-T-9876',
+    'name': 'Ramesh',
+    'experience_years': 5,
+    'rating': 4.7,
+    'daily_avg_distance_km': 90.0,
+    'ride_acceptance_rate': 90.0,
+    'cancellation_rate': 5.0,
+    'consecutive_target_days': 0,
+    'home_location': 'Indiranagar',
+    'start_location': 'Shanti Nagar'
+}
+
+# A failed multiplier activation (not enough coins yet) is retried this often until SCENARIO_END
+MULTIPLIER_RETRY_MINUTES = 30
+
+LOG_COLUMNS = [
+    'driver_id', 'event_id', 'kind', 'simulation_time', 'time', 'action', 'details', 'success',
+    'coins', 'distance', 'trips', 'consecutive_trips', 'earnings', 'fare', 'coins_earned', 'penalty_coins',
+    'multiplier', 'multiplier_active', 'go_home_active', 'driver_lat', 'driver_lon'
+]
+
+def scripted_day():
+    """The scripted day: trips, two cancellations, a multiplier and go-home activation."""
+    # Trip 1: Shanti Nagar → Koramangala (8:15 AM)
+    trip1 = {
+        'trip_id': 'T001',
+        'pickup_location': "Shanti Nagar",
+        'destination_location': "Koramangala",
+        'estimated_trip_distance_km': 5.2,
+        'distance_to_pickup_km': 0.8,
+        'traffic_factor': 0.85,  # Morning traffic
+        'time_of_day': 'Morning',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 108,
+        'trip_duration_minutes': 22,
+        'pickup_coords': SCENARIO_LOCATIONS["Shanti Nagar"],
+        'destination_coords': SCENARIO_LOCATIONS["Koramangala"],
+        'simulation_time': datetime(2023, 11, 14, 8, 15, 0)
+    }
+    
+    # Trip 2: Koramangala → Silk Board (8:50 AM)
+    trip2 = {
+        'trip_id': 'T002',
+        'pickup_location': "Koramangala",
+        'destination_location': "Silk Board",
+        'estimated_trip_distance_km': 4.5,
+        'distance_to_pickup_km': 1.2,
+        'traffic_factor': 0.95,  # Very heavy traffic
+        'time_of_day': 'Morning',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 97.5,
+        'trip_duration_minutes': 35,
+        'pickup_coords': SCENARIO_LOCATIONS["Koramangala"],
+        'destination_coords': SCENARIO_LOCATIONS["Silk Board"],
+        'simulation_time': datetime(2023, 11, 14, 8, 50, 0)
+    }
+    
+    # Cancellation 1: Vehicle issue (9:40 AM)
+    cancel1 = {
+        'cancellation_id': 'C001',
+        'reason': 'vehicle_damage',
+        'time_since_accept_seconds': 45,
+        'simulation_time': datetime(2023, 11, 14, 9, 40, 0)
+    }
+    
+    # Trip 4: Silk Board → Jayanagar (10:30 AM)
+    trip4 = {
+        'trip_id': 'T004',
+        'pickup_location': "Silk Board",
+        'destination_location': "Jayanagar",
+        'estimated_trip_distance_km': 7.8,
+        'distance_to_pickup_km': 0.9,
+        'traffic_factor': 0.65,  # Moderate traffic
+        'time_of_day': 'Morning',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 147,
+        'trip_duration_minutes': 28,
+        'pickup_coords': SCENARIO_LOCATIONS["Silk Board"],
+        'destination_coords': SCENARIO_LOCATIONS["Jayanagar"],
+        'simulation_time': datetime(2023, 11, 14, 10, 30, 0)
+    }
+    
+    # Trip 5: Jayanagar → Electronic City (11:15 AM)
+    trip5 = {
+        'trip_id': 'T005',
+        'pickup_location': "Jayanagar",
+        'destination_location': "Electronic City",
+        'estimated_trip_distance_km': 14.5,
+        'distance_to_pickup_km': 1.2,
+        'traffic_factor': 0.7,
+        'time_of_day': 'Afternoon',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 247.5,
+        'trip_duration_minutes': 42,
+        'pickup_coords': SCENARIO_LOCATIONS["Jayanagar"],
+        'destination_coords': SCENARIO_LOCATIONS["Electronic City"],
+        'simulation_time': datetime(2023, 11, 14, 11, 15, 0)
+    }
+    
+    # Activate multiplier (1:00 PM)
+    multiplier = {
+        'action': 'activate_multiplier',
+        'simulation_time': datetime(2023, 11, 14, 13, 0, 0)
+    }
+    
+    # Trip 6: Electronic City → Whitefield (1:30 PM)
+    trip6 = {
+        'trip_id': 'T006',
+        'pickup_location': "Electronic City",
+        'destination_location': "Whitefield",
+        'estimated_trip_distance_km': 13.2,
+        'distance_to_pickup_km': 1.5,
+        'traffic_factor': 0.6,
+        'time_of_day': 'Afternoon',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 228,
+        'trip_duration_minutes': 38,
+        'pickup_coords': SCENARIO_LOCATIONS["Electronic City"],
+        'destination_coords': SCENARIO_LOCATIONS["Whitefield"],
+        'simulation_time': datetime(2023, 11, 14, 13, 30, 0)
+    }
+    
+    # Cancellation 2: Driver preference (2:30 PM)
+    cancel2 = {
+        'cancellation_id': 'C002',
+        'reason': 'destination_too_far',
+        'time_since_accept_seconds': 120,
+        'simulation_time': datetime(2023, 11, 14, 14, 30, 0)
+    }
+    
+    # Trip 8: Whitefield → M. Chinnaswamy Stadium (3:30 PM)
+    trip8 = {
+        'trip_id': 'T008',
+        'pickup_location': "Whitefield",
+        'destination_location': "M. Chinnaswamy Stadium",
+        'estimated_trip_distance_km': 11.8,
+        'distance_to_pickup_km': 1.2,
+        'traffic_factor': 0.8,  # Higher for event
+        'time_of_day': 'Afternoon',
+        'at_event': True,
+        'event_type': 'Cricket Match',
+        'base_fare': 30,
+        'base_trip_fare': 207,
+        'trip_duration_minutes': 45,
+        'pickup_coords': SCENARIO_LOCATIONS["Whitefield"],
+        'destination_coords': SCENARIO_LOCATIONS["M. Chinnaswamy Stadium"],
+        'simulation_time': datetime(2023, 11, 14, 15, 30, 0)
+    }
+    
+    # Trip 9: M. Chinnaswamy Stadium → Whitefield (5:15 PM)
+    trip9 = {
+        'trip_id': 'T009',
+        'pickup_location': "M. Chinnaswamy Stadium",
+        'destination_location': "Whitefield",
+        'estimated_trip_distance_km': 16.5,
+        'distance_to_pickup_km': 0.8,
+        'traffic_factor': 0.9,  # Heavy evening traffic
+        'time_of_day': 'Evening',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 277.5,
+        'trip_duration_minutes': 65,
+        'pickup_coords': SCENARIO_LOCATIONS["M. Chinnaswamy Stadium"],
+        'destination_coords': SCENARIO_LOCATIONS["Whitefield"],
+        'simulation_time': datetime(2023, 11, 14, 17, 15, 0)
+    }
+    
+    # Trip 10: Whitefield → Koramangala (7:00 PM)
+    trip10 = {
+        'trip_id': 'T010',
+        'pickup_location': "Whitefield",
+        'destination_location': "Koramangala",
+        'estimated_trip_distance_km': 9.2,
+        'distance_to_pickup_km': 1.4,
+        'traffic_factor': 0.75,
+        'time_of_day': 'Evening',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 168,
+        'trip_duration_minutes': 35,
+        'pickup_coords': SCENARIO_LOCATIONS["Whitefield"],
+        'destination_coords': SCENARIO_LOCATIONS["Koramangala"],
+        'simulation_time': datetime(2023, 11, 14, 19, 0, 0)
+    }
+    
+    # Activate Go-Home Mode (9:00 PM)
+    go_home = {
+        'action': 'activate_go_home',
+        'simulation_time': datetime(2023, 11, 14, 21, 0, 0)
+    }
+    
+    # Final Go-Home Trip: Koramangala → Indiranagar (9:15 PM)
+    trip_home = {
+        'trip_id': 'HOME-A',
+        'pickup_location': "Koramangala",
+        'destination_location': "Indiranagar",
+        'estimated_trip_distance_km': 5.8,
+        'distance_to_pickup_km': 0.5,
+        'traffic_factor': 0.6,
+        'time_of_day': 'Night',
+        'at_event': False,
+        'event_type': None,
+        'base_fare': 30,
+        'base_trip_fare': 117,
+        'trip_duration_minutes': 22,
+        'pickup_coords': SCENARIO_LOCATIONS["Koramangala"],
+        'destination_coords': SCENARIO_LOCATIONS["Indiranagar"],
+        'simulation_time': datetime(2023, 11, 14, 21, 15, 0)
+    }    
+    return [
+        trip1, trip2, cancel1, trip4, trip5, multiplier,
+        trip6, cancel2, trip8, trip9, trip10, go_home, trip_home
+    ]
+
+def event_kind(event):
+    """'trip', 'cancellation', 'multiplier' or 'go_home' for a scenario event."""
+    if "action" in event:
+        return 'multiplier' if event["action"] == "activate_multiplier" else 'go_home'
+    if "cancellation_id" in event:
+        return 'cancellation'
+    return 'trip'
+
+def perturbed_day(rng, jitter_minutes=30, distance_spread=0.2):
+    """The scripted day with shifted event times and scaled trip distances and fares.
+
+    Times move by up to `jitter_minutes` either way (whole minutes) and stay at
+    least a minute apart per driver, so one driver never has two events at once.
+    """
+    events = []
+    for event in scripted_day():
+        shift = int(rng.integers(-jitter_minutes, jitter_minutes + 1)) if jitter_minutes else 0
+        event = dict(event, simulation_time=event['simulation_time'] + timedelta(minutes=shift))
+        if event_kind(event) == 'trip':
+            scale = rng.uniform(1 - distance_spread, 1 + distance_spread)
+            event['estimated_trip_distance_km'] = round(event['estimated_trip_distance_km'] * scale, 1)
+            event['base_trip_fare'] = round(event['base_fare'] + (event['base_trip_fare'] - event['base_fare']) * scale, 2)
+            event['trip_duration_minutes'] = max(1, round(event['trip_duration_minutes'] * scale))
+        events.append(event)
+
+    events.sort(key=lambda event: event['simulation_time'])
+    for previous, event in zip(events, events[1:]):
+        if event['simulation_time'] <= previous['simulation_time']:
+            event['simulation_time'] = previous['simulation_time'] + timedelta(minutes=1)
+    return events
+
+def build_fleet(num_drivers, seed=DEFAULT_SEED, jitter_minutes=30, distance_spread=0.2):
+    """(drivers, scenarios) for a fleet; driver 0 is the scripted driver on the exact script."""
+    rng = np.random.default_rng(seed)
+    drivers, scenarios = [dict(SCRIPTED_DRIVER)], [scripted_day()]
+    if num_drivers <= 1:
+        return drivers[:num_drivers], scenarios[:num_drivers]
+
+    generated = generate_driver_data(num_drivers - 1, rng)
+    names = list(SCENARIO_LOCATIONS)
+    homes = rng.choice(names, num_drivers - 1)
+    for row, home in zip(generated.itertuples(index=False), homes):
+        drivers.append({
+            'driver_id': row.driver_id,
+            'name': f"Driver {row.driver_id[:8]}",
+            'experience_years': int(row.experience_years),
+            'rating': round(float(row.rating), 2),
+            'daily_avg_distance_km': float(row.daily_avg_distance_km),
+            'ride_acceptance_rate': float(row.ride_acceptance_rate),
+            'cancellation_rate': float(row.cancellation_rate),
+            'consecutive_target_days': 0,
+            'home_location': home,
+            'start_location': SCRIPTED_DRIVER['start_location']
+        })
+        scenarios.append(perturbed_day(rng, jitter_minutes, distance_spread))
+    return drivers, scenarios
+
+class SimulationBackend:
+    """Applies scenario events to drivers; results use the API's response fields.
+
+    Handlers return None when the event could not be applied at all.
+    """
+
+    def setup(self, drivers):
+        """Prepare every driver for a fresh day."""
+        raise NotImplementedError
+
+    def trip(self, driver_id, event):
+        raise NotImplementedError
+
+    def cancellation(self, driver_id, event):
+        raise NotImplementedError
+
+    def multiplier(self, driver_id, event):
+        raise NotImplementedError
+
+    def go_home(self, driver_id, event):
+        raise NotImplementedError
+
+    def run_batch(self, calls):
+        """Apply (kind, driver_id, event) calls that share a timestamp, in order."""
+        return [getattr(self, kind)(driver_id, event) for kind, driver_id, event in calls]
+
+    def close(self):
+        pass
+
+class InProcessBackend(SimulationBackend):
+    """Runs the incentive rules directly against per-driver DailyState; no API or database.
+
+    A trip event's historical_traffic, when it has one, stands in for the
+    usual pickup traffic the API would have stored on the trip.
+    """
+
+    def __init__(self, params=None, config=None):
+        # `params` pins one parameter set; otherwise `config` assigns variants per driver
+        self.params = params
+        self.config = config
+        self.profiles = {}
+        self.states = {}
+        self.go_home_active = {}
+
+    def params_for(self, driver_id):
+        if self.params is not None:
+            return self.params
+        if self.config is not None:
+            return self.config.params_for(driver_id)[1]
+        return DEFAULT_PARAMS
+
+    def setup(self, drivers):
+        for driver in drivers:
+            self.profiles[driver['driver_id']] = DriverProfile(
+                daily_avg_distance_km=driver['daily_avg_distance_km'],
+                ride_acceptance_rate=driver['ride_acceptance_rate'],
+                cancellation_rate=driver['cancellation_rate']
+            )
+            self.states[driver['driver_id']] = DailyState()
+            self.go_home_active[driver['driver_id']] = False
+
+    def trip(self, driver_id, event):
+        state = self.states[driver_id]
+        trip = TripInput(
+            estimated_trip_distance_km=event['estimated_trip_distance_km'],
+            distance_to_pickup_km=event['distance_to_pickup_km'],
+            traffic_factor=event['traffic_factor'],
+            time_of_day=event['time_of_day'],
+            at_event=event['at_event'],
+            event_type=event['event_type'],
+            base_trip_fare=event['base_trip_fare'],
+            trip_duration_minutes=event['trip_duration_minutes']
+        )
+        outcome = incentive_rules.evaluate_trip(self.profiles[driver_id], state, trip, self.params_for(driver_id),
+                                                event.get('historical_traffic'))
+        state = self.states[driver_id] = incentive_rules.apply_trip(state, outcome)
+        return {
+            'success': True,
+            'coins_earned': outcome.coins_earned,
+            'streak_bonus_earned': outcome.streak_bonus,
+            'distance_covered_today': state.distance_covered_today,
+            'new_coins_balance': state.coins_earned,
+            'multiplier_applied': outcome.multiplier_applied,
+            'final_fare': outcome.final_fare
+        }
+
+    def cancellation(self, driver_id, event):
+        state = self.states[driver_id]
+        outcome = incentive_rules.evaluate_cancellation(
+            self.profiles[driver_id], state.coins_earned, event['time_since_accept_seconds'], event['reason'],
+            self.params_for(driver_id)
+        )
+        if not outcome.is_legitimate:
+            self.states[driver_id] = DailyState(**{**vars(state), 'coins_earned': outcome.coins_after})
+        return {'success': True, 'penalty_coins': outcome.penalty_coins, 'new_coins_balance': outcome.coins_after}
+
+    def multiplier(self, driver_id, event):
+        state = self.states[driver_id]
+        if state.multiplier_active:
+            return {'success': False, 'message': "Multiplier already active."}
+
+        params = self.params_for(driver_id)
+        value = incentive_rules.multiplier_for_coins(state.coins_earned, params)
+        if value is None:
+            return {'success': False, 'message': f"Not enough coins. Need {params.coin_system['daily_milestone_60_percent']} "
+                                                 f"coins for multiplier activation."}
+        self.states[driver_id] = DailyState(**{**vars(state), 'multiplier_active': True, 'multiplier_value': value})
+        return {'success': True, 'multiplier_value': value}
+
+    def go_home(self, driver_id, event):
+        self.go_home_active[driver_id] = True
+        return {'success': True}
+
+class ApiBackend(SimulationBackend):
+    """Drives a running API over one pooled requests.Session.
+
+    Calls that share a virtual timestamp are fanned out over `workers` threads,
+    one thread per driver so each driver's own calls keep their order. Pass
+    `session` to reuse an existing pool; it is then left open on close().
+    """
+
+    def __init__(self, base_url, pool_size=20, workers=None, timeout=10.0, session=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:6]
+        self.owns_session = session is None
+        self.session = session or build_session(pool_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers or pool_size)
+        self.location_ids = {}
+
+    def _call(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            return None
+        return response.json() if response.status_code == 200 else None
+
+    def _ensure_locations(self):
+        existing = {loc["location_name"]: loc["location_id"] for loc in self._call("GET", "/locations/?limit=1000") or []}
+        for name, coords in SCENARIO_LOCATIONS.items():
+            if name not in existing:
+                created = self._call("POST", "/locations/", json={
+                    "location_name": name, "latitude": coords["lat"], "longitude": coords["lon"]
+                })
+                if created is None:
+                    raise RuntimeError(f"Could not create location {name}")
+                existing[name] = created["location_id"]
+        self.location_ids = existing
+
+    def _setup_driver(self, driver):
+        driver_id = driver['driver_id']
+        if self._call("GET", f"/drivers/{driver_id}") is None:
+            payload = {key: driver[key] for key in (
+                'driver_id', 'name', 'experience_years', 'rating', 'daily_avg_distance_km',
+                'ride_acceptance_rate', 'cancellation_rate', 'consecutive_target_days'
+            )}
+            payload['home_location_id'] = self.location_ids[driver['home_location']]
+            payload['current_location_id'] = self.location_ids[driver['start_location']]
+            if self._call("POST", "/drivers/", json=payload) is None:
+                raise RuntimeError(f"Could not create driver {driver_id}")
+        self._call("POST", f"/drivers/{driver_id}/reset-daily-stats", json={"driver_id": driver_id})
+
+    def setup(self, drivers):
+        self._ensure_locations()
+        list(self.executor.map(self._setup_driver, drivers))
+
+    def trip(self, driver_id, event):
+        trip_id = f"{event['trip_id']}-{self.run_id}-{driver_id}"
+        created = self._call("POST", "/trips/", json={
+            "trip_id": trip_id,
+            "driver_id": driver_id,
+            "pickup_location_id": self.location_ids[event["pickup_location"]],
+            "destination_location_id": self.location_ids[event["destination_location"]],
+            "estimated_trip_distance_km": event["estimated_trip_distance_km"],
+            "distance_to_pickup_km": event["distance_to_pickup_km"],
+            "traffic_factor": event["traffic_factor"],
+            "time_of_day": event["time_of_day"],
+            "at_event": event["at_event"],
+            "event_type": event["event_type"],
+            "base_fare": event["base_fare"],
+            "base_trip_fare": event["base_trip_fare"],
+            "trip_duration_minutes": event["trip_duration_minutes"]
+        })
+        if created is None:
+            return None
+        return self._call("POST", f"/trips/{trip_id}/process")
+
+    def cancellation(self, driver_id, event):
+        created = self._call("POST", "/cancellations/", json={
+            "driver_id": driver_id,
+            "trip_id": event.get("trip_id", f"CANCELLED-{uuid.uuid4().hex[:8]}"),
+            "time_since_accept_seconds": event["time_since_accept_seconds"],
+            "reason": event["reason"]
+        })
+        if created is None:
+            return None
+        return self._call("POST", f"/cancellations/{created['cancellation_id']}/process")
+
+    def multiplier(self, driver_id, event):
+        return self._call("POST", f"/drivers/{driver_id}/activate-multiplier")
+
+    def go_home(self, driver_id, event):
+        return self._call("POST", f"/drivers/{driver_id}/activate-go-home")
+
+    def _run_driver_calls(self, calls):
+        return [getattr(self, kind)(driver_id, event) for kind, driver_id, event in calls]
+
+    def run_batch(self, calls):
+        by_driver = {}
+        for index, call in enumerate(calls):
+            by_driver.setdefault(call[1], []).append((index, call))
+
+        results = [None] * len(calls)
+        groups = list(by_driver.values())
+        for group, group_results in zip(groups, self.executor.map(
+                lambda group: self._run_driver_calls([call for _, call in group]), groups)):
+            for (index, _), result in zip(group, group_results):
+                results[index] = result
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+        if self.owns_session:
+            self.session.close()
+
+def _driver_view(driver):
+    """What the driver's phone shows; updated from backend results as events are applied."""
+    coords = SCENARIO_LOCATIONS.get(driver.get('start_location'), SCENARIO_LOCATIONS['Shanti Nagar'])
+    return {
+        'coins': 0, 'distance': 0.0, 'trips': 0, 'consecutive_trips': 0, 'earnings': 0.0,
+        'multiplier': 1.0, 'multiplier_active': False, 'go_home_active': False,
+        'driver_lat': coords['lat'], 'driver_lon': coords['lon']
+    }
+
+def _apply_result(view, kind, event, result):
+    """Update a driver view from one result; returns (action, details, extra columns)."""
+    if kind == 'trip':
+        if result is None:
+            return "Trip Failed", f"{event['pickup_location']} → {event['destination_location']}", {}
+        fare = result['final_fare']
+        view['coins'] = result['new_coins_balance']
+        view['distance'] = result['distance_covered_today']
+        view['trips'] += 1
+        view['consecutive_trips'] += 1
+        view['earnings'] += fare
+        view['driver_lat'] = event['destination_coords']['lat']
+        view['driver_lon'] = event['destination_coords']['lon']
+        details = (f"{event['pickup_location']} → {event['destination_location']} "
+                   f"({event['estimated_trip_distance_km']} km, ₹{fare:.2f})")
+        return "Trip Completed", details, {'fare': fare, 'coins_earned': result['coins_earned'] + result['streak_bonus_earned']}
+
+    if kind == 'cancellation':
+        if result is None:
+            return "Cancellation Failed", f"Reason: {event['reason']}", {}
+        penalty = result.get('penalty_coins', 0)
+        view['coins'] = result.get('new_coins_balance', view['coins'])
+        return "Trip Cancelled", f"Reason: {event['reason']} (Penalty: {penalty} coins)", {'penalty_coins': penalty}
+
+    if kind == 'multiplier':
+        if not result or not result.get('success', False):
+            message = result.get('message', '') if result else 'API error'
+            return "Multiplier Not Activated", message, {}
+        view['multiplier_active'] = True
+        view['multiplier'] = result.get('multiplier_value', 1.0)
+        return "Multiplier Activated", f"{view['multiplier']}x fare multiplier for 4 hours!", {}
+
+    if not result or not result.get('success', False):
+        return "Go-Home Mode Failed", result.get('message', '') if result else 'API error', {}
+    view['go_home_active'] = True
+    return "Go-Home Mode Activated", "Driver is now prioritizing trips toward home", {}
+
+def run_simulation(drivers, scenarios, backend, multiplier_retry_minutes=MULTIPLIER_RETRY_MINUTES,
+                   end_time=SCENARIO_END):
+    """Run every driver's scenario through `backend` in virtual time; returns the event log.
+
+    Events from all drivers are merged on one heap and applied in timestamp
+    order, each timestamp as one batch. A multiplier activation that fails for
+    lack of coins is rescheduled `multiplier_retry_minutes` later (None turns
+    that off). Multipliers never expire, matching the API.
+    """
+    backend.setup(drivers)
+    views = [_driver_view(driver) for driver in drivers]
+
+    sequence = itertools.count()
+    queue = [(event['simulation_time'], next(sequence), index, event)
+             for index, events in enumerate(scenarios) for event in events]
+    heapq.heapify(queue)
+
+    rows = []
+    while queue:
+        now = queue[0][0]
+        batch = []
+        while queue and queue[0][0] == now:
+            _, _, index, event = heapq.heappop(queue)
+            batch.append((index, event))
+
+        calls = [(event_kind(event), drivers[index]['driver_id'], event) for index, event in batch]
+        results = backend.run_batch(calls)
+
+        for (index, event), (kind, driver_id, _), result in zip(batch, calls, results):
+            view = views[index]
+            action, details, extra = _apply_result(view, kind, event, result)
+            rows.append({
+                'driver_id': driver_id,
+                'event_id': event.get('trip_id') or event.get('cancellation_id') or event.get('action'),
+                'kind': kind,
+                'simulation_time': now,
+                'time': now.strftime("%I:%M %p"),
+                'action': action,
+                'details': details,
+                'success': bool(result) and result.get('success', True),
+                'fare': extra.get('fare', 0.0),
+                'coins_earned': extra.get('coins_earned', 0),
+                'penalty_coins': extra.get('penalty_coins', 0),
+                **view
+            })
+
+            retry_at = now + timedelta(minutes=multiplier_retry_minutes or 0)
+            if (kind == 'multiplier' and result and not result.get('success') and not view['multiplier_active']
+                    and multiplier_retry_minutes and retry_at <= end_time):
+                heapq.heappush(queue, (retry_at, next(sequence), index,
+                                       {'action': 'activate_multiplier', 'simulation_time': retry_at}))
+
+    return pd.DataFrame(rows, columns=LOG_COLUMNS)
+
+def summarize_drivers(log):
+    """One row per driver: end-of-day totals plus multiplier and go-home outcomes."""
+    by_driver = log.groupby('driver_id', sort=False)
+    summary = by_driver[['coins', 'distance', 'trips', 'earnings', 'multiplier', 'go_home_active']].last()
+    summary['cancellations'] = by_driver['kind'].apply(lambda kind: int((kind == 'cancellation').sum()))
+    summary['penalty_coins'] = by_driver['penalty_coins'].sum()
+    summary['failed_events'] = by_driver['success'].apply(lambda success: int((~success.astype(bool)).sum()))
+    return summary.reset_index()
+
+def save_results(log, output_dir):
+    """Write the event log and driver summary as Parquet files under `output_dir`."""
+    os.makedirs(output_dir, exist_ok=True)
+    log.to_parquet(os.path.join(output_dir, "events.parquet"), index=False)
+    summarize_drivers(log).to_parquet(os.path.join(output_dir, "drivers.parquet"), index=False)
+
+def load_results(output_dir):
+    """(event log, driver summary) written by save_results."""
+    return (pd.read_parquet(os.path.join(output_dir, "events.parquet")),
+            pd.read_parquet(os.path.join(output_dir, "drivers.parquet")))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the scripted driver day headlessly for a fleet of drivers.")
+    parser.add_argument("--drivers", type=int, default=1000, help="Drivers to simulate (driver 0 is the scripted one)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the fleet and perturbed days")
+    parser.add_argument("--jitter-minutes", type=int, default=30, help="Max shift of each event's time per driver")
+    parser.add_argument("--backend", choices=["inprocess", "api"], default="inprocess",
+                        help="Apply events with the incentive rules in-process or through the API")
+    parser.add_argument("--api-url", default="http://localhost:8000", help="API base URL for --backend api")
+    parser.add_argument("--local-api", default=None, metavar="DATABASE_URL",
+                        help="Start the API in-process against this database (e.g. memory://) instead of --api-url")
+    parser.add_argument("--reset-schema", action="store_true",
+                        help="Drop and recreate the --local-api database's tables before the run")
+    parser.add_argument("--pool-size", type=int, default=20, help="HTTP connections kept open to the API")
+    parser.add_argument("--params", default=None, help="JSON parameter overrides for the in-process backend")
+    parser.add_argument("--output", default="simulation_results", help="Directory for events.parquet and drivers.parquet")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    drivers, scenarios = build_fleet(args.drivers, args.seed, args.jitter_minutes)
+    scheduled = sum(len(events) for events in scenarios)
+
+    server = None
+    if args.backend == "api":
+        base_url = args.api_url
+        if args.local_api:
+            from load_replay import start_local_server
+            server, thread = start_local_server(args.local_api, 8765, args.reset_schema)
+            base_url = "http://127.0.0.1:8765"
+        backend = ApiBackend(base_url, pool_size=args.pool_size)
+    else:
+        from recompute_incentives import load_params
+        backend = InProcessBackend(params=load_params(args.params))
+
+    print(f"Simulating {len(drivers):,} drivers ({scheduled:,} scripted events) with the {args.backend} backend...")
+    start = time.perf_counter()
+    try:
+        log = run_simulation(drivers, scenarios, backend)
+    finally:
+        backend.close()
+        if server is not None:
+            from load_replay import stop_local_server
+            stop_local_server(server, thread)
+    seconds = time.perf_counter() - start
+
+    # The Streamlit loop spent at least 2s of wall time per event
+    print(f"Applied {len(log):,} events in {seconds:.2f}s ({len(log) / seconds:,.0f} events/s; "
+          f"the per-rerun loop would take {len(log) * 2 / 3600:,.1f}h)")
+
+    save_results(log, args.output)
+    summary = summarize_drivers(log)
+    print(summary[['coins', 'distance', 'trips', 'earnings', 'penalty_coins']].describe().round(2).to_string())
+    print(f"Multiplier uptake: {(summary['multiplier'] > 1).mean():.1%}")
+    print(f"\nResults saved to {args.output}/")
@@ -0,0 +1,800 @@
+from sqlalchemy import create_engine, event, insert, inspect, literal, Column, Integer, String, Float, Boolean, DateTime, Date, ForeignKey
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, relationship, joinedload
+from collections import defaultdict
+from datetime import datetime, date
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+Base = declarative_base()
+
+# IDs per IN (...) lookup in bulk checks
+BULK_LOOKUP_CHUNK = 500
+
+# Database Models
+class Location(Base):
+    __tablename__ = "locations"
+
+    location_id = Column(Integer, primary_key=True, index=True)
+    location_name = Column(String(100), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+class Driver(Base):
+    __tablename__ = "drivers"
+
+    driver_id = Column(String(50), primary_key=True, index=True)
+    name = Column(String(100))
+    experience_years = Column(Integer)
+    rating = Column(Float)
+    home_location_id = Column(Integer, ForeignKey("locations.location_id"))
+    current_location_id = Column(Integer, ForeignKey("locations.location_id"))
+    daily_avg_distance_km = Column(Float)
+    target_distance_60_percent = Column(Float)
+    target_distance_100_percent = Column(Float)
+    ride_acceptance_rate = Column(Float)
+    cancellation_rate = Column(Float)
+    consecutive_target_days = Column(Integer)
+    created_at = Column(DateTime, default=datetime.now)
+
+    home_location = relationship("Location", foreign_keys=[home_location_id])
+    current_location = relationship("Location", foreign_keys=[current_location_id])
+
+class DriverDailyStat(Base):
+    __tablename__ = "driver_daily_stats"
+
+    stat_id = Column(Integer, primary_key=True, index=True)
+    driver_id = Column(String(50), ForeignKey("drivers.driver_id"))
+    date = Column(Date, default=date.today)
+    distance_covered_today = Column(Float, default=0)
+    coins_earned = Column(Integer, default=0)
+    hours_active = Column(Float, default=0)
+    consecutive_trips = Column(Integer, default=0)
+    multiplier_active = Column(Boolean, default=False)
+    multiplier_value = Column(Float, default=1.0)
+    multiplier_expires_at = Column(DateTime, nullable=True)
+    go_home_mode_active = Column(Boolean, default=False)
+
+    driver = relationship("Driver")
+
+class Trip(Base):
+    __tablename__ = "trips"
+
+    trip_id = Column(String(50), primary_key=True, index=True)
+    driver_id = Column(String(50), ForeignKey("drivers.driver_id"))
+    pickup_location_id = Column(Integer, ForeignKey("locations.location_id"))
+    destination_location_id = Column(Integer, ForeignKey("locations.location_id"))
+    estimated_trip_distance_km = Column(Float)
+    distance_to_pickup_km = Column(Float)
+    traffic_factor = Column(Float)
+    time_of_day = Column(String(20))
+    at_event = Column(Boolean, default=False)
+    event_type = Column(String(50), nullable=True)
+    base_fare = Column(Float)
+    base_trip_fare = Column(Float)
+    multiplier_applied = Column(Float, default=1.0)
+    final_fare = Column(Float)
+    trip_duration_minutes = Column(Integer)
+    trip_date = Column(Date, default=date.today)
+    trip_time = Column(String(10))
+    coins_earned = Column(Integer)
+    # Surge applied when base_trip_fare was priced at creation; 1.0 when the client supplied the fare
+    surge_multiplier = Column(Float, default=1.0)
+    created_at = Column(DateTime, default=datetime.now)
+    # Set when incentives are applied; a processed trip can still have earned 0 coins
+    processed_at = Column(DateTime, nullable=True)
+    # Usual traffic intensity at the pickup the coins were calculated with; None without readings
+    historical_traffic = Column(Float, nullable=True)
+    # Rest of the processing outcome, so a repeated process call returns the same response
+    streak_bonus = Column(Integer, nullable=True)
+    incentive_variant = Column(String(50), nullable=True)
+    config_version = Column(String(50), nullable=True)
+
+    driver = relationship("Driver")
+    pickup_location = relationship("Location", foreign_keys=[pickup_location_id])
+    destination_location = relationship("Location", foreign_keys=[destination_location_id])
+
+class Cancellation(Base):
+    __tablename__ = "cancellations"
+
+    cancellation_id = Column(Integer, primary_key=True, index=True)
+    driver_id = Column(String(50), ForeignKey("drivers.driver_id"))
+    trip_id = Column(String(50))
+    time_since_accept_seconds = Column(Integer)
+    reason = Column(String(100))
+    penalty_coins = Column(Integer, default=0)
+    cooldown_minutes = Column(Integer, default=0)
+    cooldown_until = Column(DateTime, nullable=True)
+    cancellation_date = Column(Date, default=date.today)
+    created_at = Column(DateTime, default=datetime.now)
+    processed_at = Column(DateTime, nullable=True)
+
+    driver = relationship("Driver")
+
+class TrafficData(Base):
+    __tablename__ = "traffic_data"
+
+    traffic_id = Column(Integer, primary_key=True, index=True)
+    location_id = Column(Integer, ForeignKey("locations.location_id"))
+    time_of_day = Column(String(20))
+    traffic_intensity = Column(Float)
+    ride_requests = Column(Integer)
+    date = Column(Date, default=date.today)
+    # Indexed for the traffic profile's windowed rebuild
+    created_at = Column(DateTime, default=datetime.now, index=True)
+
+    location = relationship("Location")
+
+# Repository interface
+class IncentiveRepository:
+    """Storage operations used by the API and NammaYatriIncentiveSystem.
+
+    Rows are always the model classes above, so response models and business
+    logic read the same attributes whichever backend is behind the repository.
+    """
+
+    def get_location(self, location_id):
+        raise NotImplementedError
+
+    def list_locations(self, skip=0, limit=None):
+        raise NotImplementedError
+
+    def add_location(self, location):
+        raise NotImplementedError
+
+    def location_ids(self):
+        """Set of every location_id."""
+        raise NotImplementedError
+
+    def driver_ids(self):
+        """Set of every driver_id."""
+        raise NotImplementedError
+
+    def get_driver(self, driver_id, with_locations=False):
+        """A driver; `with_locations` loads home and current location in the same query."""
+        raise NotImplementedError
+
+    def list_drivers(self, skip=0, limit=None):
+        raise NotImplementedError
+
+    def add_driver(self, driver):
+        raise NotImplementedError
+
+    def get_daily_stats(self, driver_id, stats_date):
+        raise NotImplementedError
+
+    def list_daily_stats(self, driver_id, start_date, end_date):
+        raise NotImplementedError
+
+    def list_daily_stats_for_date(self, stats_date):
+        """Every driver's stats row for a day."""
+        raise NotImplementedError
+
+    def add_daily_stats(self, stats):
+        raise NotImplementedError
+
+    def leaderboard(self, stats_date, limit):
+        """Top (driver_id, name, coins_earned, distance_covered_today) rows for a day."""
+        raise NotImplementedError
+
+    def get_trip(self, trip_id):
+        raise NotImplementedError
+
+    def list_trips(self, driver_id=None, start_date=None, end_date=None, skip=0, limit=None):
+        """Trips matching the filters, newest first."""
+        raise NotImplementedError
+
+    def add_trip(self, trip):
+        raise NotImplementedError
+
+    def existing_trip_ids(self, trip_ids):
+        """The subset of `trip_ids` already stored."""
+        raise NotImplementedError
+
+    def driver_ids_with_trips_since(self, since):
+        """IDs of drivers with a trip created at or after `since`."""
+        raise NotImplementedError
+
+    def bulk_add_trips(self, rows):
+        """Insert trips given as column dicts, in the current transaction."""
+        raise NotImplementedError
+
+    def get_cancellation(self, cancellation_id):
+        raise NotImplementedError
+
+    def list_cancellations(self, driver_id=None, start_date=None, end_date=None, skip=0, limit=None):
+        """Cancellations matching the filters, newest first."""
+        raise NotImplementedError
+
+    def add_cancellation(self, cancellation):
+        raise NotImplementedError
+
+    def list_traffic_data(self, location_id=None, time_of_day=None, date_filter=None, skip=0, limit=None):
+        """Traffic readings matching the filters, newest first."""
+        raise NotImplementedError
+
+    def add_traffic_data(self, traffic_data):
+        raise NotImplementedError
+
+    def bulk_add_traffic_data(self, rows):
+        """Insert traffic readings given as column dicts, in the current transaction."""
+        raise NotImplementedError
+
+    def list_traffic_data_since(self, after_traffic_id, limit, created_since=None):
+        """Up to `limit` traffic readings with traffic_id above `after_traffic_id`, oldest first.
+
+        With `created_since`, readings created before it are skipped.
+        """
+        raise NotImplementedError
+
+    def commit(self):
+        raise NotImplementedError
+
+    def rollback(self):
+        raise NotImplementedError
+
+    def refresh(self, obj):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SQLAlchemyRepository(IncentiveRepository):
+    """Repository over one SQLAlchemy session (MySQL, SQLite or any other engine)."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def _add(self, obj):
+        self.session.add(obj)
+        return obj
+
+    def get_location(self, location_id):
+        return self.session.query(Location).filter(Location.location_id == location_id).first()
+
+    def list_locations(self, skip=0, limit=None):
+        return self.session.query(Location).offset(skip).limit(limit).all()
+
+    def add_location(self, location):
+        return self._add(location)
+
+    def location_ids(self):
+        return {location_id for (location_id,) in self.session.query(Location.location_id)}
+
+    def driver_ids(self):
+        return {driver_id for (driver_id,) in self.session.query(Driver.driver_id)}
+
+    def get_driver(self, driver_id, with_locations=False):
+        query = self.session.query(Driver)
+        if with_locations:
+            query = query.options(joinedload(Driver.home_location), joinedload(Driver.current_location))
+        return query.filter(Driver.driver_id == driver_id).first()
+
+    def list_drivers(self, skip=0, limit=None):
+        # Load both locations in the same query instead of two lazy loads per driver
+        return self.session.query(Driver).options(
+            joinedload(Driver.home_location),
+            joinedload(Driver.current_location)
+        ).offset(skip).limit(limit).all()
+
+    def add_driver(self, driver):
+        return self._add(driver)
+
+    def get_daily_stats(self, driver_id, stats_date):
+        return self.session.query(DriverDailyStat).filter(
+            DriverDailyStat.driver_id == driver_id,
+            DriverDailyStat.date == stats_date
+        ).first()
+
+    def list_daily_stats(self, driver_id, start_date, end_date):
+        return self.session.query(DriverDailyStat).filter(
+            DriverDailyStat.driver_id == driver_id,
+            DriverDailyStat.date >= start_date,
+            DriverDailyStat.date <= end_date
+        ).all()
+
+    def list_daily_stats_for_date(self, stats_date):
+        return self.session.query(DriverDailyStat).filter(DriverDailyStat.date == stats_date).all()
+
+    def add_daily_stats(self, stats):
+        return self._add(stats)
+
+    def leaderboard(self, stats_date, limit):
+        return self.session.query(
+            DriverDailyStat.driver_id,
+            Driver.name,
+            DriverDailyStat.coins_earned,
+            DriverDailyStat.distance_covered_today
+        ).join(
+            Driver, DriverDailyStat.driver_id == Driver.driver_id
+        ).filter(
+            DriverDailyStat.date == stats_date
+        ).order_by(
+            DriverDailyStat.coins_earned.desc()
+        ).limit(limit).all()
+
+    def get_trip(self, trip_id):
+        return self.session.query(Trip).filter(Trip.trip_id == trip_id).first()
+
+    def list_trips(self, driver_id=None, start_date=None, end_date=None, skip=0, limit=None):
+        query = self.session.query(Trip)
+
+        if driver_id:
+            query = query.filter(Trip.driver_id == driver_id)
+
+        if start_date:
+            query = query.filter(Trip.trip_date >= start_date)
+
+        if end_date:
+            query = query.filter(Trip.trip_date <= end_date)
+
+        return query.order_by(Trip.created_at.desc()).offset(skip).limit(limit).all()
+
+    def add_trip(self, trip):
+        return self._add(trip)
+
+    def existing_trip_ids(self, trip_ids):
+        trip_ids = list(trip_ids)
+        existing = set()
+        # Chunked to stay under the bound-parameter limits of SQLite and MySQL
+        for start in range(0, len(trip_ids), BULK_LOOKUP_CHUNK):
+            chunk = trip_ids[start:start + BULK_LOOKUP_CHUNK]
+            existing.update(trip_id for (trip_id,) in self.session.query(Trip.trip_id).filter(Trip.trip_id.in_(chunk)))
+        return existing
+
+    def driver_ids_with_trips_since(self, since):
+        return {driver_id for (driver_id,) in
+                self.session.query(Trip.driver_id).filter(Trip.created_at >= since).distinct()}
+
+    def bulk_add_trips(self, rows):
+        # One executemany instead of a flush per ORM object
+        if rows:
+            self.session.execute(insert(Trip), rows)
+
+    def get_cancellation(self, cancellation_id):
+        return self.session.query(Cancellation).filter(Cancellation.cancellation_id == cancellation_id).first()
+
+    def list_cancellations(self, driver_id=None, start_date=None, end_date=None, skip=0, limit=None):
+        query = self.session.query(Cancellation)
+
+        if driver_id:
+            query = query.filter(Cancellation.driver_id == driver_id)
+
+        if start_date:
+            query = query.filter(Cancellation.cancellation_date >= start_date)
+
+        if end_date:
+            query = query.filter(Cancellation.cancellation_date <= end_date)
+
+        return query.order_by(Cancellation.created_at.desc()).offset(skip).limit(limit).all()
+
+    def add_cancellation(self, cancellation):
+        return self._add(cancellation)
+
+    def list_traffic_data(self, location_id=None, time_of_day=None, date_filter=None, skip=0, limit=None):
+        query = self.session.query(TrafficData)
+
+        if location_id:
+            query = query.filter(TrafficData.location_id == location_id)
+
+        if time_of_day:
+            query = query.filter(TrafficData.time_of_day == time_of_day)
+
+        if date_filter:
+            query = query.filter(TrafficData.date == date_filter)
+
+        return query.order_by(TrafficData.created_at.desc()).offset(skip).limit(limit).all()
+
+    def add_traffic_data(self, traffic_data):
+        return self._add(traffic_data)
+
+    def bulk_add_traffic_data(self, rows):
+        if rows:
+            self.session.execute(insert(TrafficData), rows)
+
+    def list_traffic_data_since(self, after_traffic_id, limit, created_since=None):
+        query = self.session.query(TrafficData).filter(TrafficData.traffic_id > after_traffic_id)
+        if created_since is not None:
+            query = query.filter(TrafficData.created_at >= created_since)
+        return query.order_by(TrafficData.traffic_id).limit(limit).all()
+
+    def commit(self):
+        self.session.commit()
+
+    def rollback(self):
+        self.session.rollback()
+
+    def refresh(self, obj):
+        self.session.refresh(obj)
+
+    def close(self):
+        self.session.close()
+
+class InMemoryStore:
+    """Process-wide tables and secondary indexes for the in-memory backend."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.locations = {}
+            self.drivers = {}
+            self.daily_stats = {}  # (driver_id, date) -> DriverDailyStat
+            self.trips = {}
+            self.cancellations = {}
+            self.traffic_data = {}
+            self.stats_by_date = defaultdict(list)
+            self.trips_by_driver = defaultdict(list)
+            self.cancellations_by_driver = defaultdict(list)
+            self.traffic_by_location = defaultdict(list)
+            self.sequences = defaultdict(int)
+
+    def next_id(self, table):
+        with self.lock:
+            self.sequences[table] += 1
+            return self.sequences[table]
+
+def _apply_column_defaults(obj):
+    """Fill column defaults the way a flush would (created_at, date, zero counters)."""
+    for column in obj.__table__.columns:
+        if getattr(obj, column.key) is not None or column.default is None:
+            continue
+        default = column.default
+        setattr(obj, column.key, default.arg(None) if default.is_callable else default.arg)
+
+def _page(rows, skip, limit):
+    return rows[skip:skip + limit] if limit is not None else rows[skip:]
+
+def _newest_first(rows):
+    return sorted(rows, key=lambda row: row.created_at, reverse=True)
+
+def _in_date_range(value, start_date, end_date):
+    return (not start_date or value >= start_date) and (not end_date or value <= end_date)
+
+class InMemoryRepository(IncentiveRepository):
+    """Dict-backed repository for tests and benchmarks; no database round-trips.
+
+    Inserts are visible as soon as they are made, and a duplicate key raises
+    IntegrityError the way the database would. Each insert is logged until
+    commit, so rollback (and close without commit) takes them back out.
+    Updates to rows already stored are not undone. Driver location
+    relationships are re-linked on read and refresh.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._inserted = []  # (table, key, index list or None, row) since the last commit
+
+    def _insert(self, table, key, row, index=None):
+        """Store a new row under `key`, also appending it to `index`; an existing key is an IntegrityError."""
+        with self.store.lock:
+            rows = getattr(self.store, table)
+            if key in rows:
+                raise IntegrityError(f"INSERT INTO {row.__tablename__}", {'key': key},
+                                     KeyError(f"duplicate key {key!r} in {row.__tablename__}"))
+            rows[key] = row
+            if index is not None:
+                index.append(row)
+            self._inserted.append((rows, key, index, row))
+        return row
+
+    def _link_driver(self, driver):
+        driver.home_location = self.store.locations.get(driver.home_location_id)
+        driver.current_location = self.store.locations.get(driver.current_location_id)
+        return driver
+
+    def get_location(self, location_id):
+        return self.store.locations.get(location_id)
+
+    def list_locations(self, skip=0, limit=None):
+        return _page(list(self.store.locations.values()), skip, limit)
+
+    def add_location(self, location):
+        if location.location_id is None:
+            location.location_id = self.store.next_id('locations')
+        return self._insert('locations', location.location_id, location)
+
+    def location_ids(self):
+        return set(self.store.locations)
+
+    def driver_ids(self):
+        return set(self.store.drivers)
+
+    def get_driver(self, driver_id, with_locations=False):
+        driver = self.store.drivers.get(driver_id)
+        return self._link_driver(driver) if driver else None
+
+    def list_drivers(self, skip=0, limit=None):
+        return [self._link_driver(driver) for driver in _page(list(self.store.drivers.values()), skip, limit)]
+
+    def add_driver(self, driver):
+        _apply_column_defaults(driver)
+        return self._insert('drivers', driver.driver_id, self._link_driver(driver))
+
+    def get_daily_stats(self, driver_id, stats_date):
+        return self.store.daily_stats.get((driver_id, stats_date))
+
+    def list_daily_stats(self, driver_id, start_date, end_date):
+        return [
+            stats for (stats_driver_id, stats_date), stats in self.store.daily_stats.items()
+            if stats_driver_id == driver_id and start_date <= stats_date <= end_date
+        ]
+
+    def list_daily_stats_for_date(self, stats_date):
+        return list(self.store.stats_by_date.get(stats_date, []))
+
+    def add_daily_stats(self, stats):
+        _apply_column_defaults(stats)
+        with self.store.lock:
+            stats.stat_id = stats.stat_id or self.store.next_id('driver_daily_stats')
+            return self._insert('daily_stats', (stats.driver_id, stats.date), stats, self.store.stats_by_date[stats.date])
+
+    def leaderboard(self, stats_date, limit):
+        ranked = sorted(self.store.stats_by_date.get(stats_date, []), key=lambda s: s.coins_earned, reverse=True)
+        rows = []
+        for stats in ranked[:limit]:
+            driver = self.store.drivers.get(stats.driver_id)
+            if driver:
+                rows.append((stats.driver_id, driver.name, stats.coins_earned, stats.distance_covered_today))
+        return rows
+
+    def get_trip(self, trip_id):
+        return self.store.trips.get(trip_id)
+
+    def list_trips(self, driver_id=None, start_date=None, end_date=None, skip=0, limit=None):
+        candidates = self.store.trips_by_driver.get(driver_id, []) if driver_id else self.store.trips.values()
+        matching = [trip for trip in candidates if _in_date_range(trip.trip_date, start_date, end_date)]
+        return _page(_newest_first(matching), skip, limit)
+
+    def add_trip(self, trip):
+        _apply_column_defaults(trip)
+        with self.store.lock:
+            return self._insert('trips', trip.trip_id, trip, self.store.trips_by_driver[trip.driver_id])
+
+    def existing_trip_ids(self, trip_ids):
+        return {trip_id for trip_id in trip_ids if trip_id in self.store.trips}
+
+    def driver_ids_with_trips_since(self, since):
+        return {trip.driver_id for trip in self.store.trips.values() if trip.created_at >= since}
+
+    def bulk_add_trips(self, rows):
+        for row in rows:
+            self.add_trip(Trip(**row))
+
+    def get_cancellation(self, cancellation_id):
+        return self.store.cancellations.get(cancellation_id)
+
+    def list_cancellations(self, driver_id=None, start_date=None, end_date=None, skip=0, limit=None):
+        candidates = self.store.cancellations_by_driver.get(driver_id, []) if driver_id else self.store.cancellations.values()
+        matching = [c for c in candidates if _in_date_range(c.cancellation_date, start_date, end_date)]
+        return _page(_newest_first(matching), skip, limit)
+
+    def add_cancellation(self, cancellation):
+        _apply_column_defaults(cancellation)
+        with self.store.lock:
+            cancellation.cancellation_id = cancellation.cancellation_id or self.store.next_id('cancellations')
+            return self._insert('cancellations', cancellation.cancellation_id, cancellation,
+                                self.store.cancellations_by_driver[cancellation.driver_id])
+
+    def list_traffic_data(self, location_id=None, time_of_day=None, date_filter=None, skip=0, limit=None):
+        candidates = self.store.traffic_by_location.get(location_id, []) if location_id else self.store.traffic_data.values()
+        matching = [
+            row for row in candidates
+            if (not time_of_day or row.time_of_day == time_of_day) and (not date_filter or row.date == date_filter)
+        ]
+        return _page(_newest_first(matching), skip, limit)
+
+    def add_traffic_data(self, traffic_data):
+        _apply_column_defaults(traffic_data)
+        with self.store.lock:
+            traffic_data.traffic_id = traffic_data.traffic_id or self.store.next_id('traffic_data')
+            return self._insert('traffic_data', traffic_data.traffic_id, traffic_data,
+                                self.store.traffic_by_location[traffic_data.location_id])
+
+    def bulk_add_traffic_data(self, rows):
+        for row in rows:
+            self.add_traffic_data(TrafficData(**row))
+
+    def list_traffic_data_since(self, after_traffic_id, limit, created_since=None):
+        # IDs come from a sequence, so walk it forward from the last one seen
+        rows = []
+        for traffic_id in range(after_traffic_id + 1, self.store.sequences['traffic_data'] + 1):
+            row = self.store.traffic_data.get(traffic_id)
+            if row is not None and (created_since is None or row.created_at >= created_since):
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+        return rows
+
+    def commit(self):
+        self._inserted = []
+
+    def rollback(self):
+        with self.store.lock:
+            for rows, key, index, row in reversed(self._inserted):
+                if rows.get(key) is row:
+                    del rows[key]
+                # Undone newest first, so the row is normally still last in its index
+                if index and index[-1] is row:
+                    index.pop()
+                elif index is not None:
+                    index[:] = [other for other in index if other is not row]
+        self._inserted = []
+
+    def refresh(self, obj):
+        if isinstance(obj, Driver):
+            self._link_driver(obj)
+
+    def close(self):
+        # Like closing a session: whatever wasn't committed is discarded
+        if self._inserted:
+            self.rollback()
+
+# Storage backends: one per process, handing out a repository per request
+class SQLAlchemyBackend:
+    """Backend for server databases such as MySQL, with a pooled engine."""
+
+    def __init__(self, url, **engine_kwargs):
+        self.url = url
+        self.engine = create_engine(url, **engine_kwargs)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+    def repository(self):
+        return SQLAlchemyRepository(self.session_factory())
+
+    def create_schema(self):
+        Base.metadata.create_all(bind=self.engine)
+        self.add_missing_columns()
+
+    def drop_schema(self):
+        Base.metadata.drop_all(bind=self.engine)
+
+    def add_missing_columns(self):
+        """Add model columns that existing tables lack; returns the "table.column" names added.
+
+        create_all() leaves existing tables alone, so a database created
+        before a column was added to a model (trips.surge_multiplier,
+        processed_at, historical_traffic, streak_bonus, incentive_variant,
+        config_version) gets it here with ALTER TABLE.
+        Added columns must be nullable; existing rows get the column's scalar
+        default, or NULL.
+        """
+        inspector = inspect(self.engine)
+        existing_tables = set(inspector.get_table_names())
+        quote = self.engine.dialect.identifier_preparer.quote
+        added = []
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                present = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in present:
+                        continue
+                    if not column.nullable:
+                        raise RuntimeError(f"Cannot add non-nullable column {table.name}.{column.name} to an existing table")
+                    statement = (f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+                                 f"{column.type.compile(dialect=self.engine.dialect)}")
+                    if column.default is not None and column.default.is_scalar:
+                        default = literal(column.default.arg).compile(dialect=self.engine.dialect,
+                                                                      compile_kwargs={"literal_binds": True})
+                        statement += f" DEFAULT {default}"
+                    connection.exec_driver_sql(statement)
+                    added.append(f"{table.name}.{column.name}")
+        if added:
+            print(f"Added missing columns: {', '.join(added)}")
+        return added
+
+class SQLiteBackend(SQLAlchemyBackend):
+    """SQLite file backend in WAL mode.
+
+    WAL lets read transactions left open by one request coexist with the next
+    request's write. The pool is wider than the default 5+10 since SQLite
+    connections are cheap and async endpoints hold theirs across awaits.
+    """
+
+    def __init__(self, url):
+        super().__init__(url, connect_args={"check_same_thread": False}, pool_size=20, max_overflow=20)
+
+        @event.listens_for(self.engine, "connect")
+        def _enable_wal(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+class InMemoryBackend:
+    """Pure-Python backend; all repositories share one process-wide store."""
+
+    url = "memory://"
+
+    def __init__(self):
+        self.store = InMemoryStore()
+
+    def repository(self):
+        return InMemoryRepository(self.store)
+
+    def create_schema(self):
+        pass
+
+    def drop_schema(self):
+        self.store.clear()
+
+    def add_missing_columns(self):
+        return []
+
+def create_backend(url):
+    """Pick a backend from a database URL: memory://, sqlite:///path or any SQLAlchemy URL."""
+    if url.startswith("memory://"):
+        return InMemoryBackend()
+    if url.startswith("sqlite"):
+        return SQLiteBackend(url)
+    return SQLAlchemyBackend(url)
+
+def benchmark_backends(urls, num_drivers=100, num_trips=5000):
+    """Run the same create+process trip workload through the incentive system on each backend."""
+    # Imported here: the API module itself builds its backend from storage
+    from namma_yatri_api import NammaYatriIncentiveSystem, TripCreate
+    from data_generator import BENGALURU_LOCATIONS
+
+    results = []
+    for url in urls:
+        backend = create_backend(url)
+        backend.drop_schema()
+        backend.create_schema()
+        repo = backend.repository()
+
+        location_ids = []
+        for name, (lat, long) in BENGALURU_LOCATIONS.items():
+            location_ids.append(repo.add_location(Location(location_name=name, latitude=lat, longitude=long)))
+        repo.commit()
+        location_ids = [location.location_id for location in location_ids]
+
+        for i in range(num_drivers):
+            repo.add_driver(Driver(
+                driver_id=f"BENCH-{i}", name=f"Driver {i}", experience_years=3, rating=4.5,
+                home_location_id=location_ids[i % len(location_ids)],
+                current_location_id=location_ids[(i * 7) % len(location_ids)],
+                daily_avg_distance_km=80, target_distance_60_percent=48, target_distance_100_percent=80,
+                ride_acceptance_rate=90, cancellation_rate=5, consecutive_target_days=0
+            ))
+        repo.commit()
+
+        system = NammaYatriIncentiveSystem(repo)
+        start = time.perf_counter()
+        for i in range(num_trips):
+            system.process_new_trip(f"BENCH-{i % num_drivers}", TripCreate(
+                trip_id=f"BT-{i}", driver_id=f"BENCH-{i % num_drivers}",
+                pickup_location_id=location_ids[i % len(location_ids)],
+                destination_location_id=location_ids[(i + 3) % len(location_ids)],
+                estimated_trip_distance_km=6.5, distance_to_pickup_km=1.2, traffic_factor=0.8,
+                time_of_day='Morning', base_fare=30, base_trip_fare=127.5, trip_duration_minutes=25
+            ))
+        elapsed = time.perf_counter() - start
+        repo.close()
+
+        results.append({'backend': type(backend).__name__, 'trips': num_trips,
+                         'seconds': round(elapsed, 3), 'trips_per_s': round(num_trips / elapsed)})
+        print(f"{type(backend).__name__:<20} {num_trips} trips in {elapsed:.3f}s ({num_trips / elapsed:,.0f} trips/s)")
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare incentive workload cost across storage backends.")
+    parser.add_argument("--trips", type=int, default=5000, help="Trips to process per backend")
+    parser.add_argument("--drivers", type=int, default=100, help="Drivers to spread the trips over")
+    parser.add_argument("--mysql-url", default=None, help="Also benchmark this MySQL URL")
+    args = parser.parse_args()
+
+    sqlite_path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+    urls = ["memory://", f"sqlite:///{sqlite_path}"]
+    if args.mysql_url:
+        urls.append(args.mysql_url)
+
+    benchmark_backends(urls, num_drivers=args.drivers, num_trips=args.trips)
@@ -0,0 +1,259 @@
+import argparse
+import math
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Requests and available drivers are counted over this sliding window, in BUCKET_SECONDS steps
+WINDOW_SECONDS = 300
+BUCKET_SECONDS = 15
+# Surge added per unit of requests-per-driver above 1
+SENSITIVITY = 0.5
+MAX_SURGE = 2.5
+# Time constant of the exponential smoothing between the raw ratio and the quoted multiplier
+SMOOTHING_SECONDS = 60
+# Quoted multipliers move in steps of this size, and only once the smoothed value is a full step away
+QUOTE_STEP = 0.1
+# Fares are priced the way data_generator prices them: a flat base plus this per km
+PER_KM_RATE = 15
+
+def trip_fare(base_fare, distance_km, surge=1.0):
+    """Base trip fare for a distance, scaled by a surge multiplier."""
+    return round((base_fare + distance_km * PER_KM_RATE) * surge, 2)
+
+class ZoneWindow:
+    """Sliding-window counts and surge state for one zone."""
+    __slots__ = ('requests', 'drivers', 'request_total', 'driver_total', 'bucket',
+                 'target', 'smoothed', 'quoted', 'updated_at')
+
+    def __init__(self, buckets):
+        self.requests = [0] * buckets
+        self.drivers = [0] * buckets
+        self.request_total = 0
+        self.driver_total = 0
+        self.bucket = None
+        self.target = self.smoothed = self.quoted = 1.0
+        self.updated_at = None
+
+class SurgeEngine:
+    """Per-zone surge multipliers from sliding-window counts of requests and available drivers.
+
+    Each zone keeps a ring of BUCKET_SECONDS buckets covering WINDOW_SECONDS,
+    with running totals. An event adds to the current bucket and its total,
+    and buckets that have left the window are subtracted as time moves on.
+    An event or a read is therefore O(1) however busy the zone is.
+
+    The raw target grows with requests per available driver. The quoted
+    multiplier follows the target through exponential smoothing and only
+    moves in QUOTE_STEP steps. A burst of requests raises the price over
+    about a minute instead of on the first request, and the price doesn't
+    flicker when the ratio hovers around a step.
+
+    Times are epoch seconds, so simulations can drive the engine with their
+    own clock.
+    """
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS, sensitivity=SENSITIVITY,
+                 max_surge=MAX_SURGE, smoothing_seconds=SMOOTHING_SECONDS, quote_step=QUOTE_STEP):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.buckets = max(1, window_seconds // bucket_seconds)
+        self.sensitivity = sensitivity
+        self.max_surge = max_surge
+        self.smoothing_seconds = smoothing_seconds
+        self.quote_step = quote_step
+        self._lock = threading.Lock()
+        self._zones = {}
+        self.events = 0
+
+    def _advance(self, zone, bucket):
+        """Move the zone's ring forward to `bucket`, dropping counts that left the window."""
+        if zone.bucket is None:
+            zone.bucket = bucket
+            return
+        steps = bucket - zone.bucket
+        if steps <= 0:
+            return
+        if steps >= self.buckets:
+            zone.requests = [0] * self.buckets
+            zone.drivers = [0] * self.buckets
+            zone.request_total = zone.driver_total = 0
+        else:
+            for index in range(zone.bucket + 1, bucket + 1):
+                index %= self.buckets
+                zone.request_total -= zone.requests[index]
+                zone.driver_total -= zone.drivers[index]
+                zone.requests[index] = zone.drivers[index] = 0
+        zone.bucket = bucket
+
+    def _target(self, zone):
+        ratio = (zone.request_total + 1) / (zone.driver_total + 1)
+        return min(self.max_surge, 1 + self.sensitivity * (ratio - 1)) if ratio > 1 else 1.0
+
+    def _update(self, zone_id, now, requests=0, drivers=0):
+        zone = self._zones.get(zone_id)
+        if zone is None:
+            zone = self._zones[zone_id] = ZoneWindow(self.buckets)
+
+        # The target held since the last update, so smooth towards it before applying this event
+        if zone.updated_at is not None and now > zone.updated_at:
+            if self.smoothing_seconds:
+                zone.smoothed += (zone.target - zone.smoothed) * (1 - math.exp(-(now - zone.updated_at) / self.smoothing_seconds))
+            else:
+                zone.smoothed = zone.target
+        zone.updated_at = max(zone.updated_at or now, now)
+
+        bucket = int(now // self.bucket_seconds)
+        self._advance(zone, bucket)
+        # Late events still inside the window count towards their own bucket
+        if (requests or drivers) and bucket > zone.bucket - self.buckets:
+            index = bucket % self.buckets
+            zone.requests[index] += requests
+            zone.drivers[index] += drivers
+            zone.request_total += requests
+            zone.driver_total += drivers
+        zone.target = self._target(zone)
+        if not self.smoothing_seconds:
+            zone.smoothed = zone.target
+
+        if not self.quote_step:
+            zone.quoted = zone.smoothed
+        elif abs(zone.smoothed - zone.quoted) >= self.quote_step:
+            zone.quoted = min(self.max_surge, max(1.0, round(round(zone.smoothed / self.quote_step) * self.quote_step, 2)))
+        return zone
+
+    def record_request(self, zone_id, count=1, now=None):
+        """Count ride requests in a zone; returns the zone's quoted multiplier."""
+        with self._lock:
+            self.events += 1
+            return self._update(zone_id, time.time() if now is None else now, requests=count).quoted
+
+    def record_available_driver(self, zone_id, count=1, now=None):
+        """Count drivers becoming available in a zone; returns the zone's quoted multiplier."""
+        with self._lock:
+            self.events += 1
+            return self._update(zone_id, time.time() if now is None else now, drivers=count).quoted
+
+    def multiplier(self, zone_id, now=None):
+        """The zone's quoted multiplier; 1.0 for a zone without events."""
+        with self._lock:
+            if zone_id not in self._zones:
+                return 1.0
+            return self._update(zone_id, time.time() if now is None else now).quoted
+
+    def zone(self, zone_id, now=None):
+        """Window counts and multipliers for a zone, or None for a zone without events."""
+        with self._lock:
+            if zone_id not in self._zones:
+                return None
+            zone = self._update(zone_id, time.time() if now is None else now)
+            return {
+                'zone_id': zone_id,
+                'multiplier': round(zone.quoted, 2),
+                'target_multiplier': round(zone.target, 3),
+                'open_requests': zone.request_total,
+                'available_drivers': zone.driver_total,
+                'window_seconds': self.window_seconds
+            }
+
+    def zone_ids(self):
+        with self._lock:
+            return sorted(self._zones)
+
+    def handle(self, event):
+        """Post-commit handler: the driver of a processed trip is available again at its destination."""
+        processed_at = event.get('processed_at')
+        now = datetime.fromisoformat(processed_at).timestamp() if processed_at else None
+        self.record_available_driver(event['destination_location_id'], now=now)
+
+def simulate_bursty_demand(minutes=240, zones=20, bursts=6, seed=42, **engine_options):
+    """Drive an engine with bursty requests and price-responsive supply, one second at a time.
+
+    Each zone gets Poisson requests at a base rate, multiplied for a few
+    minutes during bursts at random times. Supply responds to the quoted
+    multiplier with a lag: drivers drift into surging zones and riders
+    request less when the price is up. That feedback loop is what makes
+    an unsmoothed multiplier oscillate. Returns stability figures for the
+    quoted multipliers.
+    """
+    rng = np.random.default_rng(seed)
+    engine = SurgeEngine(**engine_options)
+    seconds = minutes * 60
+    base_requests, base_drivers = 3 / 60, 3.3 / 60  # per zone per second
+    supply_lag = 180
+
+    burst_factor = np.ones((zones, seconds))
+    for zone in range(zones):
+        for start in rng.integers(0, seconds - 900, bursts):
+            burst_factor[zone, start:start + rng.integers(300, 900)] *= rng.uniform(3, 6)
+
+    quotes = np.ones((zones, seconds))
+    for second in range(seconds):
+        for zone in range(zones):
+            lagged = quotes[zone, max(0, second - supply_lag)]
+            current = quotes[zone, second - 1] if second else 1.0
+            requests = rng.poisson(base_requests * burst_factor[zone, second] * current ** -1.5)
+            drivers = rng.poisson(base_drivers * (1 + 2.0 * (lagged - 1)))
+            if requests:
+                engine.record_request(zone, requests, now=second)
+            if drivers:
+                engine.record_available_driver(zone, drivers, now=second)
+            quotes[zone, second] = engine.multiplier(zone, now=second)
+
+    steps = np.diff(quotes, axis=1)
+    changes_per_zone = np.count_nonzero(steps, axis=1)
+    directions = [np.sign(row[row != 0]) for row in steps]
+    reversals = sum(int(np.sum(d[1:] != d[:-1])) for d in directions)
+    in_burst = burst_factor > 1
+    return {
+        'zones': zones,
+        'minutes': minutes,
+        'events': engine.events,
+        'quote_changes_per_zone_hour': float(changes_per_zone.mean() / (minutes / 60)),
+        'reversals_per_zone_hour': reversals / zones / (minutes / 60),
+        'largest_step': float(np.abs(steps).max()) if steps.size else 0.0,
+        'mean_surge_in_bursts': float(quotes[in_burst].mean()) if in_burst.any() else 1.0,
+        'mean_surge_outside_bursts': float(quotes[~in_burst].mean()),
+        'max_surge': float(quotes.max())
+    }
+
+def run_event_benchmark(events=1000000, zones=500, seed=42):
+    """Events per second through record_request / record_available_driver over many zones."""
+    rng = np.random.default_rng(seed)
+    zone_ids = rng.integers(0, zones, events).tolist()
+    is_request = (rng.random(events) < 0.5).tolist()
+    times = np.sort(rng.uniform(0, 3600, events)).tolist()
+    engine = SurgeEngine()
+
+    started = time.perf_counter()
+    for zone_id, request, now in zip(zone_ids, is_request, times):
+        if request:
+            engine.record_request(zone_id, now=now)
+        else:
+            engine.record_available_driver(zone_id, now=now)
+    elapsed = time.perf_counter() - started
+    return {'events': events, 'zones': zones, 'seconds': elapsed, 'events_per_second': events / elapsed}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check surge stability under bursty demand and time event updates.")
+    parser.add_argument("--minutes", type=int, default=240, help="Simulated minutes")
+    parser.add_argument("--zones", type=int, default=20, help="Simulated zones")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for demand, bursts and supply")
+    parser.add_argument("--events", type=int, default=1000000, help="Events for the throughput benchmark")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"Simulating {args.minutes} minutes of bursty demand over {args.zones} zones")
+    for label, options in [("unsmoothed", {'smoothing_seconds': 0, 'quote_step': 0}),
+                           ("smoothed", {})]:
+        result = simulate_bursty_demand(args.minutes, args.zones, seed=args.seed, **options)
+        print(f"  {label:>10}: {result['quote_changes_per_zone_hour']:7.1f} price changes and "
+              f"{result['reversals_per_zone_hour']:6.1f} reversals per zone-hour, largest step "
+              f"{result['largest_step']:.2f}, mean surge {result['mean_surge_in_bursts']:.2f} in bursts / "
+              f"{result['mean_surge_outside_bursts']:.2f} outside, max {result['max_surge']:.2f}")
+    result = run_event_benchmark(args.events, seed=args.seed)
+    print(f"Event updates: {result['events']:,} over {result['zones']} zones in {result['seconds']:.2f}s "
+          f"({result['events_per_second']:,.0f}/s)")
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyKeyReused, IdempotencyStore
+
+async def _start_in_flight(store, key, release, calls, retries, outcome):
+    """Start the first run of `key` held open until `release` is set, then `retries` concurrent runs."""
+    async def func():
+        calls.append(key)
+        await release.wait()
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    first = asyncio.create_task(store.run(key, "POST /trips/T1/process", func))
+    # Let the first request reach func() before the retries arrive
+    while not calls:
+        await asyncio.sleep(0)
+    waiters = [asyncio.create_task(store.run(key, "POST /trips/T1/process", func)) for _ in range(retries)]
+    await asyncio.sleep(0)
+    return first, waiters
+
+def test_concurrent_retries_wait_for_the_first_response():
+    async def scenario():
+        store, release, calls = IdempotencyStore(), asyncio.Event(), []
+        response = {"trip_id": "T1", "coins_earned": 12}
+        first, waiters = await _start_in_flight(store, "key", release, calls, 5, response)
+        assert not first.done() and not any(waiter.done() for waiter in waiters)
+        assert "key" in store._in_flight
+
+        release.set()
+        results = await asyncio.gather(first, *waiters)
+        assert results[0] == (response, False)
+        assert all(result is response and replayed for result, replayed in results[1:])
+        assert calls == ["key"]
+        assert store.replays == 5
+        assert not store._in_flight and len(store) == 1
+
+    asyncio.run(scenario())
+
+def test_concurrent_retries_get_the_first_failure():
+    async def scenario():
+        store, release, calls = IdempotencyStore(), asyncio.Event(), []
+        failure = RuntimeError("database went away")
+        first, waiters = await _start_in_flight(store, "key", release, calls, 5, failure)
+
+        release.set()
+        results = await asyncio.gather(first, *waiters, return_exceptions=True)
+        assert all(result is failure for result in results)
+        assert calls == ["key"]
+        # Failures aren't stored, so a later retry runs again
+        assert not store._in_flight and len(store) == 0
+
+        async def retry():
+            calls.append("retry")
+            return "ok"
+
+        assert await store.run("key", "POST /trips/T1/process", retry) == ("ok", False)
+        assert calls == ["key", "retry"]
+
+    asyncio.run(scenario())
+
+def test_key_reused_for_another_request_while_in_flight():
+    async def scenario():
+        store, release, calls = IdempotencyStore(), asyncio.Event(), []
+        first, _ = await _start_in_flight(store, "key", release, calls, 0, "done")
+
+        async def other():
+            calls.append("other")
+
+        with pytest.raises(IdempotencyKeyReused):
+            await store.run("key", "POST /cancellations/1/process", other)
+        release.set()
+        assert await first == ("done", False)
+        assert calls == ["key"]
+
+    asyncio.run(scenario())
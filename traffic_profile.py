@@ -0,0 +1,121 @@
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Weight of each new reading in the moving averages
+EWMA_ALPHA = 0.2
+# The scheduled refresh picks up rows written by other processes at most this late
+REFRESH_SECONDS = 30
+# Full rebuild interval; also catches rows committed out of traffic_id order
+REBUILD_SECONDS = 3600
+# A rebuild only reads readings from this many days back
+WINDOW_DAYS = 28
+# Rows fetched per query when catching up
+REFRESH_BATCH = 5000
+
+@dataclass
+class TrafficCell:
+    """Moving averages for one location and hour of day."""
+    intensity: float
+    ride_requests: float
+    samples: int
+    last_reading_at: Optional[datetime] = None
+
+class TrafficProfile:
+    """Per-location, per-hour EWMA traffic intensity and ride requests, kept in memory.
+
+    Readings are bucketed by the hour of their created_at. Lookups are a
+    single dict access. refresh() runs on the API's lifespan schedule, off
+    the event loop: every REBUILD_SECONDS it rebuilds the profile from the
+    last WINDOW_DAYS of readings into fresh tables and swaps them in, and
+    otherwise it catches up from the highest traffic_id seen so far. Each
+    stored row is therefore folded in once whichever process wrote it.
+    catch_up() does only the incremental part, for request paths that
+    have just stored readings.
+
+    The averages live in one process and restart with it, so the value a
+    trip was processed with is stored on the trip rather than looked up
+    again later.
+    """
+
+    def __init__(self, alpha=EWMA_ALPHA, refresh_seconds=REFRESH_SECONDS, rebuild_seconds=REBUILD_SECONDS,
+                 window_days=WINDOW_DAYS):
+        self.alpha = alpha
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.window_days = window_days
+        self._lock = threading.Lock()
+        self._hours = [{} for _ in range(24)]
+        self._last_traffic_id = 0
+        self._rebuilt_at = None
+        self._window_start = None
+
+    def _observe(self, hours, location_id, hour, intensity, ride_requests, at=None):
+        cells = hours[hour]
+        cell = cells.get(location_id)
+        if cell is None:
+            cells[location_id] = TrafficCell(intensity, ride_requests, 1, at)
+            return
+        cell.intensity += self.alpha * (intensity - cell.intensity)
+        cell.ride_requests += self.alpha * (ride_requests - cell.ride_requests)
+        cell.samples += 1
+        cell.last_reading_at = at
+
+    def observe(self, location_id, hour, intensity, ride_requests, at=None):
+        """Fold one reading into the location's averages for `hour`."""
+        with self._lock:
+            self._observe(self._hours, location_id, hour, intensity, ride_requests, at)
+
+    def _fold_since(self, db, hours, last_traffic_id, created_since=None):
+        """Fold rows above `last_traffic_id` into `hours`; returns (rows folded, highest traffic_id)."""
+        added = 0
+        while True:
+            rows = db.list_traffic_data_since(last_traffic_id, REFRESH_BATCH, created_since)
+            for row in rows:
+                self._observe(hours, row.location_id, row.created_at.hour, row.traffic_intensity, row.ride_requests,
+                              row.created_at)
+                last_traffic_id = max(last_traffic_id, row.traffic_id)
+            added += len(rows)
+            if len(rows) < REFRESH_BATCH:
+                return added, last_traffic_id
+
+    def catch_up(self, db):
+        """Fold in rows stored since the last refresh; a no-op until the first rebuild."""
+        if self._rebuilt_at is None:
+            return 0
+        with self._lock:
+            added, self._last_traffic_id = self._fold_since(db, self._hours, self._last_traffic_id, self._window_start)
+        return added
+
+    def refresh(self, db, force=False):
+        """Rebuild from the window when rebuild_seconds have passed (or when forced), otherwise catch up."""
+        now = datetime.now()
+        if not force and self._rebuilt_at is not None and (now - self._rebuilt_at).total_seconds() < self.rebuild_seconds:
+            return self.catch_up(db)
+
+        # Built aside, so lookups keep the old tables until the swap
+        window_start = now - timedelta(days=self.window_days)
+        hours = [{} for _ in range(24)]
+        added, last_traffic_id = self._fold_since(db, hours, 0, window_start)
+        with self._lock:
+            self._hours, self._last_traffic_id = hours, last_traffic_id
+            self._rebuilt_at, self._window_start = now, window_start
+            # Rows stored while the rebuild was reading
+            caught_up, self._last_traffic_id = self._fold_since(db, self._hours, self._last_traffic_id, window_start)
+        return added + caught_up
+
+    def cell(self, location_id, hour):
+        return self._hours[hour].get(location_id)
+
+    def intensity(self, location_id, hour):
+        """Usual traffic intensity at a location for an hour, or None without readings."""
+        cell = self._hours[hour].get(location_id)
+        return cell.intensity if cell else None
+
+    def hour_snapshot(self, hour):
+        """{location_id: TrafficCell} for every location with readings in `hour`."""
+        return dict(self._hours[hour])
+
+    def __len__(self):
+        return sum(len(cells) for cells in self._hours)
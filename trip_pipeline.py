@@ -0,0 +1,340 @@
+import asyncio
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from datetime import date, timedelta
+
+# Queued events beyond this make submit() wait for the worker to catch up
+QUEUE_SIZE = 10000
+MAX_ATTEMPTS = 5
+RETRY_DELAY_SECONDS = 0.2
+# Acknowledged journal lines are dropped once nothing is pending and the file passes this size
+JOURNAL_COMPACT_BYTES = 1 << 20
+# Days of trip dates the in-memory rollups keep, counting back from the newest seen
+ROLLUP_DAYS = 7
+
+_STOP = object()
+
+class EventJournal:
+    """Append-only file of submitted events and their acknowledgements.
+
+    An event is written as {"id": n, "event": {...}} before it is queued and
+    {"ack": n} once every handler has taken it. Events without an ack are
+    recovered when the journal is reopened, so delivery is at least once
+    from the append onward. Endpoints append after their commit, so an
+    event is still lost if the process dies between the two. Lines are
+    flushed but not fsynced: this covers a process crash, not a power cut.
+    """
+
+    def __init__(self, path, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+
+        pending = OrderedDict()
+        next_id = 1
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        continue
+                    if 'ack' in record:
+                        pending.pop(record['ack'], None)
+                        next_id = max(next_id, record['ack'] + 1)
+                    else:
+                        pending[record['id']] = record['event']
+                        next_id = max(next_id, record['id'] + 1)
+
+        self.recovered = list(pending.items())
+        self._pending = set(pending)
+        self._next_id = next_id
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'a')
+
+    def append(self, event):
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            self._file.write(json.dumps({'id': event_id, 'event': event}) + '\n')
+            self._file.flush()
+            self._pending.add(event_id)
+        return event_id
+
+    def ack(self, event_id):
+        with self._lock:
+            self._file.write(json.dumps({'ack': event_id}) + '\n')
+            self._file.flush()
+            self._pending.discard(event_id)
+            if not self._pending and self._file.tell() > self.compact_bytes:
+                self._file.seek(0)
+                self._file.truncate()
+
+    def pending(self):
+        return len(self._pending)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class PostCommitPipeline:
+    """Runs derived work for committed trips on a background thread.
+
+    Endpoints call `await submit(event)` after their commit and return; each
+    handler's handle(event) then runs on the worker thread, in submit order.
+    A handler that raises is retried with exponential backoff, and after
+    MAX_ATTEMPTS the event is dead-lettered for that handler only. The
+    queue is bounded: when the worker falls behind, submit() waits for room
+    instead of letting the backlog grow without limit.
+
+    Delivery is at least once. With a journal, events that were submitted
+    but not finished before a crash are delivered again on restart, so
+    handlers must tolerate seeing an event twice. The journal is opened by
+    start(), so building a pipeline touches no files.
+    """
+
+    def __init__(self, handlers, maxsize=QUEUE_SIZE, max_attempts=MAX_ATTEMPTS,
+                 retry_delay=RETRY_DELAY_SECONDS, journal_path=None):
+        self.handlers = dict(handlers)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.journal_path = journal_path
+        self.journal = None
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.retries = 0
+        self.backpressure_waits = 0
+        self.dead_letters = deque(maxlen=100)
+
+    def start(self):
+        """Start the worker if it isn't running; journal recoveries are delivered first."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.journal_path and self.journal is None:
+                self.journal = EventJournal(self.journal_path)
+            recovered = self.journal.recovered if self.journal else []
+            if self.journal:
+                self.journal.recovered = []
+            self._thread = threading.Thread(target=self._run, args=(recovered,), name="post-commit", daemon=True)
+            self._thread.start()
+
+    async def submit(self, event):
+        """Journal and queue a committed event; waits off the event loop while the queue is full.
+
+        The commit has already happened, so a failure to journal or queue is
+        logged and dead-lettered rather than raised to the request. Returns
+        whether the event was queued.
+        """
+        try:
+            self.start()
+            event_id = self.journal.append(event) if self.journal else None
+            item = (event_id, event)
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.backpressure_waits += 1
+                await asyncio.to_thread(self._queue.put, item)
+        except Exception as e:
+            print(f"Post-commit pipeline could not take {event.get('trip_id')}: {e}")
+            self.dead_letters.append({'handler': 'submit', 'event': event, 'error': str(e)})
+            return False
+        self.submitted += 1
+        return True
+
+    def join(self):
+        """Block until every queued event has been handled."""
+        self._queue.join()
+
+    def stop(self, timeout=30):
+        """Deliver what is queued, then stop the worker and close handlers.
+
+        If the worker is still delivering after `timeout`, handlers and the
+        journal are left open for it; unacknowledged events are recovered on
+        the next start.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print(f"Post-commit worker still busy after {timeout}s; leaving its journal open")
+                return
+        for handler in self.handlers.values():
+            if hasattr(handler, 'close'):
+                handler.close()
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'submitted': self.submitted,
+            'processed': self.processed,
+            'retries': self.retries,
+            'backpressure_waits': self.backpressure_waits,
+            'journal_pending': self.journal.pending() if self.journal else None,
+            'dead_letters': list(self.dead_letters)
+        }
+
+    def _run(self, recovered):
+        for event_id, event in recovered:
+            self._deliver(event_id, event)
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._deliver(*item)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, event_id, event):
+        for name, handler in self.handlers.items():
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    handler.handle(event)
+                    break
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        print(f"Post-commit handler {name} gave up on {event.get('trip_id')}: {e}")
+                        self.dead_letters.append({'handler': name, 'event': event, 'error': str(e)})
+                        break
+                    self.retries += 1
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        if self.journal:
+            self.journal.ack(event_id)
+        self.processed += 1
+
+def _oldest_kept(newest_day, keep_days):
+    """The oldest ISO trip date a rollup keeps once `newest_day` has been seen."""
+    return (date.fromisoformat(newest_day) - timedelta(days=keep_days - 1)).isoformat()
+
+def _drop_days_before(oldest, *tables):
+    for table in tables:
+        for day in [day for day in table if day < oldest]:
+            del table[day]
+
+class HourlyRollup:
+    """Trips, distance, coins and fares per day and hour of trip time, counting each trip once.
+
+    Only the last `keep_days` trip dates are kept; events for older days are ignored.
+    """
+
+    def __init__(self, keep_days=ROLLUP_DAYS):
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._seen = defaultdict(set)
+        self._days = defaultdict(dict)
+        self._oldest = ''
+
+    def handle(self, event):
+        day = event['trip_date']
+        with self._lock:
+            oldest = _oldest_kept(day, self.keep_days)
+            if oldest > self._oldest:
+                self._oldest = oldest
+                _drop_days_before(oldest, self._seen, self._days)
+            if day < self._oldest:
+                return
+            if event['trip_id'] in self._seen[day]:
+                return
+            self._seen[day].add(event['trip_id'])
+
+            # trip_time is "HH:MM:SS", or "H:MM:SS" when MySQL hands it back as a timedelta
+            hour = int(str(event['trip_time']).split(':')[0]) if event.get('trip_time') else 0
+            row = self._days[day].setdefault(hour, {
+                'hour': hour, 'trips': 0, 'distance_km': 0.0, 'coins_earned': 0,
+                'final_fare': 0.0, 'multiplied_trips': 0
+            })
+            row['trips'] += 1
+            row['distance_km'] += event['total_distance']
+            row['coins_earned'] += event['coins_earned']
+            row['final_fare'] += event['final_fare']
+            row['multiplied_trips'] += event['multiplier_applied'] > 1
+
+    def table(self, day):
+        with self._lock:
+            return [dict(row) for _, row in sorted(self._days.get(day, {}).items())]
+
+class LiveLeaderboard:
+    """Each driver's latest coin balance and distance per day, kept from trip event snapshots.
+
+    Events carry the balance after the trip rather than a delta, so a
+    redelivered event cannot double count. It only knows drivers with trips
+    processed since the API started, for the last `keep_days` trip dates;
+    GET /stats/driver-leaderboard stays the authoritative query.
+    """
+
+    def __init__(self, keep_days=ROLLUP_DAYS):
+        self.keep_days = keep_days
+        self._lock = threading.Lock()
+        self._days = defaultdict(dict)
+        self._oldest = ''
+
+    def handle(self, event):
+        day = event['trip_date']
+        with self._lock:
+            oldest = _oldest_kept(day, self.keep_days)
+            if oldest > self._oldest:
+                self._oldest = oldest
+                _drop_days_before(oldest, self._days)
+            if day < self._oldest:
+                return
+            self._days[day][event['driver_id']] = (
+                event['new_coins_balance'], event['distance_covered_today']
+            )
+
+    def top(self, day, limit=10):
+        with self._lock:
+            standings = sorted(self._days.get(day, {}).items(), key=lambda item: (-item[1][0], -item[1][1]))
+        return [
+            {'driver_id': driver_id, 'coins_earned': coins, 'distance_covered_km': distance, 'rank': rank}
+            for rank, (driver_id, (coins, distance)) in enumerate(standings[:limit], start=1)
+        ]
+
+class TripAnalyticsWriter:
+    """Appends each trip event as a row of `directory`/trips_<date>.csv.
+
+    Rows are flushed as they are written so an acknowledged event is on disk.
+    A redelivered event is written again; readers dedupe on trip_id.
+    """
+
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.columns = list(columns)
+        self._files = {}
+
+    def handle(self, event):
+        day = event['trip_date']
+        if day not in self._files:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"trips_{day}.csv")
+            new_file = not os.path.exists(path)
+            f = open(path, 'a', newline='')
+            writer = csv.DictWriter(f, fieldnames=self.columns, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            # Only today's file is written to, so close the rest
+            self.close()
+            self._files[day] = (f, writer)
+
+        f, writer = self._files[day]
+        writer.writerow(event)
+        f.flush()
+
+    def close(self):
+        for f, _ in self._files.values():
+            f.close()
+        self._files.clear()